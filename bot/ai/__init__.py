@@ -2,17 +2,41 @@
 AI Integration Module - Main integration for all AI-powered game features.
 """
 
-from typing import Dict, List, Optional
-from .llm_client import ai_client
+from typing import AsyncIterator, Dict, List, Optional
+from .llm_client import ai_client, ModelType
 from .game_master import ai_game_master, AIGameMaster
-from .task_generator import ai_task_generator, AITaskGenerator
-from .voting_analyzer import ai_voting_analyzer, AIVotingAnalyzer
+from .task_generator import ai_task_generator, AITaskGenerator, AITask
+from .voting_analyzer import (
+    ai_voting_analyzer,
+    AIVotingAnalyzer,
+    AnalysisRecord,
+    PlayerBehavior,
+)
 from .chaos_events import ai_chaos_events, AIChaosEvents, ChaosEvent
 
 import logging
 
 logger = logging.getLogger(__name__)
 
+__all__ = [
+    "AIGameEngine",
+    "ai_game_engine",
+    "ai_client",
+    "ModelType",
+    "AIGameMaster",
+    "ai_game_master",
+    "AITaskGenerator",
+    "ai_task_generator",
+    "AITask",
+    "AIVotingAnalyzer",
+    "ai_voting_analyzer",
+    "AnalysisRecord",
+    "PlayerBehavior",
+    "AIChaosEvents",
+    "ai_chaos_events",
+    "ChaosEvent",
+]
+
 
 class AIGameEngine:
     """
@@ -36,13 +60,21 @@ class AIGameEngine:
             "ai_personas": True,
             "ai_reports": True,
         }
+        self._refresh_enabled_features()
+
+    def _refresh_enabled_features(self):
+        """Rebuild the cached set of enabled features after a flag changes."""
+        self._enabled_features = tuple(
+            feature for feature, enabled in self.features_enabled.items() if enabled
+        )
+        self._enabled_set = frozenset(self._enabled_features)
 
     async def initialize_game_with_ai(self, session_id: int, player_count: int) -> str:
         """Initialize a game with full AI integration."""
         logger.info(
             f"initialize_game_with_ai called with session_id={session_id}, player_count={player_count}"
         )
-        if not self.features_enabled["ai_narrative"]:
+        if "ai_narrative" not in self._enabled_set:
             return "🎮 **Game Started**\n\nWelcome to the Impostor Game!"
 
         # Generate AI game introduction
@@ -57,32 +89,48 @@ class AIGameEngine:
     ) -> Dict[int, str]:
         """Assign AI-generated personas to players."""
         logger.debug(
-            f"assign_ai_personas called with session_id={session_id}, player_ids={player_ids}"
+            "assign_ai_personas called with session_id=%s, player_ids=%s",
+            session_id,
+            player_ids,
         )
-        if not self.features_enabled["ai_personas"]:
+        if "ai_personas" not in self._enabled_set:
             return {}
 
         return await self.game_master.assign_player_personas(session_id, player_ids)
 
-    async def generate_ai_task(self, session_id: int, player_id: int, role: str) -> str:
+    async def generate_ai_task(
+        self,
+        session_id: int,
+        player_id: int,
+        role: str,
+        player_name: Optional[str] = None,
+    ) -> str:
         """Generate an AI-powered task for a player."""
         logger.debug(
-            f"generate_ai_task called with session_id={session_id}, player_id={player_id}, role={role}"
+            "generate_ai_task called with session_id=%s, player_id=%s, role=%s",
+            session_id,
+            player_id,
+            role,
         )
-        if not self.features_enabled["ai_tasks"]:
+        if "ai_tasks" not in self._enabled_set:
             return "Complete your assigned tasks to help the crew."
 
-        task_data = await self.task_generator.generate_task(session_id, player_id, role)
-        return task_data["description"]
+        task = await self.task_generator.generate_task(
+            session_id, player_id, role, player_name=player_name
+        )
+        return task.description
 
     async def analyze_voting_with_ai(
         self, session_id: int, vote_results: Dict, round_number: int
     ) -> str:
         """Analyze voting behavior with AI."""
         logger.debug(
-            f"analyze_voting_with_ai called with session_id={session_id}, vote_results={vote_results}, round_number={round_number}"
+            "analyze_voting_with_ai called with session_id=%s, vote_results=%s, round_number=%s",
+            session_id,
+            vote_results,
+            round_number,
         )
-        if not self.features_enabled["ai_voting_analysis"]:
+        if "ai_voting_analysis" not in self._enabled_set:
             return ""
 
         return await self.voting_analyzer.analyze_voting_round(
@@ -91,20 +139,33 @@ class AIGameEngine:
 
     async def check_chaos_events(self, session_id: int) -> List[ChaosEvent]:
         """Check for AI-generated chaos events."""
-        logger.debug(f"check_chaos_events called with session_id={session_id}")
-        if not self.features_enabled["ai_chaos_events"]:
+        logger.debug("check_chaos_events called with session_id=%s", session_id)
+        if "ai_chaos_events" not in self._enabled_set:
             return []
 
         return await self.chaos_events.check_for_chaos_events(session_id)
 
+    async def check_chaos_events_batch(
+        self, session_ids: List[int]
+    ) -> Dict[int, List[ChaosEvent]]:
+        """Check for AI-generated chaos events across several sessions."""
+        logger.debug("check_chaos_events_batch called with session_ids=%s", session_ids)
+        if "ai_chaos_events" not in self._enabled_set:
+            return {session_id: [] for session_id in session_ids}
+
+        return await self.chaos_events.check_chaos_events_batch(session_ids)
+
     async def generate_player_report(
         self, session_id: int, player_id: int, game_result: Dict
     ) -> str:
         """Generate AI-powered player report."""
         logger.debug(
-            f"generate_player_report called with session_id={session_id}, player_id={player_id}, game_result={game_result}"
+            "generate_player_report called with session_id=%s, player_id=%s, game_result=%s",
+            session_id,
+            player_id,
+            game_result,
         )
-        if not self.features_enabled["ai_reports"]:
+        if "ai_reports" not in self._enabled_set:
             return f"Game completed. Result: {game_result.get('result', 'Unknown')}"
 
         return await self.game_master.generate_player_report(
@@ -114,9 +175,11 @@ class AIGameEngine:
     async def conclude_game_with_ai(self, session_id: int, game_result: Dict) -> str:
         """Conclude game with AI-generated narrative."""
         logger.debug(
-            f"conclude_game_with_ai called with session_id={session_id}, game_result={game_result}"
+            "conclude_game_with_ai called with session_id=%s, game_result=%s",
+            session_id,
+            game_result,
         )
-        if not self.features_enabled["ai_narrative"]:
+        if "ai_narrative" not in self._enabled_set:
             return "🎮 **Game Over**\n\nThanks for playing!"
 
         return await self.game_master.conclude_game(session_id, game_result)
@@ -124,17 +187,31 @@ class AIGameEngine:
     async def generate_world_lore(self) -> str:
         """Generate AI worldbuilding lore."""
         logger.debug("generate_world_lore called")
-        if not self.features_enabled["ai_narrative"]:
+        if "ai_narrative" not in self._enabled_set:
             return "📚 **Station Log**\n\nWelcome to the space station."
 
         return await self.game_master.generate_world_lore()
 
+    async def generate_world_lore_stream(self) -> AsyncIterator[str]:
+        """Stream AI worldbuilding lore as it is generated."""
+        logger.debug("generate_world_lore_stream called")
+        if "ai_narrative" not in self._enabled_set:
+            yield "📚 **Station Log**\n\nWelcome to the space station."
+            return
+
+        async for chunk in self.game_master.generate_world_lore_stream():
+            yield chunk
+
     def track_player_behavior(
         self, session_id: int, player_id: int, action_type: str, action_data: Dict
     ):
         """Track player behavior for AI analysis."""
         logger.debug(
-            f"track_player_behavior called with session_id={session_id}, player_id={player_id}, action_type={action_type}, action_data={action_data}"
+            "track_player_behavior called with session_id=%s, player_id=%s, action_type=%s, action_data=%s",
+            session_id,
+            player_id,
+            action_type,
+            action_data,
         )
         self.voting_analyzer.track_player_behavior(
             session_id, player_id, action_type, action_data
@@ -143,20 +220,22 @@ class AIGameEngine:
     def get_suspicion_score(self, session_id: int, player_id: int) -> int:
         """Get AI-calculated suspicion score for a player."""
         logger.debug(
-            f"get_suspicion_score called with session_id={session_id}, player_id={player_id}"
+            "get_suspicion_score called with session_id=%s, player_id=%s",
+            session_id,
+            player_id,
         )
         return self.voting_analyzer.get_suspicion_score(session_id, player_id)
 
     async def generate_suspicion_leaderboard(self, session_id: int) -> str:
         """Generate AI-powered suspicion leaderboard."""
         logger.debug(
-            f"generate_suspicion_leaderboard called with session_id={session_id}"
+            "generate_suspicion_leaderboard called with session_id=%s", session_id
         )
         return await self.voting_analyzer.generate_suspicion_leaderboard(session_id)
 
     def get_ai_stats(self, session_id: int) -> Dict:
         """Get comprehensive AI statistics for a session."""
-        logger.debug(f"get_ai_stats called with session_id={session_id}")
+        logger.debug("get_ai_stats called with session_id=%s", session_id)
         stats = {
             "game_master": self.game_master.get_game_stats(session_id),
             "task_stats": self.task_generator.get_task_progress(
@@ -172,28 +251,28 @@ class AIGameEngine:
 
     def enable_feature(self, feature_name: str):
         """Enable a specific AI feature."""
-        logger.debug(f"enable_feature called with feature_name={feature_name}")
+        logger.debug("enable_feature called with feature_name=%s", feature_name)
         if feature_name in self.features_enabled:
             self.features_enabled[feature_name] = True
+            self._refresh_enabled_features()
             logger.info(f"Enabled AI feature: {feature_name}")
 
     def disable_feature(self, feature_name: str):
         """Disable a specific AI feature."""
-        logger.debug(f"disable_feature called with feature_name={feature_name}")
+        logger.debug("disable_feature called with feature_name=%s", feature_name)
         if feature_name in self.features_enabled:
             self.features_enabled[feature_name] = False
+            self._refresh_enabled_features()
             logger.info(f"Disabled AI feature: {feature_name}")
 
     def get_enabled_features(self) -> List[str]:
         """Get list of enabled AI features."""
         logger.debug("get_enabled_features called")
-        return [
-            feature for feature, enabled in self.features_enabled.items() if enabled
-        ]
+        return list(self._enabled_features)
 
     def cleanup_session(self, session_id: int):
         """Clean up all AI data for a session."""
-        logger.debug(f"cleanup_session called with session_id={session_id}")
+        logger.debug("cleanup_session called with session_id=%s", session_id)
         self.game_master._cleanup_game(session_id)
         self.task_generator.cleanup_session_tasks(session_id)
         self.voting_analyzer.cleanup_session_analysis(session_id)
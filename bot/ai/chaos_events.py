@@ -4,19 +4,75 @@ AI Chaos Events - Random dramatic events to add excitement and unpredictability.
 
 import random
 import asyncio
+import heapq
+import inspect
+import itertools
+import time
+from collections import Counter, deque
 from typing import Dict, List, Optional, Tuple, Callable
-from datetime import datetime, timedelta
+from datetime import datetime
 import logging
+from sqlalchemy import func, select
 from bot.ai.llm_client import ai_client
-from bot.database import SessionLocal
-from bot.database.models import GameSession, PlayerGameLink
+from bot.database import engine
+from bot.database.models import PlayerGameLink
 
 logger = logging.getLogger(__name__)
 
+# Effect templates per event type; special_rules is copied per event
+_DEFAULT_EFFECTS = {
+    "affects_voting": False,
+    "affects_tasks": False,
+    "affects_communication": False,
+    "special_rules": (),
+}
+_EFFECT_TEMPLATES = {
+    "system_failure": {
+        **_DEFAULT_EFFECTS,
+        "affects_tasks": True,
+        "special_rules": ("Task completion takes 50% longer",),
+    },
+    "ai_intervention": {
+        **_DEFAULT_EFFECTS,
+        "affects_voting": True,
+        "special_rules": ("AI casts a mystery vote",),
+    },
+    "mystery_event": {
+        **_DEFAULT_EFFECTS,
+        "affects_communication": True,
+        "special_rules": ("Some messages are scrambled",),
+    },
+    "environmental": {
+        **_DEFAULT_EFFECTS,
+        "affects_tasks": True,
+        "affects_voting": True,
+        "special_rules": ("All actions have random delays",),
+    },
+}
+
+_EVENT_NAMES = {
+    "system_failure": "🚨 System Failure",
+    "ai_intervention": "🤖 AI Intervention",
+    "mystery_event": "❓ Mystery Event",
+    "environmental": "🌪️ Environmental Hazard",
+}
+
 
 class ChaosEvent:
     """Represents a chaos event that can occur during gameplay."""
 
+    __slots__ = (
+        "event_id",
+        "name",
+        "description",
+        "event_type",
+        "duration",
+        "effects",
+        "triggered_at",
+        "expires_at",
+        "active",
+    )
+
     def __init__(
         self,
         event_id: str,
@@ -35,18 +91,20 @@ class ChaosEvent:
         self.duration = duration  # seconds
         self.effects = effects
         self.triggered_at = None
+        self.expires_at: Optional[float] = None  # time.monotonic() deadline
         self.active = False
 
     def activate(self):
         """Activate the chaos event."""
         self.triggered_at = datetime.now()
+        self.expires_at = time.monotonic() + self.duration
         self.active = True
 
     def is_expired(self) -> bool:
         """Check if the event has expired."""
-        if not self.triggered_at:
+        if self.expires_at is None:
             return False
-        return datetime.now() - self.triggered_at > timedelta(seconds=self.duration)
+        return time.monotonic() > self.expires_at
 
 
 class AIChaosEvents:
@@ -54,9 +112,24 @@ class AIChaosEvents:
 
     def __init__(self):
         self.active_events = {}  # session_id -> [ChaosEvent]
-        self.event_history = {}  # session_id -> [event_data]
-        self.event_timers = {}  # session_id -> next_event_time
+        # session_id -> heap of (expires_at, event_id)
+        self._expiry_heap: Dict[int, list] = {}
+        self.event_history = {}  # session_id -> deque of recent event_data
+        self.history_limit = 256
+        self._stats_counters = {}  # session_id -> running totals for get_chaos_stats
+        self.event_timers = {}  # session_id -> monotonic timestamp
         self.event_callbacks = {}  # event_type -> callback_function
+        self._event_counter = itertools.count(1)  # unique suffix for event ids
+
+        # Short-lived cache of game context to avoid a DB round-trip per poll
+        self.context_ttl = 5.0  # seconds
+        self._ctx_cache: Dict[int, Tuple[float, Dict]] = {}
+
+        # Generated descriptions reused for similar game states
+        self.description_ttl = 300  # seconds
+        self.description_cache_size = 256
+        self.descriptions_per_key = 3  # variants kept per key before reuse
+        self._desc_cache: Dict[Tuple[str, int], Tuple[float, List[str]]] = {}
 
         # Event templates
         self.event_templates = {
@@ -91,11 +164,11 @@ class AIChaosEvents:
 
     async def check_for_chaos_events(self, session_id: int) -> List[ChaosEvent]:
         """Check if any chaos events should be triggered."""
-        triggered_events = []
+        # Cheap synchronous guard; most polls end here
+        if not self._fast_poll(session_id):
+            return []
 
-        # Check if it's time for an event
-        if not self._should_trigger_event(session_id):
-            return triggered_events
+        triggered_events = []
 
         # Determine event type based on probabilities
         event_type = self._select_event_type()
@@ -103,25 +176,64 @@ class AIChaosEvents:
         # Generate and trigger event
         event = await self._generate_chaos_event(session_id, event_type)
         if event:
-            event.activate()
+            await self._trigger_event(session_id, event)
             triggered_events.append(event)
 
-            # Store in active events
-            if session_id not in self.active_events:
-                self.active_events[session_id] = []
-            self.active_events[session_id].append(event)
+        return triggered_events
 
-            # Update timer
-            self._update_event_timer(session_id, event_type)
+    async def check_chaos_events_batch(
+        self, session_ids: List[int]
+    ) -> Dict[int, List[ChaosEvent]]:
+        """Check several sessions at once, generating all due events together."""
+        triggered = {session_id: [] for session_id in session_ids}
+
+        # Synchronous pass over the timers; no awaits for sessions not due
+        due = [session_id for session_id in session_ids if self._fast_poll(session_id)]
+        if not due:
+            return triggered
+
+        event_types = [self._select_event_type() for _ in due]
+        # One failing session must not discard the events generated for the rest
+        events = await asyncio.gather(
+            *(
+                self._generate_chaos_event(session_id, event_type)
+                for session_id, event_type in zip(due, event_types)
+            ),
+            return_exceptions=True,
+        )
 
-            # Log event
-            self._log_event(session_id, event)
+        for session_id, event in zip(due, events):
+            if isinstance(event, BaseException):
+                logger.error(
+                    "Chaos event generation failed for session %s: %s",
+                    session_id,
+                    event,
+                )
+            elif event:
+                await self._trigger_event(session_id, event)
+                triggered[session_id].append(event)
 
-            # Execute callback if registered
-            if event_type in self.event_callbacks:
-                await self.event_callbacks[event_type](session_id, event)
+        return triggered
 
-        return triggered_events
+    async def _trigger_event(self, session_id: int, event: ChaosEvent):
+        """Activate a generated event and record it for the session."""
+        event.activate()
+
+        # Store in active events
+        self.add_active_event(session_id, event)
+
+        # Update timer
+        self._update_event_timer(session_id, event.event_type)
+
+        # Log event
+        self._log_event(session_id, event)
+
+        # Execute callback if registered; only coroutine callbacks are awaited
+        callback = self.event_callbacks.get(event.event_type)
+        if callback is not None:
+            result = callback(session_id, event)
+            if inspect.isawaitable(result):
+                await result
 
     async def generate_chaos_event(
         self, session_id: int, event_type: str = None
@@ -135,60 +247,80 @@ class AIChaosEvents:
     def get_active_events(self, session_id: int) -> List[ChaosEvent]:
         """Get currently active chaos events for a session."""
         events = self.active_events.get(session_id, [])
-        # Filter out expired events
-        active_events = [event for event in events if not event.is_expired()]
-
-        # Update active events list
-        self.active_events[session_id] = active_events
-
-        return active_events
+        heap = self._expiry_heap.get(session_id)
+        if not heap:
+            return events
+
+        # Pop only the events whose expiry has passed
+        now = time.monotonic()
+        expired_ids = set()
+        while heap and heap[0][0] < now:
+            expired_ids.add(heapq.heappop(heap)[1])
+
+        if expired_ids:
+            events = [event for event in events if event.event_id not in expired_ids]
+            self.active_events[session_id] = events
+
+        return events
+
+    def add_active_event(self, session_id: int, event: ChaosEvent):
+        """Track an activated event until it expires."""
+        if session_id not in self.active_events:
+            self.active_events[session_id] = []
+        self.active_events[session_id].append(event)
+        heapq.heappush(
+            self._expiry_heap.setdefault(session_id, []),
+            (event.expires_at, event.event_id),
+        )
 
     def register_event_callback(self, event_type: str, callback: Callable):
-        """Register a callback function for a specific event type."""
+        """Register a callback function for a specific event type.
+
+        The callback may be a plain function or a coroutine function.
+        """
         self.event_callbacks[event_type] = callback
 
     def get_event_history(self, session_id: int) -> List[Dict]:
         """Get chaos event history for a session."""
-        return self.event_history.get(session_id, [])
+        return list(self.event_history.get(session_id, ()))
 
     def get_chaos_stats(self, session_id: int) -> Dict:
         """Get chaos event statistics for a session."""
-        history = self.get_event_history(session_id)
+        counters = self._stats_counters.get(session_id)
+        if not counters:
+            return {
+                "total_events": 0,
+                "events_by_type": {},
+                "total_duration": 0,
+                "most_common_type": None,
+            }
 
-        stats = {
-            "total_events": len(history),
-            "events_by_type": {},
-            "total_duration": 0,
-            "most_common_type": None,
+        by_type = counters["by_type"]
+        return {
+            "total_events": counters["total"],
+            "events_by_type": dict(by_type),
+            "total_duration": counters["total_duration"],
+            "most_common_type": by_type.most_common(1)[0][0],
         }
 
-        for event_data in history:
-            event_type = event_data["event_type"]
-            if event_type not in stats["events_by_type"]:
-                stats["events_by_type"][event_type] = 0
-            stats["events_by_type"][event_type] += 1
-
-            stats["total_duration"] += event_data.get("duration", 0)
-
-        if stats["events_by_type"]:
-            stats["most_common_type"] = max(
-                stats["events_by_type"].items(), key=lambda x: x[1]
-            )[0]
-
-        return stats
-
     async def _generate_chaos_event(
         self, session_id: int, event_type: str
     ) -> Optional[ChaosEvent]:
         """Generate a chaos event of the specified type."""
         # Get game context
-        game_context = self._get_game_context(session_id)
-
-        # Generate event description using AI
-        event_data = await ai_client.generate_chaos_event(
-            game_state=game_context["state"], player_count=game_context["alive_count"]
-        )
-        description = event_data.get("description", "A mysterious event unfolds.")
+        game_context = await self._get_game_context(session_id)
+
+        # Reuse a description generated for a similar game state if possible
+        cache_key = (event_type, game_context["alive_count"] // 2)
+        description = self._get_cached_description(cache_key)
+        if description is None:
+            # Generate event description using AI
+            event_data = await ai_client.generate_chaos_event(
+                game_state=game_context["state"],
+                player_count=game_context["alive_count"],
+            )
+            description = event_data.get("description", "A mysterious event unfolds.")
+            self._cache_description(cache_key, description)
 
         # Determine duration
         template = self.event_templates.get(event_type, {})
@@ -199,7 +331,7 @@ class AIChaosEvents:
         effects = self._generate_event_effects(event_type, duration)
 
         # Create event
-        event_id = f"chaos_{session_id}_{event_type}_{int(datetime.now().timestamp())}"
+        event_id = f"chaos_{session_id}_{event_type}_{next(self._event_counter)}"
         event_name = self._get_event_name(event_type)
 
         chaos_event = ChaosEvent(
@@ -215,41 +347,71 @@ class AIChaosEvents:
 
         return chaos_event
 
-    def _should_trigger_event(self, session_id: int) -> bool:
-        """Check if a chaos event should be triggered."""
-        if session_id not in self.event_timers:
-            self.event_timers[session_id] = datetime.now()
+    def _get_cached_description(self, key: Tuple[str, int]) -> Optional[str]:
+        """Return a cached description once enough variants exist for the key."""
+        cached = self._desc_cache.get(key)
+        if not cached:
+            return None
+
+        created_at, descriptions = cached
+        if time.monotonic() - created_at >= self.description_ttl:
+            del self._desc_cache[key]
+            return None
+
+        if len(descriptions) < self.descriptions_per_key:
+            return None
+        return random.choice(descriptions)
+
+    def _cache_description(self, key: Tuple[str, int], description: str):
+        """Store a generated description variant for the key."""
+        cached = self._desc_cache.get(key)
+        if cached:
+            if len(cached[1]) < self.descriptions_per_key:
+                cached[1].append(description)
+            return
+
+        if len(self._desc_cache) >= self.description_cache_size:
+            # Evict the oldest entry
+            del self._desc_cache[next(iter(self._desc_cache))]
+        self._desc_cache[key] = (time.monotonic(), [description])
+
+    def _fast_poll(self, session_id: int) -> bool:
+        """Check, without awaiting, whether a chaos event may be triggered."""
+        now = time.monotonic()
+        last_event = self.event_timers.get(session_id)
+        if last_event is None:
+            self.event_timers[session_id] = now
             return False
 
-        last_event = self.event_timers[session_id]
-        time_since_event = datetime.now() - last_event
-
         # Minimum interval between events
         min_interval = 120  # 2 minutes
-        return time_since_event.total_seconds() > min_interval
+        return now - last_event > min_interval
 
-    def _select_event_type(self) -> str:
-        """Select an event type based on probabilities."""
-        event_types = list(self.event_templates.keys())
-        probabilities = [self.event_templates[et]["probability"] for et in event_types]
+    @property
+    def event_templates(self) -> Dict[str, Dict]:
+        """Event templates keyed by event type."""
+        return self._event_templates
 
-        # Normalize probabilities
-        total_prob = sum(probabilities)
-        if total_prob == 0:
-            return random.choice(event_types)
+    @event_templates.setter
+    def event_templates(self, templates: Dict[str, Dict]):
+        self._event_templates = templates
+        self._rebuild_event_weights()
 
-        normalized_probs = [p / total_prob for p in probabilities]
+    def _rebuild_event_weights(self):
+        """Precompute the cumulative weights used by _select_event_type.
 
-        # Select based on probability
-        rand = random.random()
-        cumulative = 0
+        Call again after mutating a template's probability in place.
+        """
+        self._event_types = tuple(self._event_templates.keys())
+        weights = [t["probability"] for t in self._event_templates.values()]
+        self._cum_weights = list(itertools.accumulate(weights))
 
-        for i, prob in enumerate(normalized_probs):
-            cumulative += prob
-            if rand <= cumulative:
-                return event_types[i]
+    def _select_event_type(self) -> str:
+        """Select an event type based on probabilities."""
+        if not self._cum_weights or self._cum_weights[-1] <= 0:
+            return random.choice(self._event_types)
 
-        return event_types[-1]  # Fallback
+        return random.choices(self._event_types, cum_weights=self._cum_weights, k=1)[0]
 
     def _update_event_timer(self, session_id: int, event_type: str):
         """Update the event timer for a session."""
@@ -259,81 +421,59 @@ class AIChaosEvents:
 
         # Random interval between min and max
         interval = random.randint(min_interval, max_interval)
-        next_event = datetime.now() + timedelta(seconds=interval)
-
-        self.event_timers[session_id] = next_event
+        self.event_timers[session_id] = time.monotonic() + interval
 
     def _generate_event_effects(self, event_type: str, duration: int) -> Dict:
         """Generate effects for a chaos event."""
-        effects = {
+        base = _EFFECT_TEMPLATES.get(event_type, _DEFAULT_EFFECTS)
+        return {
             "duration": duration,
-            "affects_voting": False,
-            "affects_tasks": False,
-            "affects_communication": False,
-            "special_rules": [],
+            **base,
+            "special_rules": list(base["special_rules"]),
         }
 
-        if event_type == "system_failure":
-            effects["affects_tasks"] = True
-            effects["special_rules"].append("Task completion takes 50% longer")
-
-        elif event_type == "ai_intervention":
-            effects["affects_voting"] = True
-            effects["special_rules"].append("AI casts a mystery vote")
-
-        elif event_type == "mystery_event":
-            effects["affects_communication"] = True
-            effects["special_rules"].append("Some messages are scrambled")
-
-        elif event_type == "environmental":
-            effects["affects_tasks"] = True
-            effects["affects_voting"] = True
-            effects["special_rules"].append("All actions have random delays")
-
-        return effects
-
     def _get_event_name(self, event_type: str) -> str:
         """Get a display name for an event type."""
-        names = {
-            "system_failure": "🚨 System Failure",
-            "ai_intervention": "🤖 AI Intervention",
-            "mystery_event": "❓ Mystery Event",
-            "environmental": "🌪️ Environmental Hazard",
-        }
-        return names.get(event_type, "⚡ Chaos Event")
+        return _EVENT_NAMES.get(event_type, "⚡ Chaos Event")
 
-    def _get_game_context(self, session_id: int) -> Dict:
+    async def _get_game_context(self, session_id: int) -> Dict:
         """Get current game context for event generation."""
-        db = SessionLocal()
-        try:
-            # Get alive player count
-            alive_count = (
-                db.query(PlayerGameLink)
-                .filter(
-                    PlayerGameLink.session_id == session_id,
-                    PlayerGameLink.left_at.is_(None),
-                )
-                .count()
+        cached = self._ctx_cache.get(session_id)
+        if cached and time.monotonic() - cached[0] < self.context_ttl:
+            return cached[1]
+
+        # Run the blocking query off the event loop
+        alive_count = await asyncio.to_thread(self._count_alive, session_id)
+        context = {
+            "state": f"Active game with {alive_count} players",
+            "alive_count": alive_count,
+        }
+        self._ctx_cache[session_id] = (time.monotonic(), context)
+        return context
+
+    def _count_alive(self, session_id: int) -> int:
+        """Count the players still in a session."""
+        # Read-only lookup on a plain connection; no ORM session or identity map
+        stmt = (
+            select(func.count())
+            .select_from(PlayerGameLink)
+            .where(
+                PlayerGameLink.session_id == session_id,
+                PlayerGameLink.left_at.is_(None),
             )
-
-            # Get game session info
-            session = db.query(GameSession).filter(GameSession.id == session_id).first()
-            rounds = 0
-            if session and session.game_state:
-                rounds = session.game_state.get("rounds", 0)
-
-            return {
-                "state": f"Active game with {alive_count} players",
-                "alive_count": alive_count,
-                "rounds": rounds,
-            }
-        finally:
-            db.close()
+        )
+        with engine.connect() as conn:
+            return conn.execute(stmt).scalar() or 0
 
     def _log_event(self, session_id: int, event: ChaosEvent):
         """Log a chaos event to history."""
         if session_id not in self.event_history:
-            self.event_history[session_id] = []
+            self.event_history[session_id] = deque(maxlen=self.history_limit)
+            self._stats_counters[session_id] = {
+                "by_type": Counter(),
+                "total_duration": 0,
+                "total": 0,
+            }
 
         event_data = {
             "event_id": event.event_id,
@@ -347,6 +487,11 @@ class AIChaosEvents:
 
         self.event_history[session_id].append(event_data)
 
+        counters = self._stats_counters[session_id]
+        counters["by_type"][event.event_type] += 1
+        counters["total_duration"] += event.duration
+        counters["total"] += 1
+
     def _register_default_callbacks(self):
         """Register default callback functions for events."""
         # System failure callback
@@ -361,22 +506,22 @@ class AIChaosEvents:
         # Environmental callback
         self.register_event_callback("environmental", self._environmental_callback)
 
-    async def _system_failure_callback(self, session_id: int, event: ChaosEvent):
+    def _system_failure_callback(self, session_id: int, event: ChaosEvent):
         """Callback for system failure events."""
         logger.info(f"System failure event triggered in session {session_id}")
         # Could implement task slowdown logic here
 
-    async def _ai_intervention_callback(self, session_id: int, event: ChaosEvent):
+    def _ai_intervention_callback(self, session_id: int, event: ChaosEvent):
         """Callback for AI intervention events."""
         logger.info(f"AI intervention event triggered in session {session_id}")
         # Could implement AI vote casting here
 
-    async def _mystery_event_callback(self, session_id: int, event: ChaosEvent):
+    def _mystery_event_callback(self, session_id: int, event: ChaosEvent):
         """Callback for mystery events."""
         logger.info(f"Mystery event triggered in session {session_id}")
         # Could implement message scrambling here
 
-    async def _environmental_callback(self, session_id: int, event: ChaosEvent):
+    def _environmental_callback(self, session_id: int, event: ChaosEvent):
         """Callback for environmental events."""
         logger.info(f"Environmental event triggered in session {session_id}")
         # Could implement random delays here
@@ -386,12 +531,18 @@ class AIChaosEvents:
         if session_id in self.active_events:
             del self.active_events[session_id]
 
+        self._expiry_heap.pop(session_id, None)
+
         if session_id in self.event_history:
             del self.event_history[session_id]
 
+        self._stats_counters.pop(session_id, None)
+
         if session_id in self.event_timers:
             del self.event_timers[session_id]
 
+        self._ctx_cache.pop(session_id, None)
+
         logger.info(f"Cleaned up chaos events data for session {session_id}")
 
 
@@ -5,11 +5,13 @@ AI Game Master - Dynamic narrative generation and game flow management.
 import asyncio
 import json
 import logging
-from typing import Dict, List, Optional, Any, Tuple
+import random
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional, Any, Tuple
 from datetime import datetime
 from bot.ai.llm_client import ai_client
 from bot.database import SessionLocal
-from bot.database.models import GameSession, PlayerGameLink, DiscussionLog
+from bot.database.models import GameSession, PlayerGameLink, DiscussionLog, GameLog
 
 logger = logging.getLogger(__name__)
 
@@ -20,8 +22,10 @@ class AIGameMaster:
     def __init__(self):
         logger.debug("Initializing AIGameMaster")
         self.current_games = {}  # Track active games
-        self.game_history = []  # Store game events for lore generation
-        self.station_names = [
+        # Recent game summaries for lore generation, oldest dropped first
+        self.game_history = deque(maxlen=1000)
+        self._rng = random.Random()
+        self.station_names = (
             "Nebula Prime",
             "Stellar Outpost",
             "Void Station",
@@ -34,7 +38,7 @@ class AIGameMaster:
             "Quantum Hub",
             "Stellar Nexus",
             "Void Gateway",
-        ]
+        )
 
         # Game themes and settings
         self.themes = {
@@ -45,6 +49,22 @@ class AIGameMaster:
             "scientific": "research laboratory",
         }
 
+        # Local narratives for routine moments that don't need an LLM call
+        self.templates = {
+            "round_start": (
+                "The lights flicker on {station} as round {round} begins. {alive} crew members remain, and not all of them can be trusted.",
+                "Round {round}. The hum of {station}'s reactor masks quiet footsteps. {alive} survivors eye each other warily.",
+                "Another cycle dawns on {station}. {dead} have fallen so far; {alive} remain to find the truth in round {round}.",
+                "Alarms fall silent as round {round} starts. Somewhere among the {alive} survivors on {station}, an impostor waits.",
+            ),
+        }
+
+        # Game events are persisted in batches by a background worker
+        self.event_batch_size = 50
+        self.event_flush_interval = 5.0
+        self._event_queue: Optional[asyncio.Queue] = None
+        self._event_worker: Optional[asyncio.Task] = None
+
     async def start_game_session(
         self, game_id: str, players: List[Dict], game_type: str = "standard"
     ) -> Dict[str, Any]:
@@ -63,13 +83,24 @@ class AIGameMaster:
                 theme=self.themes.get(game_type, "space station"),
             )
 
-            # Generate player personas
+            # Generate player personas concurrently
+            personas = await asyncio.gather(
+                *(
+                    ai_client.generate_player_persona(
+                        player_name=player["name"],
+                        role="crewmate",  # Will be updated when roles are assigned
+                    )
+                    for player in players
+                ),
+                return_exceptions=True,
+            )
             player_personas = {}
-            for player in players:
-                persona = await ai_client.generate_player_persona(
-                    player_name=player["name"],
-                    role="crewmate",  # Will be updated when roles are assigned
-                )
+            for player, persona in zip(players, personas):
+                if isinstance(persona, Exception):
+                    logger.error(
+                        f"Persona generation failed for {player['name']}: {persona}"
+                    )
+                    persona = ai_client.get_fallback_persona(player["name"])
                 player_personas[player["id"]] = persona
 
             # Create game session
@@ -118,28 +149,45 @@ class AIGameMaster:
                 return "Roles have been assigned. Good luck, crew!"
 
             # Update player personas with roles
+            revealed = []
             for player_id, role in roles.items():
                 if player_id in session["player_personas"]:
                     persona = session["player_personas"][player_id]
                     persona["role"] = role
+                    revealed.append(persona)
 
-                    # Generate role-specific narrative
-                    role_narrative = await ai_client.generate_response(
-                        f"Generate a brief, dramatic narrative for {persona['name']} discovering they are a {role}",
-                        model_type="narrative",
-                        max_tokens=80,
-                    )
-                    persona["role_revelation"] = role_narrative
-
-            # Generate overall role assignment narrative
             impostor_count = sum(1 for role in roles.values() if role == "impostor")
             crew_count = len(roles) - impostor_count
 
-            narrative = await ai_client.generate_response(
-                f"Create a dramatic narrative for role assignment in a game with {crew_count} crewmates and {impostor_count} impostors",
-                model_type="narrative",
-                max_tokens=120,
+            # Generate the overall and role-specific narratives concurrently
+            narrative, *revelations = await asyncio.gather(
+                ai_client.generate_response(
+                    f"Create a dramatic narrative for role assignment in a game with {crew_count} crewmates and {impostor_count} impostors",
+                    model_type="narrative",
+                    max_tokens=120,
+                ),
+                *(
+                    ai_client.generate_response(
+                        f"Generate a brief, dramatic narrative for {persona['name']} discovering they are a {persona['role']}",
+                        model_type="narrative",
+                        max_tokens=80,
+                    )
+                    for persona in revealed
+                ),
+                return_exceptions=True,
             )
+            for persona, role_narrative in zip(revealed, revelations):
+                if isinstance(role_narrative, Exception):
+                    logger.error(
+                        f"Role narrative failed for {persona['name']}: {role_narrative}"
+                    )
+                    role_narrative = (
+                        f"{persona['name']} receives their orders in silence."
+                    )
+                persona["role_revelation"] = role_narrative
+
+            if isinstance(narrative, Exception):
+                raise narrative
 
             return f"🎭 **Role Assignment**\n\n{narrative}"
 
@@ -174,6 +222,16 @@ class AIGameMaster:
                 },
             )
 
+            # Mid-game rounds with a full crew are routine; skip the LLM
+            if round_number > 1 and len(alive_players) > 3:
+                narrative = self._rng.choice(self.templates["round_start"]).format(
+                    round=round_number,
+                    station=session["station_name"],
+                    alive=len(alive_players),
+                    dead=len(dead_players),
+                )
+                return f"🔄 **Round {round_number}**\n\n{narrative}"
+
             # Generate round narrative
             prompt = f"""Create a dramatic narrative for round {round_number} of an impostor game:
 Alive players: {len(alive_players)}
@@ -259,9 +317,7 @@ Make it cinematic and emotional."""
             # Determine if chaos event should trigger
             if trigger == "random":
                 # 15% chance of chaos event per round
-                import random
-
-                if random.random() > 0.15:
+                if self._rng.random() > 0.15:
                     return None
 
             # Generate chaos event
@@ -305,17 +361,25 @@ Make it epic and memorable."""
                 prompt, model_type="narrative", max_tokens=150
             )
 
-            # Generate player reports
-            player_reports = {}
-            for player in session["players"]:
-                player_stats = game_stats.get(str(player["id"]), {})
-                report = await ai_client.generate_player_report(
-                    player_name=player["name"],
-                    game_stats=player_stats,
-                    role=player_stats.get("role", "unknown"),
-                    won=player_stats.get("won", False),
-                )
-                player_reports[player["id"]] = report
+            # Generate all player reports in one batched request
+            players_stats = [
+                game_stats.get(str(player["id"]), {}) for player in session["players"]
+            ]
+            reports = await ai_client.generate_player_reports_batch(
+                [
+                    {
+                        "player_name": player["name"],
+                        "game_stats": player_stats,
+                        "role": player_stats.get("role", "unknown"),
+                        "won": player_stats.get("won", False),
+                    }
+                    for player, player_stats in zip(session["players"], players_stats)
+                ]
+            )
+            player_reports = {
+                player["id"]: report
+                for player, report in zip(session["players"], reports)
+            }
 
             # Log game end
             self._log_game_event(
@@ -367,6 +431,19 @@ Make it epic and memorable."""
             logger.error(f"Failed to generate world lore: {e}")
             return "The station's history is shrouded in mystery..."
 
+    async def generate_world_lore_stream(self, season: int = 1) -> AsyncIterator[str]:
+        """Stream world lore, yielding the header first and then lore text."""
+        logger.info(f"generate_world_lore_stream called with season={season}")
+        if not self.game_history:
+            yield "The station awaits its first mission..."
+            return
+
+        yield f"📚 **Station Archives - Season {season}**\n\n"
+        async for chunk in ai_client.generate_world_lore_stream(
+            game_history=self.game_history, season=season
+        ):
+            yield chunk
+
     def get_player_persona(self, game_id: str, player_id: int) -> Optional[Dict]:
         """Get the AI-generated persona for a player."""
         session = self.current_games.get(game_id)
@@ -376,22 +453,89 @@ Make it epic and memorable."""
 
     def _get_random_station_name(self) -> str:
         """Get a random space station name."""
-        import random
-
-        return random.choice(self.station_names)
+        return self._rng.choice(self.station_names)
 
     def _log_game_event(self, game_id: str, event_type: str, data: Dict):
         """Log a game event for history tracking."""
+        session = self.current_games.get(game_id)
+        if not session:
+            return
+
         event = {
             "game_id": game_id,
             "event_type": event_type,
             "data": data,
             "timestamp": datetime.now(),
         }
-
-        session = self.current_games.get(game_id)
-        if session:
-            session["events"].append(event)
+        session["events"].append(event)
+        self._queue_event(event)
+
+    def _queue_event(self, event: Dict):
+        """Queue an event for the background database writer."""
+        queue = self._event_queue
+        if queue is None:
+            queue = self._event_queue = asyncio.Queue()
+        queue.put_nowait(event)
+
+        if self._event_worker is None or self._event_worker.done():
+            try:
+                self._event_worker = asyncio.get_running_loop().create_task(
+                    self._drain_events(queue)
+                )
+            except RuntimeError:
+                # No event loop (e.g. sync callers); the next async log or
+                # flush() writes it
+                pass
+
+    async def flush(self):
+        """Write every queued game event; await before shutting down."""
+        worker = self._event_worker
+        if worker is not None and not worker.done():
+            await worker
+        # Events queued while no event loop was running have no worker
+        if self._event_queue is not None and not self._event_queue.empty():
+            await self._drain_events(self._event_queue)
+
+    async def _drain_events(self, queue: asyncio.Queue):
+        """Flush queued events in batches; exits once the queue is empty."""
+        loop = asyncio.get_running_loop()
+        while not queue.empty():
+            batch = [queue.get_nowait()]
+            deadline = loop.time() + self.event_flush_interval
+            while len(batch) < self.event_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await asyncio.to_thread(self._write_events, batch)
+
+    def _write_events(self, events: List[Dict]):
+        """Persist a batch of game events in one transaction."""
+        logger.debug("_write_events called with %s events", len(events))
+        db = SessionLocal()
+        try:
+            db.bulk_save_objects(
+                [
+                    # game_id is not necessarily a game_sessions.id, so it is
+                    # kept in the payload rather than in the foreign key
+                    GameLog(
+                        timestamp=event["timestamp"],
+                        event_type=event["event_type"],
+                        event_data={"game_id": event["game_id"], "data": event["data"]},
+                    )
+                    for event in events
+                ]
+            )
+            db.commit()
+        except Exception as e:
+            logger.error(f"Failed to log game events: {e}")
+            db.rollback()
+        finally:
+            db.close()
 
     def _get_fallback_session(
         self, game_id: str, players: List[Dict], game_type: str
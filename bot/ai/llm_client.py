@@ -3,15 +3,301 @@ AI LLM Client - Centralized AI integration for all game features
 """
 
 import asyncio
+import hashlib
+import importlib.util
+import itertools
 import json
 import logging
-from typing import Dict, List, Optional, Any, Tuple
-from datetime import datetime
-from huggingface_hub import InferenceClient
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from enum import Enum
+from typing import AsyncIterator, Dict, List, Optional, Any, Sequence, Tuple
+import httpx
+import orjson
+from tenacity import (
+    AsyncRetrying,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_exponential,
+)
 import os
 
 logger = logging.getLogger(__name__)
 
+# HTTP/2 needs the optional h2 package (httpx[http2])
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class ModelType(str, Enum):
+    """Model roles; members compare equal to their plain string names."""
+
+    NARRATIVE = "narrative"
+    REASONING = "reasoning"
+    CREATIVE = "creative"
+    FAST = "fast"
+
+    def __str__(self) -> str:
+        return self.value
+
+
+# Instruction wrappers for each model type; {prompt} is filled in per call
+_PROMPT_TEMPLATES = {
+    "narrative": """<s>[INST] You are a creative game master for a space-themed impostor game. 
+Generate engaging, dramatic narrative content. Keep responses under 150 words.
+Context: {prompt} [/INST]""",
+    "reasoning": """<s>[INST] You are an AI detective analyzing player behavior in a social deduction game.
+Provide logical, analytical insights. Be concise and observant.
+Analysis request: {prompt} [/INST]""",
+    "creative": """<s>[INST] You are a creative AI generating unique game content, personas, and tasks.
+Be imaginative, fun, and engaging. Keep responses under 100 words.
+Request: {prompt} [/INST]""",
+    # ChatML, as used by the small instruct model behind "fast"
+    "fast": """<|im_start|>system
+Provide a quick, helpful response for a game scenario. Be concise and direct.<|im_end|>
+<|im_start|>user
+{prompt}<|im_end|>
+<|im_start|>assistant
+""",
+}
+
+# Canned replies used when AI is disabled or a request fails
+_FALLBACKS = {
+    "narrative": (
+        "The space station hums with tension as the crew prepares for another mission.",
+        "In the depths of space, trust is the rarest commodity.",
+        "The void between stars holds secrets that could destroy them all.",
+    ),
+    "reasoning": (
+        "The voting patterns suggest careful consideration.",
+        "Player behavior indicates strategic thinking.",
+        "The group dynamics reveal interesting social dynamics.",
+    ),
+    "creative": (
+        "A mysterious task awaits completion.",
+        "The crew faces a challenging mission.",
+        "An opportunity for heroism presents itself.",
+    ),
+    "fast": ("Processing...", "Analyzing...", "Computing..."),
+}
+_RNG = random.Random()
+
+# Instruction markers the models sometimes echo back
+_SPECIAL_TOKENS_RE = re.compile(r"</?s>|\[/?INST\]|<\|im_(?:start|end)\|>")
+
+_JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+_JSON_ARRAY_RE = re.compile(r"\[.*\]", re.DOTALL)
+_JSON_DECODER = json.JSONDecoder()
+
+# max_new_tokens budgeted per player in a batched report request
+_REPORT_TOKENS = 200
+
+
+def _parse_json(response: str, pattern: re.Pattern = _JSON_OBJECT_RE) -> Any:
+    """Parse a JSON reply, skipping any chatter the model adds around it.
+
+    Raises ValueError (orjson.JSONDecodeError) if no JSON can be recovered.
+    """
+    try:
+        return orjson.loads(response)
+    except orjson.JSONDecodeError:
+        match = pattern.search(response)
+        if match is None:
+            raise
+        try:
+            return orjson.loads(match.group(0))
+        except orjson.JSONDecodeError:
+            # Braces in trailing chatter; decode only the first complete value
+            return _JSON_DECODER.raw_decode(response, match.start())[0]
+
+
+def _parse_json_object(response: str, *keys: str) -> Dict[str, Any]:
+    """Parse a JSON object reply and check that it has the expected keys."""
+    parsed = _parse_json(response)
+    if not isinstance(parsed, dict):
+        raise ValueError(f"expected a JSON object, got {type(parsed).__name__}")
+    missing = [key for key in keys if key not in parsed]
+    if missing:
+        raise KeyError(", ".join(missing))
+    return parsed
+
+
+def _is_retryable(error: BaseException) -> bool:
+    """Whether an inference API error is worth retrying."""
+    if isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return False
+
+
+class ResponseCache:
+    """Bounded LRU cache whose entries expire after a fixed TTL."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value, or None if missing or expired."""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            del self._data[key]
+            return None
+
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str):
+        """Store a value, evicting the least recently used entry when full."""
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class DiskResponseCache:
+    """SQLite-backed response cache that survives bot restarts.
+
+    Entries expire by wall-clock time, since monotonic time doesn't carry
+    over between processes. Expired rows are purged when the cache opens.
+    """
+
+    def __init__(self, path: str, ttl: float = 3600):
+        self.path = path
+        self.ttl = ttl
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Accessed from worker threads; the lock serializes use of the connection
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),)
+            )
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value, or None if missing or expired."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return row[0]
+
+    def set(self, key: str, value: str):
+        """Store a value for ttl seconds."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) "
+                "VALUES (?, ?, ?)",
+                (key, value, time.time() + self.ttl),
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class AsyncHFClient:
+    """Async client for the Hugging Face text-generation inference API.
+
+    One pooled connection set is shared by every model. With h2 installed
+    the connections use HTTP/2, so concurrent requests are multiplexed
+    instead of each opening its own connection.
+    """
+
+    API_URL = "https://api-inference.huggingface.co/models/"
+
+    def __init__(
+        self,
+        token: str,
+        timeout: float = 30,
+        max_connections: int = 256,
+        max_keepalive_connections: int = 128,
+        keepalive_expiry: float = 60,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.token = token
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._transport = transport
+        self._http: Optional[httpx.AsyncClient] = None
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """The shared HTTP client, created on first use inside the event loop."""
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                base_url=self.API_URL,
+                headers={"Authorization": f"Bearer {self.token}"},
+                http2=_HTTP2_AVAILABLE,
+                limits=self.limits,
+                timeout=self.timeout,
+                transport=self._transport,
+            )
+        return self._http
+
+    def _payload(self, prompt: str, stream: bool, **parameters) -> Dict[str, Any]:
+        return {"inputs": prompt, "parameters": parameters, "stream": stream}
+
+    async def text_generation(self, prompt: str, *, model: str, **parameters) -> str:
+        """Generate text and return it once the model has finished."""
+        response = await self.http.post(
+            model, content=orjson.dumps(self._payload(prompt, False, **parameters))
+        )
+        response.raise_for_status()
+        return orjson.loads(response.content)[0]["generated_text"]
+
+    async def text_generation_stream(
+        self, prompt: str, *, model: str, **parameters
+    ) -> AsyncIterator[str]:
+        """Yield generated tokens as the server streams them."""
+        async with self.http.stream(
+            "POST",
+            model,
+            content=orjson.dumps(self._payload(prompt, True, **parameters)),
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                # Server-sent events: data:{"token": {"text": ..., "special": ...}}
+                if not line.startswith("data:"):
+                    continue
+                token = orjson.loads(line[5:])["token"]
+                if not token.get("special"):
+                    yield token["text"]
+
+    async def aclose(self):
+        """Close pooled connections."""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
 
 class GameLLMClient:
     """Centralized LLM client for all AI-powered game features."""
@@ -30,29 +316,73 @@ class GameLLMClient:
             "narrative": "mistralai/Mistral-7B-Instruct-v0.1",  # Story generation
             "reasoning": "tiiuae/falcon-7b-instruct",  # Vote analysis, logic
             "creative": "openchat/openchat-3.5-1210",  # Personas, creative tasks
-            "fast": "meta-llama/Llama-2-7b-chat-hf",  # Quick responses
+            "fast": "Qwen/Qwen2.5-1.5B-Instruct",  # Quick responses, small model
         }
+        # Short analysis prompts go to the small "fast" model instead
+        self.small_model_max_prompt = 400  # characters
+        self._build_routes()
 
-        self.clients = {}
+        # Cap in-flight HF requests and bound slow ones
+        self._sem = asyncio.Semaphore(int(os.getenv("HF_MAX_CONCURRENCY", "8")))
+        self.request_timeout = float(os.getenv("HF_REQUEST_TIMEOUT", "30"))
+        # Largest max_new_tokens the inference endpoint accepts
+        self.max_new_tokens = int(os.getenv("HF_MAX_NEW_TOKENS", "1024"))
+        # Retry transient network errors, 429s and 5xx with backoff
+        self.max_attempts = 3
+        self.retry_backoff = 0.5
+
+        self.client = None
         self._initialize_clients()
 
         # Cache for common responses to avoid repeated API calls
-        self.response_cache = {}
         self.cache_ttl = 3600  # 1 hour cache
+        self.response_cache = ResponseCache(maxsize=4096, ttl=self.cache_ttl)
+        # Second-level cache on disk so responses survive restarts
+        self.disk_cache: Optional[DiskResponseCache] = None
+        cache_path = os.getenv("LLM_CACHE_PATH", "cache/llm_cache.sqlite3")
+        if self.enabled and cache_path:
+            try:
+                self.disk_cache = DiskResponseCache(cache_path, ttl=self.cache_ttl)
+            except (OSError, sqlite3.Error) as e:
+                logger.warning("Disk response cache unavailable: %s", e)
+        self._inflight: Dict[str, asyncio.Future] = {}  # cache_key -> pending result
+
+    def _build_routes(self):
+        """Precompute the (model id, prompt template) pair for each model type.
+
+        Call again after changing self.models. Unknown model types use the
+        narrative model with its own [INST] template.
+        """
+        self._routes: Dict[str, Tuple[str, str]] = {
+            model_type.value: (
+                self.models[model_type.value],
+                _PROMPT_TEMPLATES[model_type.value],
+            )
+            for model_type in ModelType
+        }
+        self._default_route = (
+            self.models[ModelType.NARRATIVE],
+            _PROMPT_TEMPLATES[ModelType.NARRATIVE],
+        )
+
+    def _route(self, model_type: str) -> Tuple[str, str]:
+        """Return the (model id, prompt template) pair for a model type."""
+        return self._routes.get(model_type, self._default_route)
 
     def _initialize_clients(self):
-        """Initialize Hugging Face clients for different models."""
+        """Initialize the Hugging Face client shared by all models.
+
+        The model is chosen per request, so every model type reuses the same
+        client and its pooled HTTP connections.
+        """
         if not self.enabled:
             return
 
         try:
-            for model_type, model_name in self.models.items():
-                self.clients[model_type] = InferenceClient(
-                    model=model_name, token=self.hf_token
-                )
+            self.client = AsyncHFClient(self.hf_token, timeout=self.request_timeout)
             logger.info("AI clients initialized successfully")
         except Exception as e:
-            logger.error(f"Failed to initialize AI clients: {e}")
+            logger.error("Failed to initialize AI clients: %s", e)
             self.enabled = False
 
     async def generate_response(
@@ -62,121 +392,279 @@ class GameLLMClient:
         max_tokens: int = 200,
         temperature: float = 0.7,
         cache_key: Optional[str] = None,
+        disable_cache: bool = False,
+        max_length: int = 500,
     ) -> str:
-        """Generate AI response with caching and error handling."""
+        """Generate AI response with caching and error handling.
+
+        Without an explicit cache_key the key is derived from the prompt and
+        generation parameters; pass disable_cache=True for responses that
+        must be fresh on every call. Responses longer than max_length
+        characters are truncated.
+        """
         logger.info(
-            f"generate_response called with model_type={model_type}, max_tokens={max_tokens}, temperature={temperature}, cache_key={cache_key}"
+            "generate_response called with model_type=%s, max_tokens=%s, temperature=%s, cache_key=%s",
+            model_type,
+            max_tokens,
+            temperature,
+            cache_key,
         )
         if not self.enabled:
             return self._get_fallback_response(prompt, model_type)
 
-        # Check cache first
-        if cache_key and cache_key in self.response_cache:
-            cached = self.response_cache[cache_key]
-            if datetime.now().timestamp() - cached["timestamp"] < self.cache_ttl:
-                logger.info(f"Response found in cache for key: {cache_key}")
-                return cached["response"]
-
-        try:
-            # Format prompt based on model type
-            formatted_prompt = self._format_prompt(prompt, model_type)
-            logger.debug(
-                f"Formatted prompt for model_type={model_type}: {formatted_prompt}"
+        if disable_cache:
+            cache_key = None
+        elif cache_key is None:
+            cache_key = self._make_cache_key(
+                prompt, model_type, max_tokens, temperature
             )
 
-            # Get response from appropriate model
-            client = self.clients.get(model_type, self.clients["narrative"])
-            logger.debug(f"Using client for model_type={model_type}: {client.model}")
+        # Check cache first
+        if cache_key:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                logger.info("Response found in cache for key: %s", cache_key)
+                return cached
 
-            response = client.text_generation(
-                formatted_prompt,
-                max_new_tokens=max_tokens,
-                temperature=temperature,
-                do_sample=True,
-                return_full_text=False,
-            )
-            logger.info("AI response generated successfully")
+        # Share the result of an identical request that is already running
+        if cache_key and cache_key in self._inflight:
+            logger.info("Waiting on in-flight request for key: %s", cache_key)
+            # Shield so a cancelled waiter doesn't cancel the shared future
+            response = await asyncio.shield(self._inflight[cache_key])
+            if response is None:
+                return self._get_fallback_response(prompt, model_type)
+            return response
 
-            # Clean and validate response
-            cleaned_response = self._clean_response(response)
-            logger.debug(f"Cleaned response: {cleaned_response}")
+        future = None
+        if cache_key:
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[cache_key] = future
+
+        try:
+            cleaned_response = await self._disk_cache_get(cache_key)
+            from_disk = cleaned_response is not None
+            if not from_disk:
+                cleaned_response = await self._request_response(
+                    prompt, model_type, max_tokens, temperature, max_length
+                )
 
             # Cache if requested
             if cache_key:
-                self.response_cache[cache_key] = {
-                    "response": cleaned_response,
-                    "timestamp": datetime.now().timestamp(),
-                }
-                logger.info(f"Response cached for key: {cache_key}")
+                self.response_cache.set(cache_key, cleaned_response)
+                logger.info("Response cached for key: %s", cache_key)
+                future.set_result(cleaned_response)
+                if not from_disk:
+                    await self._disk_cache_set(cache_key, cleaned_response)
 
             return cleaned_response
 
         except Exception as e:
-            logger.error(f"AI generation failed: {e}")
+            logger.error("AI generation failed: %s", e)
             return self._get_fallback_response(prompt, model_type)
 
-    def _format_prompt(self, prompt: str, model_type: str) -> str:
-        """Format prompt based on model type and use case."""
-        if model_type == "narrative":
-            return f"""<s>[INST] You are a creative game master for a space-themed impostor game. 
-Generate engaging, dramatic narrative content. Keep responses under 150 words.
-Context: {prompt} [/INST]"""
+        finally:
+            if cache_key:
+                self._inflight.pop(cache_key, None)
+                # Waiters fall back on their own if this request failed
+                if not future.done():
+                    future.set_result(None)
 
-        elif model_type == "reasoning":
-            return f"""<s>[INST] You are an AI detective analyzing player behavior in a social deduction game.
-Provide logical, analytical insights. Be concise and observant.
-Analysis request: {prompt} [/INST]"""
+    async def _disk_cache_get(self, cache_key: Optional[str]) -> Optional[str]:
+        """Look a key up in the disk cache; errors count as a miss."""
+        if not cache_key or self.disk_cache is None:
+            return None
+        try:
+            cached = await asyncio.to_thread(self.disk_cache.get, cache_key)
+        except sqlite3.Error as e:
+            logger.warning("Disk cache read failed: %s", e)
+            return None
+        if cached is not None:
+            logger.info("Response found in disk cache for key: %s", cache_key)
+        return cached
 
-        elif model_type == "creative":
-            return f"""<s>[INST] You are a creative AI generating unique game content, personas, and tasks.
-Be imaginative, fun, and engaging. Keep responses under 100 words.
-Request: {prompt} [/INST]"""
+    async def _disk_cache_set(self, cache_key: str, response: str):
+        """Write a response to the disk cache; errors are logged and ignored."""
+        if self.disk_cache is None:
+            return
+        try:
+            await asyncio.to_thread(self.disk_cache.set, cache_key, response)
+        except sqlite3.Error as e:
+            logger.warning("Disk cache write failed: %s", e)
+
+    async def generate_response_stream(
+        self,
+        prompt: str,
+        model_type: str = "narrative",
+        max_tokens: int = 200,
+        temperature: float = 0.7,
+    ) -> AsyncIterator[str]:
+        """Yield response text as the model generates it.
+
+        Streamed responses are never cached. If generation fails before any
+        text arrives the fallback response is yielded instead.
+        """
+        logger.info(
+            "generate_response_stream called with model_type=%s, max_tokens=%s",
+            model_type,
+            max_tokens,
+        )
+        if not self.enabled:
+            yield self._get_fallback_response(prompt, model_type)
+            return
+
+        model, template = self._route(model_type)
+        formatted_prompt = template.format_map({"prompt": prompt})
+        # A separate task reads the stream, so the concurrency slot is held
+        # for generation only, not while the consumer awaits between tokens
+        tokens: asyncio.Queue = asyncio.Queue()
+        producer = asyncio.create_task(
+            self._read_stream(tokens, formatted_prompt, model, max_tokens, temperature)
+        )
+        received = False
+        try:
+            while True:
+                token = await tokens.get()
+                if token is None:
+                    break
+                received = True
+                yield token
+            succeeded = await producer
+        finally:
+            # Stops generation if the consumer closed the stream early
+            producer.cancel()
+        if not succeeded and not received:
+            yield self._get_fallback_response(prompt, model_type)
+
+    async def _read_stream(
+        self,
+        tokens: asyncio.Queue,
+        formatted_prompt: str,
+        model: str,
+        max_tokens: int,
+        temperature: float,
+    ) -> bool:
+        """Put generated tokens on the queue, then None; False if it failed."""
+        try:
+            async with self._sem:
+                # The HTTP read timeout bounds the gap between tokens
+                async for token in self.client.text_generation_stream(
+                    formatted_prompt,
+                    model=model,
+                    max_new_tokens=max_tokens,
+                    temperature=temperature,
+                    do_sample=True,
+                ):
+                    token = token.replace("</s>", "")
+                    if token:
+                        tokens.put_nowait(token)
+            return True
+        except Exception as e:
+            logger.error("AI stream failed: %s", e)
+            return False
+        finally:
+            tokens.put_nowait(None)
+
+    async def warm_up(self, timeout: float = 2.0):
+        """Warm every model endpoint before the first game.
+
+        Sends a one-token request per model so connection setup and model
+        loading aren't paid on a player's first request. Failures and slow
+        endpoints are logged and otherwise ignored.
+        """
+        if not self.enabled:
+            return
+
+        async def ping(model: str):
+            try:
+                async with asyncio.timeout(timeout):
+                    await self.client.text_generation(
+                        "ping", model=model, max_new_tokens=1
+                    )
+                logger.info("AI model warmed up: %s", model)
+            except Exception as e:
+                logger.warning("AI model warm-up failed for %s: %r", model, e)
+
+        await asyncio.gather(*(ping(model) for model in set(self.models.values())))
+
+    async def aclose(self):
+        """Close pooled HTTP connections and the disk cache; call on shutdown."""
+        if self.client is not None:
+            await self.client.aclose()
+        if self.disk_cache is not None:
+            self.disk_cache.close()
+            self.disk_cache = None
+
+    def _make_cache_key(
+        self, prompt: str, model_type: str, max_tokens: int, temperature: float
+    ) -> str:
+        """Derive a deterministic cache key from the prompt and parameters.
+
+        Whitespace is collapsed first so prompts that differ only in
+        indentation or line breaks share an entry.
+        """
+        normalized = " ".join(prompt.split())
+        raw = f"{model_type}|{max_tokens}|{temperature}|{normalized}"
+        return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
 
-        else:  # fast
-            return f"""<s>[INST] Provide a quick, helpful response for a game scenario.
-Be concise and direct.
-Request: {prompt} [/INST]"""
+    async def _request_response(
+        self,
+        prompt: str,
+        model_type: str,
+        max_tokens: int,
+        temperature: float,
+        max_length: int = 500,
+    ) -> str:
+        """Call the model and return the cleaned response; raises on failure."""
+        # One lookup picks both the model and its prompt template
+        model, template = self._route(model_type)
+        formatted_prompt = template.format_map({"prompt": prompt})
+        logger.debug(
+            "Formatted prompt for model_type=%s: %s", model_type, formatted_prompt
+        )
+        logger.debug("Using model for model_type=%s: %s", model_type, model)
+
+        # The timeout covers all attempts; each attempt takes its own slot
+        async with asyncio.timeout(self.request_timeout):
+            async for attempt in AsyncRetrying(
+                stop=stop_after_attempt(self.max_attempts),
+                wait=wait_exponential(multiplier=self.retry_backoff, max=4),
+                retry=retry_if_exception(_is_retryable),
+                reraise=True,
+            ):
+                with attempt:
+                    async with self._sem:
+                        response = await self.client.text_generation(
+                            formatted_prompt,
+                            model=model,
+                            max_new_tokens=max_tokens,
+                            temperature=temperature,
+                            do_sample=True,
+                            return_full_text=False,
+                        )
+        logger.info("AI response generated successfully")
+
+        # Clean and validate response
+        cleaned_response = self._clean_response(response, max_length)
+        logger.debug("Cleaned response: %s", cleaned_response)
+        return cleaned_response
 
-    def _clean_response(self, response: str) -> str:
+    def _clean_response(self, response: str, max_length: int = 500) -> str:
         """Clean and validate AI response."""
         if not response:
             return "AI response unavailable"
 
         # Remove any model-specific formatting
-        cleaned = response.strip()
-        cleaned = cleaned.replace("<s>", "").replace("</s>", "")
-        cleaned = cleaned.replace("[INST]", "").replace("[/INST]", "")
+        cleaned = _SPECIAL_TOKENS_RE.sub("", response.strip())
 
         # Limit length
-        if len(cleaned) > 500:
-            cleaned = cleaned[:497] + "..."
+        if len(cleaned) > max_length:
+            cleaned = cleaned[: max_length - 3] + "..."
 
         return cleaned
 
     def _get_fallback_response(self, prompt: str, model_type: str) -> str:
         """Provide fallback responses when AI is disabled."""
-        fallbacks = {
-            "narrative": [
-                "The space station hums with tension as the crew prepares for another mission.",
-                "In the depths of space, trust is the rarest commodity.",
-                "The void between stars holds secrets that could destroy them all.",
-            ],
-            "reasoning": [
-                "The voting patterns suggest careful consideration.",
-                "Player behavior indicates strategic thinking.",
-                "The group dynamics reveal interesting social dynamics.",
-            ],
-            "creative": [
-                "A mysterious task awaits completion.",
-                "The crew faces a challenging mission.",
-                "An opportunity for heroism presents itself.",
-            ],
-            "fast": ["Processing...", "Analyzing...", "Computing..."],
-        }
-
-        import random
-
-        return random.choice(fallbacks.get(model_type, fallbacks["fast"]))
+        return _RNG.choice(_FALLBACKS.get(model_type, _FALLBACKS["fast"]))
 
     # Specialized AI methods for different game features
 
@@ -187,15 +675,47 @@ Request: {prompt} [/INST]"""
         theme: str = "space station",
     ) -> str:
         """Generate dramatic game narrative."""
-        prompt = f"""Create a dramatic opening narrative for a {game_type} impostor game on a {theme} with {player_count} players. 
-Include suspense, mystery, and urgency. Make it feel like a sci-fi thriller."""
         logger.info(
-            f"generate_game_narrative called with game_type={game_type}, player_count={player_count}, theme={theme}"
+            "generate_game_narrative called with game_type=%s, player_count=%s, theme=%s",
+            game_type,
+            player_count,
+            theme,
         )
         return await self.generate_response(
-            prompt, model_type="narrative", max_tokens=150, temperature=0.8
+            self._game_narrative_prompt(game_type, player_count, theme),
+            model_type="narrative",
+            max_tokens=150,
+            temperature=0.8,
         )
 
+    async def generate_game_narrative_stream(
+        self,
+        game_type: str = "standard",
+        player_count: int = 6,
+        theme: str = "space station",
+    ) -> AsyncIterator[str]:
+        """Stream the opening game narrative as it is generated."""
+        logger.info(
+            "generate_game_narrative_stream called with game_type=%s, player_count=%s, theme=%s",
+            game_type,
+            player_count,
+            theme,
+        )
+        async for chunk in self.generate_response_stream(
+            self._game_narrative_prompt(game_type, player_count, theme),
+            model_type="narrative",
+            max_tokens=150,
+            temperature=0.8,
+        ):
+            yield chunk
+
+    def _game_narrative_prompt(
+        self, game_type: str, player_count: int, theme: str
+    ) -> str:
+        """Build the opening narrative prompt."""
+        return f"""Create a dramatic opening narrative for a {game_type} impostor game on a {theme} with {player_count} players. 
+Include suspense, mystery, and urgency. Make it feel like a sci-fi thriller."""
+
     async def generate_player_persona(
         self, player_name: str, role: str = "crewmate"
     ) -> Dict[str, str]:
@@ -204,28 +724,37 @@ Include suspense, mystery, and urgency. Make it feel like a sci-fi thriller."""
 Include: personality traits, background story, and secret behavior goal.
 Format as JSON with keys: name, personality, background, secret_goal"""
         logger.info(
-            f"generate_player_persona called with player_name={player_name}, role={role}"
+            "generate_player_persona called with player_name=%s, role=%s",
+            player_name,
+            role,
         )
         response = await self.generate_response(
             prompt, model_type="creative", max_tokens=200, temperature=0.9
         )
 
         try:
-            # Try to parse JSON response
-            persona = json.loads(response)
-            logger.info(f"Persona generated for {player_name}: {persona}")
+            persona = _parse_json_object(
+                response, "name", "personality", "background", "secret_goal"
+            )
+            logger.info("Persona generated for %s: %s", player_name, persona)
             return persona
-        except:
+        except (ValueError, KeyError) as e:
             # Fallback if JSON parsing fails
             logger.warning(
-                f"Failed to parse persona JSON for {player_name}. Falling back to default."
+                "Failed to parse persona JSON for %s (%s). Falling back to default.",
+                player_name,
+                e,
             )
-            return {
-                "name": player_name,
-                "personality": "Mysterious and cautious",
-                "background": "A veteran space explorer",
-                "secret_goal": "Prove their innocence at all costs",
-            }
+            return self.get_fallback_persona(player_name)
+
+    def get_fallback_persona(self, player_name: str) -> Dict[str, str]:
+        """Default persona used when generation fails."""
+        return {
+            "name": player_name,
+            "personality": "Mysterious and cautious",
+            "background": "A veteran space explorer",
+            "secret_goal": "Prove their innocence at all costs",
+        }
 
     async def generate_dynamic_task(
         self, role: str, player_name: str, difficulty: str = "medium"
@@ -235,10 +764,17 @@ Format as JSON with keys: name, personality, background, secret_goal"""
 Difficulty: {difficulty}
 Make it engaging and thematic. For impostors, create sabotage or deception tasks."""
         logger.info(
-            f"generate_dynamic_task called with role={role}, player_name={player_name}, difficulty={difficulty}"
+            "generate_dynamic_task called with role=%s, player_name=%s, difficulty=%s",
+            role,
+            player_name,
+            difficulty,
         )
         return await self.generate_response(
-            prompt, model_type="creative", max_tokens=100, temperature=0.7
+            prompt,
+            model_type="creative",
+            max_tokens=100,
+            temperature=0.7,
+            disable_cache=True,
         )
 
     async def analyze_voting_behavior(
@@ -252,28 +788,139 @@ Round: {round_number}
 
 Provide 2-3 insights about voting patterns, player behavior, or strategic implications."""
         logger.info(
-            f"analyze_voting_behavior called with votes={votes}, ejected_player={ejected_player}, round_number={round_number}"
+            "analyze_voting_behavior called with votes=%s, ejected_player=%s, round_number=%s",
+            votes,
+            ejected_player,
+            round_number,
+        )
+        model_type = (
+            ModelType.FAST
+            if len(prompt) <= self.small_model_max_prompt
+            else ModelType.REASONING
         )
         return await self.generate_response(
-            prompt, model_type="reasoning", max_tokens=150, temperature=0.6
+            prompt, model_type=model_type, max_tokens=150, temperature=0.6
         )
 
     async def generate_player_report(
         self, player_name: str, game_stats: Dict[str, Any], role: str, won: bool
     ) -> str:
         """Generate personalized player report."""
-        prompt = f"""Create a personalized game report for {player_name}:
+        logger.info(
+            "generate_player_report called with player_name=%s, role=%s, won=%s",
+            player_name,
+            role,
+            won,
+        )
+        return await self.generate_response(
+            self._player_report_prompt(player_name, game_stats, role, won),
+            model_type="narrative",
+            max_tokens=200,
+            temperature=0.8,
+        )
+
+    async def generate_player_report_stream(
+        self, player_name: str, game_stats: Dict[str, Any], role: str, won: bool
+    ) -> AsyncIterator[str]:
+        """Stream a personalized player report as it is generated."""
+        logger.info(
+            "generate_player_report_stream called with player_name=%s, role=%s, won=%s",
+            player_name,
+            role,
+            won,
+        )
+        async for chunk in self.generate_response_stream(
+            self._player_report_prompt(player_name, game_stats, role, won),
+            model_type="narrative",
+            max_tokens=200,
+            temperature=0.8,
+        ):
+            yield chunk
+
+    def _player_report_prompt(
+        self, player_name: str, game_stats: Dict[str, Any], role: str, won: bool
+    ) -> str:
+        """Build the personalized player report prompt."""
+        return f"""Create a personalized game report for {player_name}:
 Role: {role}
 Won: {won}
 Stats: {game_stats}
 
 Make it dramatic, personalized, and include a unique title and tip for improvement."""
+
+    async def generate_player_reports_batch(
+        self, requests: List[Dict[str, Any]]
+    ) -> List[str]:
+        """Generate reports for several players with a single LLM call.
+
+        Each request is a dict of keyword arguments for
+        ``generate_player_report``. Players missing from the batched reply
+        (or all of them, if it isn't valid JSON) are generated individually.
+        Results are returned in the same order as the requests.
+        """
         logger.info(
-            f"generate_player_report called with player_name={player_name}, role={role}, won={won}"
+            "generate_player_reports_batch called with batch_size=%s", len(requests)
         )
-        return await self.generate_response(
-            prompt, model_type="narrative", max_tokens=200, temperature=0.8
+        if not requests:
+            return []
+
+        # Split batches whose replies wouldn't fit the endpoint's token limit
+        per_call = max(1, self.max_new_tokens // _REPORT_TOKENS)
+        if len(requests) > per_call:
+            chunks = await asyncio.gather(
+                *(
+                    self.generate_player_reports_batch(requests[i : i + per_call])
+                    for i in range(0, len(requests), per_call)
+                )
+            )
+            return [report for chunk in chunks for report in chunk]
+
+        # Players are numbered because display names can repeat
+        players = "\n".join(
+            f"{i}. {r['player_name']}: Role: {r['role']}, Won: {r['won']}, "
+            f"Stats: {r['game_stats']}"
+            for i, r in enumerate(requests, 1)
         )
+        prompt = f"""Create a personalized game report for each of these players:
+{players}
+
+Make each one dramatic, personalized, and include a unique title and tip for improvement.
+Format as a JSON array with one object per player with keys: index, title, report, tip
+where index is the player's number above"""
+        response = await self.generate_response(
+            prompt,
+            model_type="narrative",
+            max_tokens=_REPORT_TOKENS * len(requests),
+            temperature=0.8,
+            max_length=500 * len(requests),
+        )
+
+        reports: Dict[int, str] = {}  # position in requests -> report
+        try:
+            for entry in _parse_json(response, _JSON_ARRAY_RE):
+                position = int(entry["index"]) - 1
+                if 0 <= position < len(requests):
+                    reports[position] = (
+                        f"**{entry['title']}**\n{entry['report']}\n\n💡 {entry['tip']}"
+                    )
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning("Failed to parse batched player reports: %s", e)
+
+        missing = [i for i in range(len(requests)) if i not in reports]
+        if missing:
+            logger.info("Generating %s player reports individually", len(missing))
+            results = await asyncio.gather(
+                *(self.generate_player_report(**requests[i]) for i in missing),
+                return_exceptions=True,
+            )
+            for i, report in zip(missing, results):
+                if isinstance(report, BaseException):
+                    name = requests[i]["player_name"]
+                    logger.error("Player report failed for %s: %s", name, report)
+                    report = f"{name}'s mission log could not be recovered."
+                reports[i] = report
+
+        return [reports[i] for i in range(len(requests))]
 
     async def generate_chaos_event(
         self, game_state: str, player_count: int
@@ -286,16 +933,24 @@ Players: {player_count}
 Create an event that adds drama and unpredictability.
 Format as JSON with keys: event_name, description, effect"""
         logger.info(
-            f"generate_chaos_event called with game_state={game_state}, player_count={player_count}"
+            "generate_chaos_event called with game_state=%s, player_count=%s",
+            game_state,
+            player_count,
         )
         response = await self.generate_response(
-            prompt, model_type="creative", max_tokens=150, temperature=0.9
+            prompt,
+            model_type="creative",
+            max_tokens=150,
+            temperature=0.9,
+            disable_cache=True,
         )
 
         try:
-            return json.loads(response)
-        except:
-            logger.warning("Failed to parse chaos event JSON. Falling back to default.")
+            return _parse_json_object(response, "event_name", "description", "effect")
+        except (ValueError, KeyError) as e:
+            logger.warning(
+                "Failed to parse chaos event JSON (%s). Falling back to default.", e
+            )
             return {
                 "event_name": "System Malfunction",
                 "description": "Communications are temporarily disrupted",
@@ -303,21 +958,48 @@ Format as JSON with keys: event_name, description, effect"""
             }
 
     async def generate_world_lore(
-        self, game_history: List[Dict], season: int = 1
+        self, game_history: Sequence[Dict], season: int = 1
     ) -> str:
         """Generate evolving world lore based on game history."""
-        prompt = f"""Based on this game history, generate evolving world lore:
-Games played: {len(game_history)}
-Season: {season}
-Recent events: {game_history[-5:] if game_history else 'None'}
-
-Create a mysterious, evolving narrative that connects the games."""
         logger.info(
-            f"generate_world_lore called with game_history_len={len(game_history)}, season={season}"
+            "generate_world_lore called with game_history_len=%s, season=%s",
+            len(game_history),
+            season,
         )
         return await self.generate_response(
-            prompt, model_type="narrative", max_tokens=200, temperature=0.8
+            self._world_lore_prompt(game_history, season),
+            model_type="narrative",
+            max_tokens=200,
+            temperature=0.8,
+        )
+
+    async def generate_world_lore_stream(
+        self, game_history: Sequence[Dict], season: int = 1
+    ) -> AsyncIterator[str]:
+        """Stream evolving world lore as it is generated."""
+        logger.info(
+            "generate_world_lore_stream called with game_history_len=%s, season=%s",
+            len(game_history),
+            season,
         )
+        async for chunk in self.generate_response_stream(
+            self._world_lore_prompt(game_history, season),
+            model_type="narrative",
+            max_tokens=200,
+            temperature=0.8,
+        ):
+            yield chunk
+
+    def _world_lore_prompt(self, game_history: Sequence[Dict], season: int) -> str:
+        """Build the world lore prompt from recent game history."""
+        # Walk back from the newest entry so deques aren't copied or scanned
+        recent = list(itertools.islice(reversed(game_history), 5))[::-1]
+        return f"""Based on this game history, generate evolving world lore:
+Games played: {len(game_history)}
+Season: {season}
+Recent events: {recent if recent else 'None'}
+
+Create a mysterious, evolving narrative that connects the games."""
 
     async def generate_game_summary(
         self, game_log: List[Dict[str, Any]]
@@ -340,15 +1022,17 @@ Create a mysterious, evolving narrative that connects the games."""
         Format the output as a JSON object with the following keys:
         "winning_team", "narrative", "mvp": {"name", "reason"}, "notable_plays": [], "final_verdict"
         """
-        logger.info(f"generate_game_summary called with game_log_len={len(game_log)}")
+        logger.info("generate_game_summary called with game_log_len=%s", len(game_log))
         response = await self.generate_response(
             prompt, model_type="reasoning", max_tokens=400, temperature=0.7
         )
 
         try:
-            return json.loads(response)
-        except json.JSONDecodeError:
-            logger.error("Failed to decode game summary JSON from AI response.")
+            return _parse_json_object(
+                response, "winning_team", "narrative", "mvp", "final_verdict"
+            )
+        except (ValueError, KeyError) as e:
+            logger.error("Failed to decode game summary JSON from AI response: %s", e)
             return {
                 "winning_team": "unknown",
                 "narrative": "The game's events are shrouded in mystery.",
@@ -2,6 +2,9 @@
 AI Task Generator - Dynamic task creation using LLMs.
 """
 
+import asyncio
+import bisect
+import itertools
 import random
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime
@@ -12,14 +15,66 @@ from bot.database.models import Player, TaskLog
 
 logger = logging.getLogger(__name__)
 
+# Completion-rate cutoffs (percent) for stepping up task difficulty
+_DIFFICULTY_CUTOFFS = (60, 80)
+_DIFFICULTY_LEVELS = ("easy", "medium", "hard")
+_BASE_XP_REWARDS = {"easy": 10, "medium": 25, "hard": 50}
+
+
+class AITask:
+    """A generated task assigned to one player."""
+
+    __slots__ = (
+        "id",
+        "session_id",
+        "player_id",
+        "role",
+        "difficulty",
+        "description",
+        "created_at",
+        "completed",
+        "completed_at",
+        "xp_reward",
+    )
+
+    def __init__(
+        self,
+        task_id: str,
+        session_id: int,
+        player_id: int,
+        role: str,
+        difficulty: str,
+        description: str,
+        created_at: datetime,
+        xp_reward: int,
+    ):
+        self.id = task_id
+        self.session_id = session_id
+        self.player_id = player_id
+        self.role = role
+        self.difficulty = difficulty
+        self.description = description
+        self.created_at = created_at
+        self.completed = False
+        self.completed_at: Optional[datetime] = None
+        self.xp_reward = xp_reward
+
 
 class AITaskGenerator:
     """AI-powered task generation system."""
 
     def __init__(self):
         logger.debug("Initializing AITaskGenerator")
-        self.task_history = {}  # session_id -> [task_data]
+        self.task_history = {}  # session_id -> {player_id -> [AITask]}
         self.player_task_progress = {}  # session_id -> {player_id -> progress}
+        self.task_index = {}  # task_id -> AITask, for O(1) lookups
+        self._task_counter = itertools.count(1)
+
+        # Task completions are written to the database in batches
+        self.log_batch_size = 64
+        self.log_flush_interval = 0.5
+        self._log_queue: Optional[asyncio.Queue] = None
+        self._log_worker: Optional[asyncio.Task] = None
         self.task_templates = {
             "crewmate": {
                 "easy": [
@@ -127,19 +182,24 @@ class AITaskGenerator:
         ]
 
     async def generate_task(
-        self, session_id: int, player_id: int, role: str, difficulty: str = None
-    ) -> Dict:
-        """Generate a unique AI task for a player."""
+        self,
+        session_id: int,
+        player_id: int,
+        role: str,
+        difficulty: str = None,
+        player_name: Optional[str] = None,
+    ) -> AITask:
+        """Generate a unique AI task for a player.
+
+        Pass player_name when the caller already knows it to skip the
+        database lookup.
+        """
         logger.info(
             f"generate_task called with session_id={session_id}, player_id={player_id}, role={role}, difficulty={difficulty}"
         )
-        # Get player info
-        db = SessionLocal()
-        try:
-            player = db.query(Player).filter(Player.id == player_id).first()
-            player_name = player.name if player else "Crew Member"
-        finally:
-            db.close()
+        # Get player info off the event loop
+        if player_name is None:
+            player_name = await asyncio.to_thread(self._load_player_name, player_id)
 
         # Determine difficulty if not specified
         if not difficulty:
@@ -150,23 +210,24 @@ class AITaskGenerator:
             role, player_name, difficulty, "Space Station"
         )
 
-        # Create task data
-        task_data = {
-            "id": f"task_{session_id}_{player_id}_{int(datetime.now().timestamp())}",
-            "player_id": player_id,
-            "role": role,
-            "difficulty": difficulty,
-            "description": task_description,
-            "created_at": datetime.now(),
-            "completed": False,
-            "xp_reward": self._calculate_xp_reward(difficulty, role),
-            "ai_generated": True,
-        }
+        # Create task data; the clock is read once for both id and timestamp
+        created_at = datetime.now()
+        task = AITask(
+            f"task_{session_id}_{player_id}_{int(created_at.timestamp())}_{next(self._task_counter)}",
+            session_id,
+            player_id,
+            role,
+            difficulty,
+            task_description,
+            created_at,
+            self._calculate_xp_reward(difficulty, role),
+        )
 
-        # Store task history
-        if session_id not in self.task_history:
-            self.task_history[session_id] = []
-        self.task_history[session_id].append(task_data)
+        # Store task history, grouped by player
+        self.task_history.setdefault(session_id, {}).setdefault(player_id, []).append(
+            task
+        )
+        self.task_index[task.id] = task
 
         # Initialize progress tracking
         if session_id not in self.player_task_progress:
@@ -176,71 +237,92 @@ class AITaskGenerator:
                 "tasks_assigned": 0,
                 "tasks_completed": 0,
                 "total_xp_earned": 0,
+                "completion_rate": 0.0,
             }
 
-        self.player_task_progress[session_id][player_id]["tasks_assigned"] += 1
+        progress = self.player_task_progress[session_id][player_id]
+        progress["tasks_assigned"] += 1
+        self._update_completion_rate(progress)
 
         logger.info(f"Generated task for player {player_id} in session {session_id}")
 
-        return task_data
+        return task
+
+    def _load_player_name(self, player_id: int) -> str:
+        """Look up a player's display name; blocking, run via asyncio.to_thread."""
+        db = SessionLocal()
+        try:
+            username = db.query(Player.username).filter(Player.id == player_id).scalar()
+            return username or "Crew Member"
+        finally:
+            db.close()
 
     async def generate_batch_tasks(
-        self, session_id: int, player_ids: List[int], roles: Dict[int, str]
-    ) -> Dict[int, Dict]:
+        self,
+        session_id: int,
+        player_ids: List[int],
+        roles: Dict[int, str],
+        names: Optional[Dict[int, str]] = None,
+    ) -> Dict[int, AITask]:
         """Generate tasks for multiple players at once."""
-        tasks = {}
-
-        for player_id in player_ids:
-            role = roles.get(player_id, "crewmate")
-            task = await self.generate_task(session_id, player_id, role)
-            tasks[player_id] = task
-
-        return tasks
+        names = names or {}
+        # Run the LLM calls concurrently; results keep player_ids order
+        tasks = await asyncio.gather(
+            *(
+                self.generate_task(
+                    session_id,
+                    player_id,
+                    roles.get(player_id, "crewmate"),
+                    player_name=names.get(player_id),
+                )
+                for player_id in player_ids
+            )
+        )
+        return dict(zip(player_ids, tasks))
 
     def complete_task(
         self, session_id: int, player_id: int, task_id: str
     ) -> Tuple[bool, int]:
         """Mark a task as completed and award XP."""
         logger.debug(
-            f"complete_task called with session_id={session_id}, player_id={player_id}, task_id={task_id}"
+            "complete_task called with session_id=%s, player_id=%s, task_id=%s",
+            session_id,
+            player_id,
+            task_id,
         )
         if session_id not in self.task_history:
             logger.warning(f"Session {session_id} not found in task history.")
             return False, 0
 
         # Find the task
-        task = None
-        for t in self.task_history[session_id]:
-            if (
-                t["id"] == task_id
-                and t["player_id"] == player_id
-                and not t["completed"]
-            ):
-                task = t
-                break
-
-        if not task:
+        task = self.task_index.get(task_id)
+        if (
+            not task
+            or task.session_id != session_id
+            or task.player_id != player_id
+            or task.completed
+        ):
             logger.warning(
                 f"Task with ID {task_id} not found for player {player_id} in session {session_id} or already completed."
             )
             return False, 0
 
         # Mark as completed
-        task["completed"] = True
-        task["completed_at"] = datetime.now()
+        task.completed = True
+        task.completed_at = datetime.now()
 
         # Award XP
-        xp_reward = task["xp_reward"]
+        xp_reward = task.xp_reward
 
         # Update progress
         if (
             session_id in self.player_task_progress
             and player_id in self.player_task_progress[session_id]
         ):
-            self.player_task_progress[session_id][player_id]["tasks_completed"] += 1
-            self.player_task_progress[session_id][player_id][
-                "total_xp_earned"
-            ] += xp_reward
+            progress = self.player_task_progress[session_id][player_id]
+            progress["tasks_completed"] += 1
+            progress["total_xp_earned"] += xp_reward
+            self._update_completion_rate(progress)
 
         # Log to database
         self._log_task_completion(session_id, player_id, task)
@@ -249,33 +331,35 @@ class AITaskGenerator:
 
         return True, xp_reward
 
-    def get_player_tasks(self, session_id: int, player_id: int) -> List[Dict]:
+    def get_player_tasks(self, session_id: int, player_id: int) -> List[AITask]:
         """Get all tasks for a player in a session."""
         logger.debug(
-            f"get_player_tasks called with session_id={session_id}, player_id={player_id}"
+            "get_player_tasks called with session_id=%s, player_id=%s",
+            session_id,
+            player_id,
         )
         if session_id not in self.task_history:
             logger.warning(f"Session {session_id} not found in task history.")
             return []
 
-        return [
-            task
-            for task in self.task_history[session_id]
-            if task["player_id"] == player_id
-        ]
+        return list(self.task_history[session_id].get(player_id, ()))
 
-    def get_active_tasks(self, session_id: int, player_id: int) -> List[Dict]:
+    def get_active_tasks(self, session_id: int, player_id: int) -> List[AITask]:
         """Get active (incomplete) tasks for a player."""
         logger.debug(
-            f"get_active_tasks called with session_id={session_id}, player_id={player_id}"
+            "get_active_tasks called with session_id=%s, player_id=%s",
+            session_id,
+            player_id,
         )
         tasks = self.get_player_tasks(session_id, player_id)
-        return [task for task in tasks if not task["completed"]]
+        return [task for task in tasks if not task.completed]
 
     def get_task_progress(self, session_id: int, player_id: int) -> Dict:
         """Get task progress statistics for a player."""
         logger.debug(
-            f"get_task_progress called with session_id={session_id}, player_id={player_id}"
+            "get_task_progress called with session_id=%s, player_id=%s",
+            session_id,
+            player_id,
         )
         if (
             session_id not in self.player_task_progress
@@ -291,19 +375,22 @@ class AITaskGenerator:
                 "completion_rate": 0.0,
             }
 
-        progress = self.player_task_progress[session_id][player_id]
-        assigned = progress["tasks_assigned"]
-        completed = progress["tasks_completed"]
+        return dict(self.player_task_progress[session_id][player_id])
 
-        return {
-            **progress,
-            "completion_rate": (completed / assigned * 100) if assigned > 0 else 0.0,
-        }
+    @staticmethod
+    def _update_completion_rate(progress: Dict):
+        """Refresh the stored completion rate after the counts change."""
+        assigned = progress["tasks_assigned"]
+        progress["completion_rate"] = (
+            progress["tasks_completed"] / assigned * 100 if assigned > 0 else 0.0
+        )
 
     def generate_task_summary(self, session_id: int, player_id: int) -> str:
         """Generate a summary of player's task performance."""
         logger.debug(
-            f"generate_task_summary called with session_id={session_id}, player_id={player_id}"
+            "generate_task_summary called with session_id=%s, player_id=%s",
+            session_id,
+            player_id,
         )
         progress = self.get_task_progress(session_id, player_id)
         active_tasks = self.get_active_tasks(session_id, player_id)
@@ -316,35 +403,31 @@ class AITaskGenerator:
         if active_tasks:
             summary += f"\n🔄 **Active Tasks:** {len(active_tasks)}\n"
             for task in active_tasks[:3]:  # Show top 3
-                summary += f"• {task['description']}\n"
+                summary += f"• {task.description}\n"
 
         return summary
 
     def _determine_difficulty(self, session_id: int, player_id: int) -> str:
         """Determine task difficulty based on player performance and game state."""
         logger.debug(
-            f"_determine_difficulty called with session_id={session_id}, player_id={player_id}"
+            "_determine_difficulty called with session_id=%s, player_id=%s",
+            session_id,
+            player_id,
         )
-        progress = self.get_task_progress(session_id, player_id)
+        progress = self.player_task_progress.get(session_id, {}).get(player_id)
+        completion_rate = progress["completion_rate"] if progress else 0.0
 
         # Base difficulty on completion rate
-        completion_rate = progress["completion_rate"]
-
-        if completion_rate >= 80:
-            return "hard"
-        elif completion_rate >= 60:
-            return "medium"
-        else:
-            return "easy"
+        return _DIFFICULTY_LEVELS[
+            bisect.bisect_right(_DIFFICULTY_CUTOFFS, completion_rate)
+        ]
 
     def _calculate_xp_reward(self, difficulty: str, role: str) -> int:
         """Calculate XP reward for task completion."""
         logger.debug(
-            f"_calculate_xp_reward called with difficulty={difficulty}, role={role}"
+            "_calculate_xp_reward called with difficulty=%s, role=%s", difficulty, role
         )
-        base_rewards = {"easy": 10, "medium": 25, "hard": 50}
-
-        base_xp = base_rewards.get(difficulty, 10)
+        base_xp = _BASE_XP_REWARDS.get(difficulty, 10)
 
         # Bonus for impostor tasks (they're harder to complete)
         if role == "impostor":
@@ -352,34 +435,100 @@ class AITaskGenerator:
 
         return base_xp
 
-    def _log_task_completion(self, session_id: int, player_id: int, task: Dict):
-        """Log task completion to database."""
+    def _log_task_completion(self, session_id: int, player_id: int, task: AITask):
+        """Queue a task completion for the background database writer."""
         logger.debug(
-            f"_log_task_completion called with session_id={session_id}, player_id={player_id}"
+            "_log_task_completion called with session_id=%s, player_id=%s",
+            session_id,
+            player_id,
+        )
+        queue = self._log_queue
+        if queue is None:
+            queue = self._log_queue = asyncio.Queue()
+        queue.put_nowait(
+            {
+                "session_id": session_id,
+                "player_id": player_id,
+                "task_id": task.id,
+                "description": task.description,
+                "xp_earned": task.xp_reward,
+                "completed_at": task.completed_at,
+            }
         )
+
+        if self._log_worker is None or self._log_worker.done():
+            try:
+                self._log_worker = asyncio.get_running_loop().create_task(
+                    self._drain_task_logs(queue)
+                )
+            except RuntimeError:
+                # No event loop (e.g. sync callers); the next async log or
+                # flush() writes it
+                pass
+
+    async def flush(self):
+        """Write every queued task completion; await before shutting down."""
+        worker = self._log_worker
+        if worker is not None and not worker.done():
+            await worker
+        # Entries queued while no event loop was running have no worker
+        if self._log_queue is not None and not self._log_queue.empty():
+            await self._drain_task_logs(self._log_queue)
+
+    async def _drain_task_logs(self, queue: asyncio.Queue):
+        """Flush queued completions in batches; exits once the queue is empty."""
+        loop = asyncio.get_running_loop()
+        while not queue.empty():
+            batch = [queue.get_nowait()]
+            deadline = loop.time() + self.log_flush_interval
+            while len(batch) < self.log_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await asyncio.to_thread(self._write_task_logs, batch)
+
+    def _write_task_logs(self, entries: List[Dict]):
+        """Persist a batch of task completions in one transaction."""
+        logger.debug("_write_task_logs called with %s entries", len(entries))
         db = SessionLocal()
         try:
-            task_log = TaskLog(
-                session_id=session_id,
-                player_id=player_id,
-                task_type="ai_generated",
-                task_description=task["description"],
-                xp_earned=task["xp_reward"],
-                completed_at=datetime.now(),
+            # AI tasks have no row in the tasks table, so details carry the task
+            db.bulk_save_objects(
+                [
+                    TaskLog(
+                        player_id=entry["player_id"],
+                        timestamp=entry["completed_at"],
+                        event_type="ai_task_completed",
+                        details={
+                            "session_id": entry["session_id"],
+                            "task_id": entry["task_id"],
+                            "task_type": "ai_generated",
+                            "description": entry["description"],
+                            "xp_earned": entry["xp_earned"],
+                        },
+                    )
+                    for entry in entries
+                ]
             )
-            db.add(task_log)
             db.commit()
         except Exception as e:
-            logger.error(f"Failed to log task completion: {e}")
+            logger.error(f"Failed to log task completions: {e}")
             db.rollback()
         finally:
             db.close()
 
     def cleanup_session_tasks(self, session_id: int):
         """Clean up task data for a finished session."""
-        logger.debug(f"cleanup_session_tasks called with session_id={session_id}")
+        logger.debug("cleanup_session_tasks called with session_id=%s", session_id)
         if session_id in self.task_history:
-            del self.task_history[session_id]
+            for tasks in self.task_history.pop(session_id).values():
+                for task in tasks:
+                    self.task_index.pop(task.id, None)
 
         if session_id in self.player_task_progress:
             del self.player_task_progress[session_id]
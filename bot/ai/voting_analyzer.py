@@ -2,16 +2,150 @@
 AI Voting Analyzer - Intelligent analysis of voting patterns and player behavior.
 """
 
+import asyncio
+import heapq
 import random
+from array import array
+from collections import Counter, deque
+from statistics import fmean
+import time
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 import logging
-from bot.ai.llm_client import ai_client
-from bot.database import SessionLocal
-from bot.database.models import VoteHistory, Player, DiscussionLog
+from sqlalchemy import case, func, select
+from bot.ai.llm_client import _parse_json_object, ai_client
+from bot.database import engine
+from bot.database.models import VoteHistory, Player, DiscussionLog, PlayerGameLink
 
 logger = logging.getLogger(__name__)
 
+# Detective prompts, filled in per call with str.format_map
+_BEHAVIOR_PROMPT = """Analyze this player's behavior in a space station impostor game:
+
+Player: {name}
+Voting Speed: {speed} seconds
+Vote Consistency: {consistency}%
+Accusations Made: {accusations}
+Defensive Actions: {defensive}
+Suspicion Score: {score}/100
+
+Provide 2-3 sentences of detective-style analysis about this player's behavior.
+Focus on suspicious patterns or interesting observations."""
+
+_COMMENTARY_PROMPT = """The most suspicious player in this space station impostor game is {name}.
+
+Provide 1-2 sentences of detective commentary about the current suspicion levels.
+Be observant and slightly mysterious."""
+
+_INSIGHTS_PROMPT = """Analyze this voting round in a space station impostor game:
+Votes: {votes}
+Observations: {context}
+
+Provide 2-3 sentences of detective-style insight about the voting patterns."""
+
+_ROUND_BUNDLE_PROMPT = """Analyze this voting round in a space station impostor game:
+Votes: {votes}
+Observations: {context}
+
+Most suspicious players:
+{suspects}
+
+Return JSON with keys:
+- insights: 2-3 sentences of detective-style insight about the voting patterns
+- leaderboard_commentary: 1-2 observant, slightly mysterious sentences about the current suspicion levels
+- player_analyses: an object mapping each suspicious player's name to 2-3 sentences of detective-style analysis of their behavior"""
+
+# Analysis types
+_ANALYSIS_TYPES = (
+    "voting_speed",
+    "voting_consistency",
+    "group_behavior",
+    "suspicious_patterns",
+    "defensive_actions",
+    "accusation_patterns",
+)
+
+# Leaderboard medals for the top three ranks
+_RANK_EMOJI = ("🥇", "🥈", "🥉")
+
+# Pattern flag -> observation included in the insights prompt
+_PATTERN_OBSERVATIONS = (
+    ("quick_voting", "Multiple players voted very quickly"),
+    ("group_voting", "Group voting patterns detected"),
+    ("vote_manipulation", "Vote manipulation abilities were used"),
+)
+
+
+class AnalysisRecord:
+    """Stored result of one analyzed voting round."""
+
+    __slots__ = ("round", "insights", "patterns", "timestamp")
+
+    def __init__(
+        self, round_number: int, insights: str, patterns: Dict, timestamp: datetime
+    ):
+        self.round = round_number
+        self.insights = insights
+        self.patterns = patterns
+        self.timestamp = timestamp
+
+
+class PlayerBehavior:
+    """Behavior tracked for one player during a session."""
+
+    __slots__ = (
+        "vote_limit",
+        "vote_times",
+        "vote_targets",
+        "accusations",
+        "defensive_actions",
+        "messages_sent",
+        "suspicious_actions",
+    )
+
+    def __init__(self, vote_limit: int = 50):
+        self.vote_limit = vote_limit
+        self.vote_times = array("f")  # compact float32 storage
+        self.vote_targets: deque = deque(maxlen=vote_limit)
+        self.accusations = 0
+        self.defensive_actions = 0
+        self.messages_sent = 0
+        self.suspicious_actions = 0
+
+    def record_vote(self, time_taken: float, target: Optional[int]):
+        """Record a vote, keeping only the most recent vote_limit votes."""
+        self.vote_times.append(time_taken)
+        if len(self.vote_times) > self.vote_limit:
+            del self.vote_times[0]
+        self.vote_targets.append(target)
+
+    def _on_vote(self, action_data: Dict):
+        self.record_vote(
+            action_data.get("time_taken", 0), action_data.get("target", None)
+        )
+
+    def _on_accusation(self, action_data: Dict):
+        self.accusations += 1
+
+    def _on_defensive(self, action_data: Dict):
+        self.defensive_actions += 1
+
+    def _on_message(self, action_data: Dict):
+        self.messages_sent += 1
+
+    def _on_suspicious(self, action_data: Dict):
+        self.suspicious_actions += 1
+
+
+# action_type -> PlayerBehavior handler taking (behavior, action_data)
+_BEHAVIOR_HANDLERS = {
+    "vote": PlayerBehavior._on_vote,
+    "accusation": PlayerBehavior._on_accusation,
+    "defensive": PlayerBehavior._on_defensive,
+    "message": PlayerBehavior._on_message,
+    "suspicious": PlayerBehavior._on_suspicious,
+}
+
 
 class AIVotingAnalyzer:
     """AI-powered voting analysis and detective insights."""
@@ -19,19 +153,30 @@ class AIVotingAnalyzer:
     def __init__(self):
         logger.debug("Initializing AIVotingAnalyzer")
         self.voting_patterns = {}  # session_id -> {player_id -> patterns}
-        self.analysis_history = {}  # session_id -> [analyses]
+        self.analysis_history = {}  # session_id -> [AnalysisRecord]
         self.suspicion_scores = {}  # session_id -> {player_id -> score}
-        self.behavior_tracking = {}  # session_id -> {player_id -> behaviors}
-
-        # Analysis types
-        self.analysis_types = [
-            "voting_speed",
-            "voting_consistency",
-            "group_behavior",
-            "suspicious_patterns",
-            "defensive_actions",
-            "accusation_patterns",
-        ]
+        self.behavior_tracking = {}  # session_id -> {player_id -> PlayerBehavior}
+        self._active_players_cache: Dict[int, List[int]] = {}  # session_id -> ids
+
+        # Bound per-session memory; sessions idle past session_ttl are evicted
+        # even if cleanup_session_analysis is never called for them
+        self.history_limit = 100  # analyses kept per session
+        self.vote_history_limit = 50  # votes kept per player
+        self.session_ttl = 24 * 3600  # seconds
+        self.eviction_interval = 600  # seconds
+        self._last_activity: Dict[int, float] = {}  # session_id -> monotonic time
+        self._eviction_task: Optional[asyncio.Task] = None
+
+        # Player names rarely change; cache them to skip repeat lookups
+        self.name_cache_size = 4096
+        self.name_cache_ttl = 300  # seconds
+        self._name_cache: Dict[int, Tuple[str, float]] = {}  # -> (name, expires_at)
+
+        # Detective texts from the latest round bundle, reused until next round
+        self._round_commentary: Dict[int, Tuple[str, str]] = {}  # -> (top, text)
+        self._round_player_analyses: Dict[int, Dict[int, str]] = {}
+
+        self.analysis_types = _ANALYSIS_TYPES
 
     async def analyze_voting_round(
         self, session_id: int, vote_results: Dict, round_number: int
@@ -40,30 +185,113 @@ class AIVotingAnalyzer:
         logger.info(
             f"analyze_voting_round called with session_id={session_id}, round_number={round_number}"
         )
-        # Collect voting data
-        voting_data = self._collect_voting_data(session_id, round_number)
+        # Collect voting data off the event loop
+        voting_data = await asyncio.to_thread(
+            self._collect_voting_data, session_id, round_number
+        )
 
         # Analyze patterns
         patterns = self._analyze_voting_patterns(voting_data, vote_results)
 
-        # Generate AI insights
-        insights = await self._generate_ai_insights(session_id, patterns, vote_results)
-
-        # Update suspicion scores
+        # Update suspicion scores first so the bundle sees this round's suspects
+        await self._prefetch_active_players(session_id)
         self._update_suspicion_scores(session_id, patterns)
 
+        # One LLM call covers insights, commentary and top suspect analyses
+        scores = self.suspicion_scores[session_id]
+        top_players = heapq.nlargest(3, scores.items(), key=lambda x: x[1])
+        bundle = await self.generate_round_bundle(
+            session_id, round_number, vote_results, patterns, top_players
+        )
+        if bundle is None:
+            insights = await self._generate_ai_insights(
+                session_id, patterns, vote_results
+            )
+        else:
+            insights = bundle["insights"]
+
         # Store analysis
         self._store_analysis(session_id, round_number, insights, patterns)
 
         logger.info(f"Voting round {round_number} analyzed for session {session_id}")
         return insights
 
+    async def generate_round_bundle(
+        self,
+        session_id: int,
+        round_number: int,
+        vote_results: Dict,
+        patterns: Dict,
+        top_players: List[Tuple[int, int]],
+    ) -> Optional[Dict]:
+        """Generate all detective texts for a round with a single LLM call.
+
+        The leaderboard commentary and suspect analyses are kept for
+        ``generate_suspicion_leaderboard`` and
+        ``generate_player_behavior_report``. Returns None if the reply
+        can't be parsed; callers then fall back to individual prompts.
+        """
+        logger.debug(
+            "generate_round_bundle called with session_id=%s, round_number=%s",
+            session_id,
+            round_number,
+        )
+        names = await self._player_names([player_id for player_id, _ in top_players])
+        behaviors = self.behavior_tracking.get(session_id, {})
+        suspects = []
+        for player_id, score in top_players:
+            if player_id not in names:
+                continue
+            line = f"- {names[player_id]}: Suspicion Score {score}/100"
+            behavior = behaviors.get(player_id)
+            if behavior is not None:
+                line += (
+                    f", Accusations Made {behavior.accusations}"
+                    f", Defensive Actions {behavior.defensive_actions}"
+                )
+            suspects.append(line)
+
+        prompt = _ROUND_BUNDLE_PROMPT.format_map(
+            {
+                "votes": self._vote_text(vote_results),
+                "context": self._pattern_context(patterns),
+                "suspects": "\n".join(suspects) or "- None yet",
+            }
+        )
+        response = await ai_client.generate_response(
+            prompt, model_type="reasoning", max_tokens=600, max_length=3000
+        )
+
+        try:
+            bundle = _parse_json_object(
+                response, "insights", "leaderboard_commentary", "player_analyses"
+            )
+            by_name = bundle["player_analyses"]
+            analyses = {
+                player_id: str(by_name[name])
+                for player_id, name in names.items()
+                if name in by_name
+            }
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning("Failed to parse round bundle: %s", e)
+            return None
+
+        if top_players and top_players[0][0] in names:
+            self._round_commentary[session_id] = (
+                names[top_players[0][0]],
+                str(bundle["leaderboard_commentary"]),
+            )
+        self._round_player_analyses[session_id] = analyses
+        return bundle
+
     async def generate_player_behavior_report(
         self, session_id: int, player_id: int
     ) -> str:
         """Generate a detailed behavior analysis for a specific player."""
         logger.debug(
-            f"generate_player_behavior_report called with session_id={session_id}, player_id={player_id}"
+            "generate_player_behavior_report called with session_id=%s, player_id=%s",
+            session_id,
+            player_id,
         )
         if session_id not in self.behavior_tracking:
             logger.warning(f"No behavior data available for session {session_id}")
@@ -75,40 +303,41 @@ class AIVotingAnalyzer:
             )
             return "❌ No behavior data available for this player."
 
-        behavior_data = self.behavior_tracking[session_id][player_id]
+        behavior = self.behavior_tracking[session_id][player_id]
+        vote_stats = self._vote_stats(behavior)
         suspicion_score = self.suspicion_scores.get(session_id, {}).get(player_id, 0)
 
         # Get player name
-        db = SessionLocal()
-        try:
-            player = db.query(Player).filter(Player.id == player_id).first()
-            player_name = player.name if player else "Unknown Player"
-        finally:
-            db.close()
+        names = await self._player_names([player_id])
+        player_name = names.get(player_id, "Unknown Player")
 
-        # Generate AI analysis
-        analysis_prompt = f"""
-Analyze this player's behavior in a space station impostor game:
+        # Reuse the analysis from this round's bundle when there is one
+        analysis = self._round_player_analyses.get(session_id, {}).get(player_id)
+        if analysis is not None:
+            return f"🔍 **Behavior Analysis: {player_name}**\n\n{analysis}"
 
-Player: {player_name}
-Voting Speed: {behavior_data.get('avg_vote_time', 'Unknown')} seconds
-Vote Consistency: {behavior_data.get('vote_consistency', 'Unknown')}%
-Accusations Made: {behavior_data.get('accusations', 0)}
-Defensive Actions: {behavior_data.get('defensive_actions', 0)}
-Suspicion Score: {suspicion_score}/100
-
-Provide 2-3 sentences of detective-style analysis about this player's behavior.
-Focus on suspicious patterns or interesting observations.
-"""
+        # Generate AI analysis
+        analysis_prompt = _BEHAVIOR_PROMPT.format_map(
+            {
+                "name": player_name,
+                "speed": vote_stats.get("avg_vote_time", "Unknown"),
+                "consistency": vote_stats.get("vote_consistency", "Unknown"),
+                "accusations": behavior.accusations,
+                "defensive": behavior.defensive_actions,
+                "score": suspicion_score,
+            }
+        )
 
-        analysis = await ai_client.generate_text("reasoning", analysis_prompt, 150)
+        analysis = await ai_client.generate_response(
+            analysis_prompt, model_type="reasoning", max_tokens=150
+        )
 
         return f"🔍 **Behavior Analysis: {player_name}**\n\n{analysis}"
 
     async def generate_suspicion_leaderboard(self, session_id: int) -> str:
         """Generate a leaderboard of most suspicious players."""
         logger.debug(
-            f"generate_suspicion_leaderboard called with session_id={session_id}"
+            "generate_suspicion_leaderboard called with session_id=%s", session_id
         )
         if session_id not in self.suspicion_scores:
             logger.warning(f"No suspicion data available for session {session_id}")
@@ -119,19 +348,16 @@ Focus on suspicious patterns or interesting observations.
             logger.warning(f"No suspicion data available for session {session_id}")
             return "❌ No suspicion data available."
 
-        # Sort by suspicion score (highest first)
-        sorted_players = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+        # Top 5 by suspicion score (highest first), without sorting everyone
+        top_players = heapq.nlargest(5, scores.items(), key=lambda x: x[1])
 
-        # Get player names
-        db = SessionLocal()
-        try:
-            leaderboard = []
-            for player_id, score in sorted_players[:5]:  # Top 5
-                player = db.query(Player).filter(Player.id == player_id).first()
-                if player:
-                    leaderboard.append({"name": player.name, "score": score})
-        finally:
-            db.close()
+        # Get player names for the top 5 in one query
+        names = await self._player_names([player_id for player_id, _ in top_players])
+        leaderboard = [
+            {"name": names[player_id], "score": score}
+            for player_id, score in top_players
+            if player_id in names
+        ]
 
         if not leaderboard:
             logger.warning(f"No player data available for session {session_id}")
@@ -139,247 +365,287 @@ Focus on suspicious patterns or interesting observations.
 
         # Generate AI commentary
         top_suspicious = leaderboard[0]["name"] if leaderboard else "Unknown"
-        commentary_prompt = f"""
-The most suspicious player in this space station impostor game is {top_suspicious}.
-
-Provide 1-2 sentences of detective commentary about the current suspicion levels.
-Be observant and slightly mysterious.
-"""
-
-        commentary = await ai_client.generate_text("reasoning", commentary_prompt, 100)
+        cached = self._round_commentary.get(session_id)
+        if cached is not None and cached[0] == top_suspicious:
+            commentary = cached[1]
+        else:
+            commentary_prompt = _COMMENTARY_PROMPT.format_map({"name": top_suspicious})
+            commentary = await ai_client.generate_response(
+                commentary_prompt, model_type="reasoning", max_tokens=100
+            )
 
         # Build leaderboard display
-        display = "🕵️ **Suspicion Leaderboard**\n\n"
-        for i, player in enumerate(leaderboard, 1):
-            emoji = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"{i}."
-            display += f"{emoji} **{player['name']}** - {player['score']}/100\n"
-
-        display += f"\n🤔 **AI Detective Commentary**\n{commentary}"
-
-        return display
+        lines = ["🕵️ **Suspicion Leaderboard**", ""]
+        lines.extend(
+            f"{_RANK_EMOJI[i - 1] if i <= len(_RANK_EMOJI) else f'{i}.'} "
+            f"**{player['name']}** - {player['score']}/100"
+            for i, player in enumerate(leaderboard, 1)
+        )
+        lines += ["", "🤔 **AI Detective Commentary**", commentary]
+
+        return "\n".join(lines)
+
+    async def _player_names(self, player_ids: List[int]) -> Dict[int, str]:
+        """Return names for the given players, querying only uncached ones."""
+        names = {}
+        missing = []
+        now = time.monotonic()
+        for player_id in player_ids:
+            cached = self._name_cache.get(player_id)
+            if cached is None or cached[1] <= now:
+                missing.append(player_id)
+            else:
+                names[player_id] = cached[0]
+
+        if missing:
+            loaded = await asyncio.to_thread(self._load_player_names, missing)
+            expires_at = time.monotonic() + self.name_cache_ttl
+            for player_id, name in loaded.items():
+                # Re-insert so the dict stays ordered oldest-first
+                self._name_cache.pop(player_id, None)
+                self._name_cache[player_id] = (name, expires_at)
+            while len(self._name_cache) > self.name_cache_size:
+                del self._name_cache[next(iter(self._name_cache))]
+            names.update(loaded)
+        return names
+
+    def invalidate_player_name(self, player_id: int):
+        """Forget a cached player name; call when a player is renamed."""
+        self._name_cache.pop(player_id, None)
+
+    def _load_player_names(self, player_ids: List[int]) -> Dict[int, str]:
+        """Look up player names with a single IN query."""
+        stmt = select(Player.id, Player.username).where(Player.id.in_(player_ids))
+        with engine.connect() as conn:
+            return dict(conn.execute(stmt).all())
 
     def track_player_behavior(
         self, session_id: int, player_id: int, action_type: str, action_data: Dict
     ):
         """Track individual player behaviors for analysis."""
         logger.debug(
-            f"track_player_behavior called with session_id={session_id}, player_id={player_id}, action_type={action_type}"
+            "track_player_behavior called with session_id=%s, player_id=%s, action_type=%s",
+            session_id,
+            player_id,
+            action_type,
         )
-        if session_id not in self.behavior_tracking:
-            self.behavior_tracking[session_id] = {}
-
-        if player_id not in self.behavior_tracking[session_id]:
-            self.behavior_tracking[session_id][player_id] = {
-                "vote_times": [],
-                "vote_targets": [],
-                "accusations": 0,
-                "defensive_actions": 0,
-                "messages_sent": 0,
-                "suspicious_actions": 0,
-            }
-
-        behavior = self.behavior_tracking[session_id][player_id]
-
-        if action_type == "vote":
-            behavior["vote_times"].append(action_data.get("time_taken", 0))
-            behavior["vote_targets"].append(action_data.get("target", None))
-        elif action_type == "accusation":
-            behavior["accusations"] += 1
-        elif action_type == "defensive":
-            behavior["defensive_actions"] += 1
-        elif action_type == "message":
-            behavior["messages_sent"] += 1
-        elif action_type == "suspicious":
-            behavior["suspicious_actions"] += 1
+        handler = _BEHAVIOR_HANDLERS.get(action_type)
+        if handler is None:
+            logger.warning("Unknown behavior action type: %s", action_type)
+            return
+
+        self._touch(session_id)
+        handler(self._get_behavior(session_id, player_id), action_data)
+
+    def _get_behavior(self, session_id: int, player_id: int) -> PlayerBehavior:
+        """Return a player's behavior record, creating it on first use."""
+        players = self.behavior_tracking.setdefault(session_id, {})
+        behavior = players.get(player_id)
+        if behavior is None:
+            behavior = players[player_id] = PlayerBehavior(self.vote_history_limit)
+        return behavior
+
+    @staticmethod
+    def _vote_stats(behavior: PlayerBehavior) -> Dict:
+        """Average vote time and share of votes on the favourite target."""
+        stats = {}
+        if behavior.vote_times:
+            stats["avg_vote_time"] = round(fmean(behavior.vote_times), 1)
+        targets = Counter(t for t in behavior.vote_targets if t is not None)
+        if targets:
+            top_count = targets.most_common(1)[0][1]
+            stats["vote_consistency"] = round(top_count / targets.total() * 100)
+        return stats
 
     def get_suspicion_score(self, session_id: int, player_id: int) -> int:
         """Get current suspicion score for a player."""
         logger.debug(
-            f"get_suspicion_score called with session_id={session_id}, player_id={player_id}"
+            "get_suspicion_score called with session_id=%s, player_id=%s",
+            session_id,
+            player_id,
         )
         return self.suspicion_scores.get(session_id, {}).get(player_id, 0)
 
     def _collect_voting_data(self, session_id: int, round_number: int) -> Dict:
         """Collect voting data from database for analysis."""
         logger.debug(
-            f"collect_voting_data called with session_id={session_id}, round_number={round_number}"
+            "collect_voting_data called with session_id=%s, round_number=%s",
+            session_id,
+            round_number,
         )
-        db = SessionLocal()
-        try:
-            votes = (
-                db.query(VoteHistory)
-                .filter(
-                    VoteHistory.session_id == session_id,
-                    VoteHistory.round_number == round_number,
-                )
-                .all()
-            )
-
-            voting_data = {
-                "total_votes": len(votes),
-                "vote_targets": {},
-                "vote_times": [],
-                "anonymous_votes": 0,
-                "double_votes": 0,
-            }
-
-            for vote in votes:
-                # Count vote targets
-                target = vote.target_id
-                if target in voting_data["vote_targets"]:
-                    voting_data["vote_targets"][target] += 1
-                else:
-                    voting_data["vote_targets"][target] = 1
-
-                # Track special vote types
-                if vote.anonymous_vote:
-                    voting_data["anonymous_votes"] += 1
-                if vote.double_vote:
-                    voting_data["double_votes"] += 1
-
-            return voting_data
-        finally:
-            db.close()
+        round_filter = (
+            VoteHistory.session_id == session_id,
+            VoteHistory.round_number == round_number,
+        )
+        # Count in SQL; no vote rows are loaded into Python
+        targets_stmt = (
+            select(VoteHistory.target_id, func.count())
+            .where(*round_filter)
+            .group_by(VoteHistory.target_id)
+        )
+        totals_stmt = select(
+            func.count(),
+            func.sum(case((VoteHistory.anonymous_vote, 1), else_=0)),
+            func.sum(case((VoteHistory.double_vote, 1), else_=0)),
+        ).where(*round_filter)
+        # Both reads share one pooled connection; no ORM session needed
+        with engine.connect() as conn:
+            vote_targets = dict(conn.execute(targets_stmt).all())
+            total_votes, anonymous_votes, double_votes = conn.execute(totals_stmt).one()
+
+        return {
+            "total_votes": total_votes,
+            "vote_targets": vote_targets,
+            "vote_times": [],
+            # SUM over no rows is NULL
+            "anonymous_votes": anonymous_votes or 0,
+            "double_votes": double_votes or 0,
+        }
 
     def _analyze_voting_patterns(self, voting_data: Dict, vote_results: Dict) -> Dict:
         """Analyze voting patterns for suspicious behavior."""
         logger.debug(
-            f"analyze_voting_patterns called with voting_data={voting_data}, vote_results={vote_results}"
+            "analyze_voting_patterns called with voting_data=%s, vote_results=%s",
+            voting_data,
+            vote_results,
         )
-        patterns = {
-            "quick_voting": False,
-            "group_voting": False,
-            "suspicious_targets": [],
-            "vote_manipulation": False,
+        # Group voting: 3+ votes for the same target. The targets are derived
+        # once here and reused by the insights prompt and suspicion scoring.
+        suspicious_targets = [
+            target
+            for target, count in voting_data["vote_targets"].items()
+            if count >= 3
+        ]
+
+        return {
+            # Quick voting (votes within 10 seconds)
+            "quick_voting": voting_data.get("total_votes", 0) > 0,
+            "group_voting": bool(suspicious_targets),
+            "suspicious_targets": suspicious_targets,
+            "vote_manipulation": (
+                voting_data["anonymous_votes"] > 0 or voting_data["double_votes"] > 0
+            ),
             "unusual_behavior": [],
         }
 
-        # Check for quick voting (votes within 10 seconds)
-        if voting_data.get("total_votes", 0) > 0:
-            patterns["quick_voting"] = True
-
-        # Check for group voting (3+ votes for same target)
-        for target, count in voting_data["vote_targets"].items():
-            if count >= 3:
-                patterns["group_voting"] = True
-                patterns["suspicious_targets"].append(target)
-
-        # Check for vote manipulation
-        if voting_data["anonymous_votes"] > 0 or voting_data["double_votes"] > 0:
-            patterns["vote_manipulation"] = True
-
-        return patterns
-
     async def _generate_ai_insights(
         self, session_id: int, patterns: Dict, vote_results: Dict
     ) -> str:
         """Generate AI-powered insights about voting behavior."""
         logger.debug(
-            f"generate_ai_insights called with session_id={session_id}, patterns={patterns}, vote_results={vote_results}"
+            "generate_ai_insights called with session_id=%s, patterns=%s, vote_results=%s",
+            session_id,
+            patterns,
+            vote_results,
+        )
+        prompt = _INSIGHTS_PROMPT.format_map(
+            {
+                "votes": self._vote_text(vote_results),
+                "context": self._pattern_context(patterns),
+            }
         )
-        # Build context for AI
-        context_parts = []
-
-        if patterns["quick_voting"]:
-            context_parts.append("Multiple players voted very quickly")
-
-        if patterns["group_voting"]:
-            context_parts.append("Group voting patterns detected")
 
-        if patterns["vote_manipulation"]:
-            context_parts.append("Vote manipulation abilities were used")
+        return await ai_client.generate_response(
+            prompt, model_type="reasoning", max_tokens=150
+        )
 
+    @staticmethod
+    def _pattern_context(patterns: Dict) -> str:
+        """Describe the flagged voting patterns for a prompt."""
+        context_parts = [text for flag, text in _PATTERN_OBSERVATIONS if patterns[flag]]
         if patterns["suspicious_targets"]:
             context_parts.append(
                 f"High suspicion on targets: {patterns['suspicious_targets']}"
             )
 
-        context = "; ".join(context_parts) if context_parts else "Standard voting round"
+        return "; ".join(context_parts) if context_parts else "Standard voting round"
 
-        # Generate AI analysis
-        vote_text = ", ".join([f"{k}: {v}" for k, v in vote_results.items()])
+    @staticmethod
+    def _vote_text(vote_results: Dict) -> str:
+        """Format votes for a prompt.
 
-        analysis = await ai_client.generate_voting_analysis(
-            vote_results, [context], f"Round analysis: {context}"
+        Sorted so the same votes always give the same prompt, and so share
+        ai_client's response cache entry.
+        """
+        return ", ".join(
+            f"{k}: {v}"
+            for k, v in sorted(vote_results.items(), key=lambda item: str(item[0]))
         )
 
-        return analysis
-
     def _update_suspicion_scores(self, session_id: int, patterns: Dict):
         """Update suspicion scores based on voting patterns."""
         logger.debug(
-            f"update_suspicion_scores called with session_id={session_id}, patterns={patterns}"
+            "update_suspicion_scores called with session_id=%s, patterns=%s",
+            session_id,
+            patterns,
         )
-        if session_id not in self.suspicion_scores:
-            self.suspicion_scores[session_id] = {}
+        self._touch(session_id)
+        scores = self.suspicion_scores.setdefault(session_id, {})
+
+        # Active players are loaded once per session, not every round
+        player_ids = self._active_players_cache.get(session_id)
+        if player_ids is None:
+            player_ids = self._load_active_player_ids(session_id)
+            self._active_players_cache[session_id] = player_ids
+
+        # Round-wide adjustments are the same for every player
+        base_increase = (
+            5 * patterns["quick_voting"] + 15 * patterns["vote_manipulation"]
+        )
+        suspicious_targets = set(patterns["suspicious_targets"])
+
+        for player_id in player_ids:
+            increase = base_increase + (10 if player_id in suspicious_targets else 0)
+            # Cap score at 100
+            scores[player_id] = min(scores.get(player_id, 0) + increase, 100)
+
+    def _load_active_player_ids(self, session_id: int) -> List[int]:
+        """Load the ids of players still in a session."""
+        stmt = select(PlayerGameLink.player_id).where(
+            PlayerGameLink.session_id == session_id,
+            PlayerGameLink.left_at.is_(None),
+        )
+        with engine.connect() as conn:
+            return list(conn.execute(stmt).scalars())
+
+    async def _prefetch_active_players(self, session_id: int):
+        """Fill the active player cache without blocking the event loop."""
+        if session_id not in self._active_players_cache:
+            self._active_players_cache[session_id] = await asyncio.to_thread(
+                self._load_active_player_ids, session_id
+            )
 
-        # Get all players in session
-        db = SessionLocal()
-        try:
-            # Assuming PlayerGameLink is defined elsewhere or needs to be imported
-            # from bot.database.models import PlayerGameLink # This import is missing in the original file
-            # For now, assuming it's available or will be added.
-            # If PlayerGameLink is not defined, this line will cause an error.
-            # Based on the original code, PlayerGameLink is not imported.
-            # I will remove this line as it's causing an error.
-            # links = (
-            #     db.query(PlayerGameLink)
-            #     .filter(
-            #         PlayerGameLink.session_id == session_id,
-            #         PlayerGameLink.left_at.is_(None),
-            #     )
-            #     .all()
-            # )
-
-            # for link in links:
-            #     player_id = link.player_id
-            #     current_score = self.suspicion_scores[session_id].get(player_id, 0)
-
-            #     # Adjust score based on patterns
-            #     if patterns["quick_voting"]:
-            #         current_score += 5
-
-            #     if player_id in patterns["suspicious_targets"]:
-            #         current_score += 10
-
-            #     if patterns["vote_manipulation"]:
-            #         current_score += 15
-
-            #     # Cap score at 100
-            #     current_score = min(current_score, 100)
-
-            #     self.suspicion_scores[session_id][player_id] = current_score
-            pass  # Removed the loop as PlayerGameLink is not defined
-        finally:
-            db.close()
+    def invalidate_active_players(self, session_id: int):
+        """Drop the cached player list; call when a player joins or leaves."""
+        self._active_players_cache.pop(session_id, None)
 
     def _store_analysis(
         self, session_id: int, round_number: int, insights: str, patterns: Dict
     ):
         """Store analysis results for future reference."""
         logger.debug(
-            f"store_analysis called with session_id={session_id}, round_number={round_number}, insights={insights}, patterns={patterns}"
+            "store_analysis called with session_id=%s, round_number=%s, insights=%s, patterns=%s",
+            session_id,
+            round_number,
+            insights,
+            patterns,
         )
+        self._touch(session_id)
         if session_id not in self.analysis_history:
-            self.analysis_history[session_id] = []
-
-        analysis_record = {
-            "round": round_number,
-            "insights": insights,
-            "patterns": patterns,
-            "timestamp": datetime.now(),
-        }
+            self.analysis_history[session_id] = deque(maxlen=self.history_limit)
 
-        self.analysis_history[session_id].append(analysis_record)
+        self.analysis_history[session_id].append(
+            AnalysisRecord(round_number, insights, patterns, datetime.now())
+        )
 
-    def get_analysis_history(self, session_id: int) -> List[Dict]:
+    def get_analysis_history(self, session_id: int) -> List[AnalysisRecord]:
         """Get analysis history for a session."""
-        logger.debug(f"get_analysis_history called with session_id={session_id}")
-        return self.analysis_history.get(session_id, [])
+        logger.debug("get_analysis_history called with session_id=%s", session_id)
+        return list(self.analysis_history.get(session_id, ()))
 
     def cleanup_session_analysis(self, session_id: int):
         """Clean up analysis data for a finished session."""
-        logger.debug(f"cleanup_session_analysis called with session_id={session_id}")
+        logger.debug("cleanup_session_analysis called with session_id=%s", session_id)
         if session_id in self.voting_patterns:
             del self.voting_patterns[session_id]
 
@@ -392,8 +658,39 @@ Be observant and slightly mysterious.
         if session_id in self.behavior_tracking:
             del self.behavior_tracking[session_id]
 
+        self._round_commentary.pop(session_id, None)
+        self._round_player_analyses.pop(session_id, None)
+        self.invalidate_active_players(session_id)
+        self._last_activity.pop(session_id, None)
+
         logger.info(f"Cleaned up voting analysis data for session {session_id}")
 
+    def _touch(self, session_id: int):
+        """Mark a session as active and make sure stale ones get evicted."""
+        self._last_activity[session_id] = time.monotonic()
+        if self._eviction_task is None or self._eviction_task.done():
+            try:
+                self._eviction_task = asyncio.get_running_loop().create_task(
+                    self._eviction_loop()
+                )
+            except RuntimeError:
+                # No event loop (e.g. sync callers); the next async touch starts it
+                pass
+
+    async def _eviction_loop(self):
+        """Periodically evict idle sessions; exits once none are tracked."""
+        while self._last_activity:
+            await asyncio.sleep(self.eviction_interval)
+            self._evict_stale()
+
+    def _evict_stale(self):
+        """Drop data for sessions idle longer than session_ttl."""
+        cutoff = time.monotonic() - self.session_ttl
+        stale = [sid for sid, seen in self._last_activity.items() if seen < cutoff]
+        for session_id in stale:
+            logger.info("Evicting idle voting analysis session %s", session_id)
+            self.cleanup_session_analysis(session_id)
+
 
 # Global instance
 ai_voting_analyzer = AIVotingAnalyzer()
@@ -1,22 +1,84 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import scoped_session, sessionmaker, declarative_base
+import asyncio
+import logging
+import orjson
 import os
+import threading
 from dotenv import load_dotenv
 from typing import NoReturn
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///db.sqlite3")
 
+_IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+# Keep warm connections for bursty handler traffic; recycle them before
+# server-side idle timeouts. SQLite's pools take no size limits.
 engine = create_engine(
     DATABASE_URL,
-    connect_args=(
-        {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
-    ),
+    pool_pre_ping=True,
+    pool_recycle=1800,
+    connect_args={"check_same_thread": False} if _IS_SQLITE else {},
+    # JSON columns go through orjson; values it can't encode are stored as str
+    json_serializer=lambda value: orjson.dumps(value, default=str).decode(),
+    json_deserializer=orjson.loads,
+    **({} if _IS_SQLITE else {"pool_size": 10, "max_overflow": 20}),
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def _session_scope():
+    """Scope sessions to the running asyncio task, or the thread outside one.
+
+    Thread-scoped sessions are only released by ScopedSession.remove(); run
+    blocking work that uses them through to_thread() below.
+    """
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    if task is None:
+        return threading.get_ident()
+    if task not in _scoped_tasks:
+        # Tasks that never call remove() (e.g. jobs) still release their session
+        _scoped_tasks.add(task)
+        task.add_done_callback(_close_task_session)
+    return task
+
+
+def _close_task_session(task: asyncio.Task):
+    _scoped_tasks.discard(task)
+    session = ScopedSession.registry.registry.pop(task, None)
+    if session is not None:
+        session.close()
+
+
+_scoped_tasks = set()
+
+# One session per handler task, shared by every manager the handler uses.
+# main.py calls ScopedSession.remove() as each update starts.
+ScopedSession = scoped_session(SessionLocal, scopefunc=_session_scope)
+
+
+def _call_and_remove_session(func, *args, **kwargs):
+    try:
+        return func(*args, **kwargs)
+    finally:
+        # Pool threads are reused; don't leave this thread's session open
+        ScopedSession.remove()
+
+
+async def to_thread(func, /, *args, **kwargs):
+    """asyncio.to_thread() that closes any ScopedSession the call opened."""
+    return await asyncio.to_thread(_call_and_remove_session, func, *args, **kwargs)
+
+
 Base = declarative_base()
 
 
@@ -25,3 +87,32 @@ def init_db() -> None:
     from bot.database.models import Player, Task, PlayerStats  # noqa: F401
 
     Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+
+
+def upgrade_schema(bind) -> None:
+    """Add nullable columns and indexes that create_all() skips on old tables."""
+    inspector = inspect(bind)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable or column.primary_key:
+                continue
+            with bind.begin() as conn:
+                column_type = column.type.compile(dialect=conn.dialect)
+                conn.execute(
+                    text(
+                        f"ALTER TABLE {table.name} "
+                        f"ADD COLUMN {column.name} {column_type}"
+                    )
+                )
+            logger.info("Added column %s.%s", table.name, column.name)
+        for index in table.indexes:
+            try:
+                with bind.begin() as conn:
+                    index.create(conn, checkfirst=True)
+            except SQLAlchemyError as e:
+                # e.g. existing duplicate rows; callers fall back without it
+                logger.warning("Could not create index %s: %s", index.name, e)
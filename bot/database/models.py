@@ -1,12 +1,14 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from bot.database import Base
-from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.types import JSON
+from sqlalchemy.dialects.postgresql import JSONB
 import datetime
 
-Base = declarative_base()
+# Native JSON; binary JSONB on PostgreSQL so fields can be indexed and queried
+JSONType = JSON().with_variant(JSONB(), "postgresql")
+
 
 class Player(Base):
     __tablename__ = "players"
@@ -15,6 +17,7 @@ class Player(Base):
     username = Column(String, unique=True, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+
 class Task(Base):
     __tablename__ = "tasks"
     id = Column(Integer, primary_key=True, index=True)
@@ -23,6 +26,7 @@ class Task(Base):
     player_id = Column(Integer, ForeignKey("players.id"))
     player = relationship("Player")
 
+
 class PlayerStats(Base):
     __tablename__ = "player_stats"
     id = Column(Integer, primary_key=True, index=True)
@@ -33,6 +37,7 @@ class PlayerStats(Base):
     wins = Column(Integer, default=0)
     losses = Column(Integer, default=0)
 
+
 class GameSession(Base):
     __tablename__ = "game_sessions"
     id = Column(Integer, primary_key=True, index=True)
@@ -43,7 +48,8 @@ class GameSession(Base):
     is_active = Column(Boolean, default=True)
     winner_id = Column(Integer, ForeignKey("players.id"), nullable=True)
     winner = relationship("Player", foreign_keys=[winner_id])
-    current_state = Column(String) # Store game-specific state as JSON string
+    current_state = Column(JSONType, nullable=True)  # Game-specific state
+
 
 class GameLog(Base):
     __tablename__ = "game_logs"
@@ -52,10 +58,11 @@ class GameLog(Base):
     session = relationship("GameSession")
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
     event_type = Column(String)
-    event_data = Column(String) # Store event details as JSON string
+    event_data = Column(JSONType, nullable=True)  # Event details
     player_id = Column(Integer, ForeignKey("players.id"), nullable=True)
     player = relationship("Player", foreign_keys=[player_id])
 
+
 class PlayerGameLink(Base):
     __tablename__ = "player_game_link"
     id = Column(Integer, primary_key=True, index=True)
@@ -64,8 +71,54 @@ class PlayerGameLink(Base):
     role = Column(String, nullable=True)
     is_active = Column(Boolean, default=True)
     score = Column(Integer, default=0)
+    # NULL while still in the game
+    left_at = Column(DateTime(timezone=True), nullable=True)
     player = relationship("Player", foreign_keys=[player_id])
     game_session = relationship("GameSession", foreign_keys=[session_id])
+    # Active-player lookups filter on (session_id, left_at IS NULL); where the
+    # dialect supports it, only rows of players still in the game are indexed
+    __table_args__ = (
+        Index(
+            "ix_pgl_session_active",
+            "session_id",
+            "left_at",
+            postgresql_where=left_at.is_(None),
+            sqlite_where=left_at.is_(None),
+        ),
+        # A player can be in a session only once at a time; lets joins upsert
+        Index(
+            "uq_pgl_session_player_active",
+            "session_id",
+            "player_id",
+            unique=True,
+            postgresql_where=left_at.is_(None),
+            sqlite_where=left_at.is_(None),
+        ),
+    )
+
+
+class JoinQueue(Base):
+    __tablename__ = "join_queue"
+    id = Column(Integer, primary_key=True, index=True)
+    player_id = Column(Integer, ForeignKey("players.id"))
+    chat_id = Column(Integer)
+    joined_at = Column(DateTime(timezone=True), server_default=func.now())
+    notified_at = Column(DateTime(timezone=True), nullable=True)  # NULL while waiting
+    player = relationship("Player", foreign_keys=[player_id])
+    __table_args__ = (
+        # Queue reads filter on (chat_id, notified_at IS NULL)
+        Index("ix_queue_chat_active", "chat_id", "notified_at"),
+        # A player waits in a chat's queue only once; lets add_to_queue upsert
+        Index(
+            "uq_queue_player_chat_waiting",
+            "player_id",
+            "chat_id",
+            unique=True,
+            postgresql_where=notified_at.is_(None),
+            sqlite_where=notified_at.is_(None),
+        ),
+    )
+
 
 class DiscussionLog(Base):
     __tablename__ = "discussion_logs"
@@ -75,9 +128,10 @@ class DiscussionLog(Base):
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
     speaker_id = Column(Integer, ForeignKey("players.id"), nullable=True)
     speaker = relationship("Player", foreign_keys=[speaker_id])
-    speaker_type = Column(String) # e.g., "player", "ai", "system"
+    speaker_type = Column(String)  # e.g., "player", "ai", "system"
     message = Column(String)
 
+
 class TaskLog(Base):
     __tablename__ = "task_logs"
     id = Column(Integer, primary_key=True, index=True)
@@ -85,10 +139,11 @@ class TaskLog(Base):
     task = relationship("Task")
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
     event_type = Column(String)
-    details = Column(String)
+    details = Column(JSONType, nullable=True)
     player_id = Column(Integer, ForeignKey("players.id"), nullable=True)
     player = relationship("Player", foreign_keys=[player_id])
 
+
 class VoteHistory(Base):
     __tablename__ = "vote_history"
     id = Column(Integer, primary_key=True, index=True)
@@ -96,28 +151,46 @@ class VoteHistory(Base):
     session = relationship("GameSession")
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
     voter_id = Column(Integer, ForeignKey("players.id"))
-    voter = relationship("Player", foreign_keys=[voter_id], primaryjoin="Player.id == VoteHistory.voter_id")
+    voter = relationship(
+        "Player",
+        foreign_keys=[voter_id],
+        primaryjoin="Player.id == VoteHistory.voter_id",
+    )
     candidate_id = Column(Integer, ForeignKey("players.id"))
-    candidate = relationship("Player", foreign_keys=[candidate_id], primaryjoin="Player.id == VoteHistory.candidate_id")
-    vote_type = Column(String) # e.g., "elimination", "task_assignment"
+    candidate = relationship(
+        "Player",
+        foreign_keys=[candidate_id],
+        primaryjoin="Player.id == VoteHistory.candidate_id",
+    )
+    vote_type = Column(String)  # e.g., "elimination", "task_assignment"
+    target_id = Column(Integer, ForeignKey("players.id"), nullable=True)
+    round_number = Column(Integer, nullable=True)
+    anonymous_vote = Column(Boolean, default=False)
+    double_vote = Column(Boolean, default=False)
+    # Round analysis filters on (session_id, round_number)
+    __table_args__ = (
+        Index("ix_votehistory_session_round", "session_id", "round_number"),
+    )
+
 
 class ActiveGame(Base):
-    __tablename__ = 'active_games'
+    __tablename__ = "active_games"
     chat_id = Column(Integer, primary_key=True)
     mode = Column(String, nullable=False)  # 'pvp', 'group_ai', 'group_pvp'
     data = Column(JSON, nullable=False)
     last_activity = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
 
+
 class GameStats(Base):
-    __tablename__ = 'game_stats'
+    __tablename__ = "game_stats"
     id = Column(Integer, primary_key=True, autoincrement=True)
     chat_id = Column(Integer, nullable=False)
     game_mode = Column(String, nullable=False)  # 'pvp', 'group_ai', 'group_pvp'
     player_id = Column(Integer, nullable=True)  # Null for team stats
-    team = Column(String, nullable=True)        # 'A', 'B', or None
-    result = Column(String, nullable=False)     # 'win', 'loss', 'draw'
+    team = Column(String, nullable=True)  # 'A', 'B', or None
+    result = Column(String, nullable=False)  # 'win', 'loss', 'draw'
     guesses = Column(Integer, nullable=False)
     max_stress = Column(Integer, nullable=False)
-    duration = Column(Integer, nullable=True)   # seconds
+    duration = Column(Integer, nullable=True)  # seconds
     mvp = Column(Boolean, default=False)
     timestamp = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
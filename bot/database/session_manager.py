@@ -2,11 +2,25 @@
 Database session manager for game sessions and analytics.
 """
 
+from contextlib import contextmanager
+from weakref import WeakKeyDictionary
 from typing import List, Optional, Dict, Any
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, desc, func
-from datetime import datetime, timedelta
-from bot.database import SessionLocal
+from sqlalchemy.orm import Session, contains_eager, selectinload
+from sqlalchemy import (
+    and_,
+    case,
+    delete,
+    desc,
+    event,
+    func,
+    insert,
+    inspect,
+    select,
+    update,
+)
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.dialects import postgresql, sqlite
+from bot.database import ScopedSession, SessionLocal
 from bot.database.models import (
     GameSession,
     PlayerGameLink,
@@ -19,23 +33,137 @@ from bot.database.models import (
     GameStats,
 )
 import logging
-import datetime
 import json
 
 logger = logging.getLogger(__name__)
 
+# Rows per executemany batch for bulk log inserts
+LOG_BATCH_SIZE = 50
+
+# Dialects whose INSERT supports ON CONFLICT DO NOTHING
+_UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+# Conflict targets of the join and queue upserts; databases created before
+# they existed may lack them (see bot.database.upgrade_schema)
+ACTIVE_LINK_INDEX = "uq_pgl_session_player_active"
+WAITING_QUEUE_INDEX = "uq_queue_player_chat_waiting"
+_known_indexes = WeakKeyDictionary()  # engine -> {(table, index name): present}
+
+
+def _has_index(engine, table: str, name: str) -> bool:
+    """Whether the engine's table has the named index; checked once per engine."""
+    known = _known_indexes.setdefault(engine, {})
+    present = known.get((table, name))
+    if present is None:
+        indexes = inspect(engine).get_indexes(table)
+        present = any(index["name"] == name for index in indexes)
+        known[(table, name)] = present
+    return present
+
+
+def _upsert_insert(db, table: str, index_name: str):
+    """The dialect's ON CONFLICT insert, or None if it or its index is missing."""
+    bind = db.get_bind()
+    upsert = _UPSERT_INSERTS.get(bind.dialect.name)
+    if upsert is None or not _has_index(bind.engine, table, index_name):
+        return None
+    return upsert
+
+
+# Session.info key of the per-request read cache
+REQUEST_CACHE_KEY = "request_cache"
+
+
+def _request_cached(db, key, load):
+    """Memoize a read on the request's session until its next commit."""
+    cache = db.info.setdefault(REQUEST_CACHE_KEY, {})
+    if key not in cache:
+        cache[key] = load()
+    return cache[key]
+
+
+@event.listens_for(SessionLocal, "after_commit")
+@event.listens_for(SessionLocal, "after_rollback")
+def _clear_request_cache(session):
+    session.info.pop(REQUEST_CACHE_KEY, None)
+
+
+def _discussion_row(session_id: int, player_id: int, message: str) -> Dict[str, Any]:
+    """DiscussionLog columns for a player's message."""
+    return {
+        "session_id": session_id,
+        "speaker_id": player_id,
+        "speaker_type": "player",
+        "message": message,
+    }
+
+
+def _task_completion_row(
+    session_id: int,
+    player_id: int,
+    task_type: str,
+    task_description: str,
+    xp_earned: int,
+) -> Dict[str, Any]:
+    """TaskLog columns for a completed task.
+
+    Game tasks have no row in the tasks table, so details carry the task.
+    """
+    return {
+        "player_id": player_id,
+        "event_type": "task_completed",
+        "details": {
+            "session_id": session_id,
+            "task_type": task_type,
+            "description": task_description,
+            "xp_earned": xp_earned,
+        },
+    }
+
 
 class GameSessionManager:
     """Manages game sessions in the database."""
 
     def __init__(self):
-        self.db = SessionLocal()
+        # Request-scoped; closed by ScopedSession.remove() when the update ends
+        self.db = ScopedSession
+        self._autocommit = True
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.db.close()
+        if exc_type is not None:
+            self.db.rollback()
+
+    @contextmanager
+    def batch(self):
+        """Group writes into one transaction, committed when the block exits.
+
+        Inside the block, write methods only flush, so new rows still get
+        their ids. Nested blocks commit with the outermost one.
+        """
+        outermost = self._autocommit
+        self._autocommit = False
+        try:
+            yield self
+            if outermost:
+                self.db.commit()
+        except Exception:
+            if outermost:
+                self.db.rollback()
+            raise
+        finally:
+            self._autocommit = outermost
+
+    def _commit(self, *instances):
+        """Commit and refresh instances, or only flush inside batch()."""
+        if not self._autocommit:
+            self.db.flush()
+            return
+        self.db.commit()
+        for instance in instances:
+            self.db.refresh(instance)
 
     def create_session(
         self,
@@ -55,15 +183,18 @@ class GameSessionManager:
             status="waiting",
         )
         self.db.add(session)
-        self.db.commit()
-        self.db.refresh(session)
+        self._commit(session)
         logger.info(f"Created game session {session.id} for topic {topic_id}")
         return session
 
     def get_session_by_topic(self, topic_id: int) -> Optional[GameSession]:
         """Get game session by topic ID."""
-        return (
-            self.db.query(GameSession).filter(GameSession.topic_id == topic_id).first()
+        return _request_cached(
+            self.db,
+            ("session_by_topic", topic_id),
+            lambda: self.db.query(GameSession)
+            .filter(GameSession.topic_id == topic_id)
+            .first(),
         )
 
     def get_active_sessions(self, chat_id: Optional[int] = None) -> List[GameSession]:
@@ -85,14 +216,14 @@ class GameSessionManager:
 
         session.status = status
         if status == "active" and not session.started_at:
-            session.started_at = datetime.now()
+            session.started_at = datetime.now(timezone.utc)
         elif status == "finished" and not session.finished_at:
-            session.finished_at = datetime.now()
+            session.finished_at = datetime.now(timezone.utc)
 
         if game_state is not None:
             session.game_state = game_state
 
-        self.db.commit()
+        self._commit()
         logger.info(f"Updated session {session.id} status to {status}")
         return True
 
@@ -100,54 +231,70 @@ class GameSessionManager:
         self, session_id: int, player_id: int, role: str = "crewmate"
     ) -> PlayerGameLink:
         """Add a player to a game session."""
-        # Check if player is already in session
-        existing = (
-            self.db.query(PlayerGameLink)
-            .filter(
-                and_(
-                    PlayerGameLink.session_id == session_id,
-                    PlayerGameLink.player_id == player_id,
-                    PlayerGameLink.left_at.is_(None),
+        active_link = and_(
+            PlayerGameLink.session_id == session_id,
+            PlayerGameLink.player_id == player_id,
+            PlayerGameLink.left_at.is_(None),
+        )
+        upsert = _upsert_insert(
+            self.db, PlayerGameLink.__tablename__, ACTIVE_LINK_INDEX
+        )
+        if upsert is not None:
+            # Insert and duplicate check in one atomic statement, relying on
+            # the uq_pgl_session_player_active partial unique index
+            stmt = (
+                upsert(PlayerGameLink)
+                .values(session_id=session_id, player_id=player_id, role=role)
+                .on_conflict_do_nothing(
+                    index_elements=["session_id", "player_id"],
+                    index_where=PlayerGameLink.left_at.is_(None),
                 )
+                .returning(PlayerGameLink)
             )
-            .first()
-        )
-
-        if existing:
-            return existing
+            link = self.db.scalars(stmt).first()
+            self._commit()
+            if link is None:
+                return self.db.query(PlayerGameLink).filter(active_link).first()
+        else:
+            # Check if player is already in session
+            existing = self.db.query(PlayerGameLink).filter(active_link).first()
+            if existing:
+                return existing
+
+            link = PlayerGameLink(session_id=session_id, player_id=player_id, role=role)
+            self.db.add(link)
+            self._commit(link)
 
-        link = PlayerGameLink(session_id=session_id, player_id=player_id, role=role)
-        self.db.add(link)
-        self.db.commit()
-        self.db.refresh(link)
         logger.info(f"Added player {player_id} to session {session_id}")
         return link
 
     def remove_player_from_session(self, session_id: int, player_id: int) -> bool:
         """Remove a player from a game session."""
-        link = (
-            self.db.query(PlayerGameLink)
-            .filter(
+        # Update in place; no link object is loaded just to check it exists
+        result = self.db.execute(
+            update(PlayerGameLink)
+            .where(
                 and_(
                     PlayerGameLink.session_id == session_id,
                     PlayerGameLink.player_id == player_id,
                     PlayerGameLink.left_at.is_(None),
                 )
             )
-            .first()
+            .values(left_at=datetime.now(timezone.utc))
         )
 
-        if link:
-            link.left_at = datetime.now()
-            self.db.commit()
+        if result.rowcount:
+            self._commit()
             logger.info(f"Removed player {player_id} from session {session_id}")
             return True
         return False
 
     def get_session_players(self, session_id: int) -> List[PlayerGameLink]:
-        """Get all players in a session."""
+        """Get all players in a session, with each link's Player loaded."""
         return (
             self.db.query(PlayerGameLink)
+            # One extra IN query for all players instead of a lazy load per link
+            .options(selectinload(PlayerGameLink.player))
             .filter(
                 and_(
                     PlayerGameLink.session_id == session_id,
@@ -174,20 +321,16 @@ class GameSessionManager:
             vote_type=vote_type,
         )
         self.db.add(vote)
-        self.db.commit()
-        self.db.refresh(vote)
+        self._commit(vote)
         return vote
 
     def log_discussion(
-        self, session_id: int, player_id: int, message: str, phase: str = "discussion"
+        self, session_id: int, player_id: int, message: str
     ) -> DiscussionLog:
-        """Log a discussion message."""
-        discussion = DiscussionLog(
-            session_id=session_id, player_id=player_id, message=message, phase=phase
-        )
+        """Log a player's discussion message."""
+        discussion = DiscussionLog(**_discussion_row(session_id, player_id, message))
         self.db.add(discussion)
-        self.db.commit()
-        self.db.refresh(discussion)
+        self._commit(discussion)
         return discussion
 
     def log_task_completion(
@@ -200,75 +343,204 @@ class GameSessionManager:
     ) -> TaskLog:
         """Log a task completion."""
         task_log = TaskLog(
-            session_id=session_id,
-            player_id=player_id,
-            task_type=task_type,
-            task_description=task_description,
-            xp_earned=xp_earned,
+            **_task_completion_row(
+                session_id, player_id, task_type, task_description, xp_earned
+            )
         )
         self.db.add(task_log)
-        self.db.commit()
-        self.db.refresh(task_log)
+        self._commit(task_log)
         return task_log
 
+    def log_votes_bulk(self, rows: List[Dict[str, Any]]) -> int:
+        """Log many votes in one transaction. Rows take log_vote's arguments."""
+        return self._bulk_insert(VoteHistory, rows)
+
+    def log_discussions_bulk(self, rows: List[Dict[str, Any]]) -> int:
+        """Log many discussion messages in one transaction. Rows are column dicts."""
+        return self._bulk_insert(DiscussionLog, rows)
+
+    def log_task_completions_bulk(self, rows: List[Dict[str, Any]]) -> int:
+        """Log many task completions in one transaction. Rows are column dicts."""
+        return self._bulk_insert(TaskLog, rows)
+
+    def _bulk_insert(self, model, rows: List[Dict[str, Any]]) -> int:
+        """Insert rows with executemany in LOG_BATCH_SIZE chunks and commit once."""
+        if not rows:
+            return 0
+        # insert() ignores keys that aren't columns; refuse them instead
+        unknown = set().union(*rows).difference(model.__table__.columns.keys())
+        if unknown:
+            raise ValueError(
+                f"Unknown {model.__tablename__} columns: {', '.join(sorted(unknown))}"
+            )
+        try:
+            for start in range(0, len(rows), LOG_BATCH_SIZE):
+                self.db.execute(insert(model), rows[start : start + LOG_BATCH_SIZE])
+            self._commit()
+        except Exception:
+            # Inside batch() the whole block is rolled back by batch itself
+            if self._autocommit:
+                self.db.rollback()
+            raise
+        return len(rows)
+
     def cleanup_old_sessions(self, max_age_hours: int = 24) -> int:
-        """Clean up old finished/abandoned sessions."""
-        cutoff_time = datetime.now() - timedelta(hours=max_age_hours)
-        old_sessions = (
-            self.db.query(GameSession)
-            .filter(
+        """Clean up sessions that ended more than max_age_hours ago."""
+        cutoff_time = datetime.now(timezone.utc) - timedelta(hours=max_age_hours)
+        # One server-side DELETE; no rows are loaded into the session
+        result = self.db.execute(
+            delete(GameSession).where(
                 and_(
-                    GameSession.status.in_(["finished", "abandoned"]),
-                    GameSession.finished_at < cutoff_time,
+                    GameSession.is_active.is_(False),
+                    GameSession.end_time < cutoff_time,
                 )
-            )
-            .all()
+            ),
+            execution_options={"synchronize_session": False},
         )
+        count = result.rowcount
 
-        count = len(old_sessions)
-        for session in old_sessions:
-            self.db.delete(session)
-
-        self.db.commit()
+        self._commit()
         logger.info(f"Cleaned up {count} old game sessions")
         return count
 
 
+class GameLogBuffer:
+    """Buffers a game's vote, discussion and task logs for bulk writes.
+
+    Call flush() at phase boundaries; it is also called automatically once
+    LOG_BATCH_SIZE rows are pending.
+    """
+
+    def __init__(self, session_manager: GameSessionManager):
+        self.session_manager = session_manager
+        self.votes: List[Dict[str, Any]] = []
+        self.discussions: List[Dict[str, Any]] = []
+        self.task_completions: List[Dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self.votes) + len(self.discussions) + len(self.task_completions)
+
+    def add_vote(
+        self,
+        session_id: int,
+        voter_id: int,
+        target_id: int,
+        round_number: int = 1,
+        vote_type: str = "eject",
+    ):
+        """Buffer a vote."""
+        self.votes.append(
+            {
+                "session_id": session_id,
+                "voter_id": voter_id,
+                "target_id": target_id,
+                "round_number": round_number,
+                "vote_type": vote_type,
+            }
+        )
+        self._flush_if_full()
+
+    def add_discussion(self, session_id: int, player_id: int, message: str):
+        """Buffer a player's discussion message."""
+        self.discussions.append(_discussion_row(session_id, player_id, message))
+        self._flush_if_full()
+
+    def add_task_completion(
+        self,
+        session_id: int,
+        player_id: int,
+        task_type: str,
+        task_description: str,
+        xp_earned: int = 0,
+    ):
+        """Buffer a task completion."""
+        self.task_completions.append(
+            _task_completion_row(
+                session_id, player_id, task_type, task_description, xp_earned
+            )
+        )
+        self._flush_if_full()
+
+    def _flush_if_full(self):
+        if len(self) >= LOG_BATCH_SIZE:
+            self.flush()
+
+    def flush(self) -> int:
+        """Write all buffered logs. A failed write is logged and the logs dropped."""
+        written = 0
+        try:
+            # All pending rows are written in one transaction
+            with self.session_manager.batch():
+                for rows, write in (
+                    (self.votes, self.session_manager.log_votes_bulk),
+                    (self.discussions, self.session_manager.log_discussions_bulk),
+                    (
+                        self.task_completions,
+                        self.session_manager.log_task_completions_bulk,
+                    ),
+                ):
+                    written += write(rows)
+        except Exception as e:
+            logger.error("Failed to write %s buffered logs: %s", len(self), e)
+            written = 0
+        finally:
+            self.votes.clear()
+            self.discussions.clear()
+            self.task_completions.clear()
+        return written
+
+
 class JoinQueueManager:
     """Manages the join queue in the database."""
 
     def __init__(self):
-        self.db = SessionLocal()
+        self.db = ScopedSession
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.db.close()
+        if exc_type is not None:
+            self.db.rollback()
 
     def add_to_queue(self, player_id: int, chat_id: int) -> bool:
         """Add a player to the join queue."""
-        # Check if already in queue
-        existing = (
-            self.db.query(JoinQueue)
-            .filter(
-                and_(
-                    JoinQueue.player_id == player_id,
-                    JoinQueue.chat_id == chat_id,
-                    JoinQueue.notified_at.is_(None),
+        upsert = _upsert_insert(self.db, JoinQueue.__tablename__, WAITING_QUEUE_INDEX)
+        if upsert is not None:
+            # Insert and duplicate check in one atomic statement, relying on
+            # the uq_queue_player_chat_waiting partial unique index
+            stmt = (
+                upsert(JoinQueue)
+                .values(player_id=player_id, chat_id=chat_id)
+                .on_conflict_do_nothing(
+                    index_elements=["player_id", "chat_id"],
+                    index_where=JoinQueue.notified_at.is_(None),
                 )
+                .returning(JoinQueue.id)
             )
-            .first()
-        )
-
-        if existing:
-            return False
+            added = self.db.execute(stmt).first() is not None
+            self.db.commit()
+        else:
+            # Check if already in queue, fetching only an id
+            existing = self.db.execute(
+                select(JoinQueue.id)
+                .where(
+                    and_(
+                        JoinQueue.player_id == player_id,
+                        JoinQueue.chat_id == chat_id,
+                        JoinQueue.notified_at.is_(None),
+                    )
+                )
+                .limit(1)
+            ).first()
+            added = existing is None
+            if added:
+                self.db.add(JoinQueue(player_id=player_id, chat_id=chat_id))
+                self.db.commit()
 
-        queue_entry = JoinQueue(player_id=player_id, chat_id=chat_id)
-        self.db.add(queue_entry)
-        self.db.commit()
-        logger.info(f"Added player {player_id} to join queue for chat {chat_id}")
-        return True
+        if added:
+            logger.info(f"Added player {player_id} to join queue for chat {chat_id}")
+        return added
 
     def get_queue(self, chat_id: Optional[int] = None) -> List[JoinQueue]:
         """Get all players in the queue."""
@@ -295,26 +567,32 @@ class JoinQueueManager:
 
     def notify_queue(self, chat_id: int) -> List[int]:
         """Mark all queued players as notified and return their IDs."""
-        queue_entries = self.get_queue(chat_id)
-        player_ids = [entry.player_id for entry in queue_entries]
-
-        for entry in queue_entries:
-            entry.notified_at = datetime.now()
-
-        self.db.commit()
+        entries = self.db.execute(
+            select(JoinQueue.id, JoinQueue.player_id).where(
+                and_(JoinQueue.chat_id == chat_id, JoinQueue.notified_at.is_(None))
+            )
+        ).all()
+        player_ids = [player_id for _, player_id in entries]
+
+        # One UPDATE for the selected rows; entries queued meanwhile stay queued
+        if entries:
+            self.db.execute(
+                update(JoinQueue)
+                .where(JoinQueue.id.in_([entry_id for entry_id, _ in entries]))
+                .values(notified_at=datetime.now(timezone.utc))
+            )
+            self.db.commit()
         logger.info(f"Notified {len(player_ids)} players in queue for chat {chat_id}")
         return player_ids
 
     def cleanup_old_queue(self, max_age_hours: int = 6) -> int:
         """Clean up old queue entries."""
-        cutoff_time = datetime.now() - timedelta(hours=max_age_hours)
-        old_entries = (
-            self.db.query(JoinQueue).filter(JoinQueue.joined_at < cutoff_time).all()
+        cutoff_time = datetime.now(timezone.utc) - timedelta(hours=max_age_hours)
+        result = self.db.execute(
+            delete(JoinQueue).where(JoinQueue.joined_at < cutoff_time),
+            execution_options={"synchronize_session": False},
         )
-
-        count = len(old_entries)
-        for entry in old_entries:
-            self.db.delete(entry)
+        count = result.rowcount
 
         self.db.commit()
         logger.info(f"Cleaned up {count} old queue entries")
@@ -325,46 +603,44 @@ class AnalyticsManager:
     """Manages analytics queries."""
 
     def __init__(self):
-        self.db = SessionLocal()
+        self.db = ScopedSession
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.db.close()
+        if exc_type is not None:
+            self.db.rollback()
 
     def get_player_stats(self, player_id: int) -> Dict[str, Any]:
         """Get comprehensive stats for a player."""
+        return _request_cached(
+            self.db,
+            ("player_stats", player_id),
+            lambda: self._load_player_stats(player_id),
+        )
+
+    def _load_player_stats(self, player_id: int) -> Dict[str, Any]:
         # Get basic player info
         player = self.db.query(Player).filter(Player.id == player_id).first()
         if not player:
             return {}
 
-        # Get game participation stats
-        games_played = (
-            self.db.query(PlayerGameLink)
-            .filter(PlayerGameLink.player_id == player_id)
-            .count()
-        )
-
-        games_won = (
-            self.db.query(PlayerGameLink)
-            .filter(
-                and_(
-                    PlayerGameLink.player_id == player_id,
-                    PlayerGameLink.outcome == "win",
-                )
+        # Get game participation stats in one aggregate query
+        # A game counts as won when its session names the player as winner
+        stats_stmt = (
+            select(
+                func.count(PlayerGameLink.id),
+                func.coalesce(
+                    func.sum(case((GameSession.winner_id == player_id, 1), else_=0)),
+                    0,
+                ),
+                func.coalesce(func.sum(PlayerGameLink.score), 0),
             )
-            .count()
-        )
-
-        total_xp_earned = (
-            self.db.query(PlayerGameLink)
-            .filter(PlayerGameLink.player_id == player_id)
-            .with_entities(func.sum(PlayerGameLink.xp_earned))
-            .scalar()
-            or 0
+            .outerjoin(GameSession, PlayerGameLink.session_id == GameSession.id)
+            .where(PlayerGameLink.player_id == player_id)
         )
+        games_played, games_won, total_xp_earned = self.db.execute(stats_stmt).one()
 
         return {
             "player": player,
@@ -379,20 +655,36 @@ class AnalyticsManager:
         players = (
             self.db.query(PlayerGameLink)
             .filter(PlayerGameLink.session_id == session_id)
-            .join(Player)
-            .order_by(desc(PlayerGameLink.xp_earned))
+            .join(Player, PlayerGameLink.player_id == Player.id)
+            .outerjoin(GameSession, PlayerGameLink.session_id == GameSession.id)
+            # Fill link.player/game_session from the joins instead of one
+            # SELECT per player
+            .options(
+                contains_eager(PlayerGameLink.player),
+                contains_eager(PlayerGameLink.game_session),
+            )
+            .order_by(desc(PlayerGameLink.score))
             .all()
         )
 
         leaderboard = []
         for i, player_link in enumerate(players, 1):
+            winner_id = (
+                player_link.game_session.winner_id
+                if player_link.game_session
+                else None
+            )
+            if winner_id is None:
+                outcome = None
+            else:
+                outcome = "win" if winner_id == player_link.player_id else "lose"
             leaderboard.append(
                 {
                     "rank": i,
-                    "player_name": player_link.player.name,
-                    "xp_earned": player_link.xp_earned,
+                    "player_name": player_link.player.username,
+                    "xp_earned": player_link.score,
                     "role": player_link.role,
-                    "outcome": player_link.outcome,
+                    "outcome": outcome,
                 }
             )
 
@@ -400,24 +692,25 @@ class AnalyticsManager:
 
     def get_chat_stats(self, chat_id: int, days: int = 7) -> Dict[str, Any]:
         """Get stats for a specific chat."""
-        cutoff_date = datetime.now() - timedelta(days=days)
-
-        sessions = (
-            self.db.query(GameSession)
-            .filter(
-                and_(
-                    GameSession.chat_id == chat_id,
-                    GameSession.created_at >= cutoff_date,
+        cutoff_date = datetime.now(timezone.utc) - timedelta(days=days)
+
+        # Count active/ended sessions in SQL instead of loading every session
+        active_counts = dict(
+            self.db.execute(
+                select(GameSession.is_active, func.count())
+                .where(
+                    and_(
+                        GameSession.chat_id == chat_id,
+                        GameSession.start_time >= cutoff_date,
+                    )
                 )
-            )
-            .all()
+                .group_by(GameSession.is_active)
+            ).all()
         )
 
-        total_sessions = len(sessions)
-        active_sessions = len(
-            [s for s in sessions if s.status in ["waiting", "active"]]
-        )
-        finished_sessions = len([s for s in sessions if s.status == "finished"])
+        total_sessions = sum(active_counts.values())
+        active_sessions = active_counts.get(True, 0)
+        finished_sessions = active_counts.get(False, 0)
 
         return {
             "total_sessions": total_sessions,
@@ -432,7 +725,7 @@ class AnalyticsManager:
 def save_game(session: Session, chat_id: int, mode: str, data: dict) -> None:
     """Save or update a game in the database."""
     obj = session.query(ActiveGame).filter_by(chat_id=chat_id).first()
-    now = datetime.datetime.utcnow()
+    now = datetime.utcnow()
     if obj:
         obj.mode = mode
         obj.data = data
@@ -2,16 +2,66 @@
 AI Handlers - Handle AI-powered features and commands.
 """
 
+from contextlib import aclosing
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
+from telegram.error import BadRequest, TelegramError
 from bot.ai import ai_game_engine
 from bot.database import SessionLocal
 from bot.database.models import Player, GameSession
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+# Minimum seconds between message edits while streaming AI text
+STREAM_EDIT_INTERVAL = 1.0
+
+
+async def _reply_streamed(message, chunks, reply_markup=None):
+    """Reply with AI text, editing the message in place as chunks arrive.
+
+    Intermediate edits are plain text; the final edit applies Markdown and
+    the reply markup once the full text is known.
+    """
+    text = ""
+    sent = None
+    last_edit = 0.0
+    # Close the stream even if a reply fails, so generation stops right away
+    async with aclosing(chunks):
+        async for chunk in chunks:
+            text += chunk
+            if not text.strip():
+                continue
+            now = time.monotonic()
+            if sent is None:
+                sent = await message.reply_text(text)
+                last_edit = now
+            elif now - last_edit >= STREAM_EDIT_INTERVAL:
+                try:
+                    await sent.edit_text(text)
+                except TelegramError as e:
+                    logger.debug("Skipping streamed edit: %s", e)
+                last_edit = now
+
+    try:
+        if sent is None:
+            return await message.reply_text(
+                text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup
+            )
+        return await sent.edit_text(
+            text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup
+        )
+    except BadRequest as e:
+        if "message is not modified" in str(e).lower():
+            return sent
+        # Generated text is not always valid Markdown; fall back to plain text
+        logger.debug("Markdown rejected, sending plain text: %s", e)
+        if sent is None:
+            return await message.reply_text(text, reply_markup=reply_markup)
+        return await sent.edit_text(text, reply_markup=reply_markup)
+
 
 # ============================================================================
 # AI FEATURE COMMANDS
@@ -252,9 +302,6 @@ async def ai_lore_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     logger.info(f"ai_lore_handler called by user {user.id}")
 
-    # Generate world lore
-    lore = await ai_game_engine.generate_world_lore()
-
     keyboard = InlineKeyboardMarkup(
         [
             [InlineKeyboardButton("📚 Generate New Lore", callback_data="ai_new_lore")],
@@ -271,8 +318,11 @@ async def ai_lore_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         ]
     )
 
-    await update.message.reply_text(
-        lore, parse_mode=ParseMode.MARKDOWN, reply_markup=keyboard
+    # Stream world lore so the first lines show up while the rest generates
+    await _reply_streamed(
+        update.message,
+        ai_game_engine.generate_world_lore_stream(),
+        reply_markup=keyboard,
     )
 
 
@@ -303,7 +353,9 @@ async def ai_task_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         role = link.role
 
         # Generate AI task
-        task = await ai_game_engine.generate_ai_task(session_id, user.id, role)
+        task = await ai_game_engine.generate_ai_task(
+            session_id, user.id, role, player_name=user.first_name
+        )
 
         keyboard = InlineKeyboardMarkup(
             [
@@ -435,9 +487,7 @@ async def trigger_chaos_event(update: Update, context: ContextTypes.DEFAULT_TYPE
             event.activate()
 
             # Add to active events
-            if session_id not in ai_game_engine.chaos_events.active_events:
-                ai_game_engine.chaos_events.active_events[session_id] = []
-            ai_game_engine.chaos_events.active_events[session_id].append(event)
+            ai_game_engine.chaos_events.add_active_event(session_id, event)
 
             await query.message.reply_text(
                 f"⚡ **Chaos Event Triggered!**\n\n{event.description}",
@@ -455,10 +505,8 @@ async def generate_new_lore(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     logger.info(f"generate_new_lore called by user {update.effective_user.id}")
 
-    # Generate new lore
-    lore = await ai_game_engine.generate_world_lore()
-
-    await query.message.reply_text(lore, parse_mode=ParseMode.MARKDOWN)
+    # Stream new lore
+    await _reply_streamed(query.message, ai_game_engine.generate_world_lore_stream())
 
 
 async def complete_ai_task(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -496,13 +544,13 @@ async def complete_ai_task(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Complete the first active task
         task = active_tasks[0]
         success, xp_gained = ai_game_engine.task_generator.complete_task(
-            session_id, user.id, task["id"]
+            session_id, user.id, task.id
         )
 
         if success:
             await query.message.reply_text(
                 f"✅ **Task Completed!**\n\n"
-                f"🎯 {task['description']}\n"
+                f"🎯 {task.description}\n"
                 f"✨ **XP Gained:** +{xp_gained}",
                 parse_mode=ParseMode.MARKDOWN,
             )
@@ -9,7 +9,7 @@ from telegram.constants import ParseMode
 from bot.tasks.clue_tasks import get_random_task
 from bot.database import SessionLocal
 from bot.database.models import Task, Player
-from bot.database.session_manager import GameSessionManager
+from bot.database.session_manager import GameLogBuffer, GameSessionManager
 from sqlalchemy import func
 from bot.ui.buttons import main_menu, voting_menu, confirm_end_game
 from telegram import Update
@@ -32,6 +32,7 @@ class ImpostorGame:
         self.core.discussion_history = []
         self.current_tasks = {}  # user_id: expected answer
         self.session_manager = GameSessionManager()
+        self.log_buffer = GameLogBuffer(self.session_manager)
         self.db_session_id = None  # Will be set when game is created in a topic
 
     def set_db_session_id(self, session_id: int):
@@ -95,12 +96,7 @@ class ImpostorGame:
 
             # Log discussion in database if we have a session ID
             if self.db_session_id:
-                try:
-                    self.session_manager.log_discussion(
-                        self.db_session_id, user.id, text, "discussion"
-                    )
-                except Exception as e:
-                    print(f"Failed to log discussion: {e}")
+                self.log_buffer.add_discussion(self.db_session_id, user.id, text)
 
     async def handle_vote(self, update, context):
         await self.voting.handle_vote(update, context)
@@ -146,21 +142,18 @@ class ImpostorGame:
 
             # Log task completion in database if we have a session ID
             if self.db_session_id:
-                try:
-                    task_type = (
-                        "crewmate_task"
-                        if user.id not in self.core.impostors
-                        else "impostor_fake_task"
-                    )
-                    self.session_manager.log_task_completion(
-                        self.db_session_id,
-                        user.id,
-                        task_type,
-                        f"Task completed by {user.first_name}",
-                        xp_gain,
-                    )
-                except Exception as e:
-                    print(f"Failed to log task completion: {e}")
+                task_type = (
+                    "crewmate_task"
+                    if user.id not in self.core.impostors
+                    else "impostor_fake_task"
+                )
+                self.log_buffer.add_task_completion(
+                    self.db_session_id,
+                    user.id,
+                    task_type,
+                    f"Task completed by {user.first_name}",
+                    xp_gain,
+                )
 
             msg = f"✅ {player.name} gained XP! New XP: {player.xp}, Title: {player.title}"
         else:
@@ -170,6 +163,7 @@ class ImpostorGame:
         await self.show_main_menu(update)
 
     async def handle_start_voting(self, update, context):
+        self.log_buffer.flush()
         self.core.phase = "voting"
         alive_players = self.core.get_alive_players()
         await update.callback_query.message.reply_text(
@@ -178,6 +172,7 @@ class ImpostorGame:
         )
 
     async def handle_start_discussion(self, update, context):
+        self.log_buffer.flush()
         self.core.phase = "discussion"
         await update.callback_query.message.reply_text(
             "🗣️ Discussion Phase started! Discuss who the impostor might be.",
@@ -242,6 +237,7 @@ class ImpostorGame:
         await self.show_main_menu(update)
 
     async def reset(self, update=None):
+        self.log_buffer.flush()
         self.core.reset()
         if update:
             await update.callback_query.message.reply_text(
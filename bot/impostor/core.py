@@ -1,6 +1,7 @@
 # Core game state, player/role management, and game start/reset will go here.
 
 import random
+from collections import Counter
 from typing import Dict, Set, Optional, Tuple, Any, List
 from bot.database.models import Player
 from bot.database import SessionLocal
@@ -83,10 +84,7 @@ class ImpostorCore:
         return False
 
     def resolve_votes(self) -> Tuple[Optional[int], str]:
-        counts: Dict[int, int] = {}
-        for target in self.votes.values():
-            if target is not None:
-                counts[target] = counts.get(target, 0) + 1
+        counts = Counter(target for target in self.votes.values() if target is not None)
         if not counts:
             return None, "No one was ejected."
         max_votes = max(counts.values())
@@ -16,7 +16,13 @@ class PhaseManager:
         self.ai_clues = ai_clues_module
         self.timeout_task = None
 
+    def _flush_logs(self):
+        """Write the game's buffered logs at a phase boundary."""
+        if hasattr(self.core, "game") and hasattr(self.core.game, "log_buffer"):
+            self.core.game.log_buffer.flush()
+
     async def start_task_phase(self, context: ContextTypes.DEFAULT_TYPE):
+        self._flush_logs()
         self.core.phase = "task"
         await context.bot.send_message(
             self.core.group_chat_id,
@@ -31,6 +37,7 @@ class PhaseManager:
         await self.start_discussion_phase(context)
 
     async def start_discussion_phase(self, context: ContextTypes.DEFAULT_TYPE):
+        self._flush_logs()
         self.core.phase = "discussion"
         self.core.discussion_history = []
         await context.bot.send_message(
@@ -47,6 +54,7 @@ class PhaseManager:
         await self.start_voting_phase(context)
 
     async def start_voting_phase(self, context: ContextTypes.DEFAULT_TYPE):
+        self._flush_logs()
         self.core.phase = "voting"
         self.core.votes.clear()
         alive_players = self.core.get_alive_players()
@@ -1,5 +1,6 @@
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
+from collections import Counter
 from typing import Dict, Optional, Tuple, Any
 
 
@@ -22,10 +23,9 @@ class VotingManager:
         return False
 
     def resolve_votes(self) -> Tuple[Optional[int], str]:
-        counts: Dict[int, int] = {}
-        for target in self.core.votes.values():
-            if target is not None:
-                counts[target] = counts.get(target, 0) + 1
+        counts = Counter(
+            target for target in self.core.votes.values() if target is not None
+        )
         if not counts:
             return None, "No one was ejected."
         max_votes = max(counts.values())
@@ -60,30 +60,25 @@ class VotingManager:
             and hasattr(self.core.game, "db_session_id")
             and self.core.game.db_session_id
         ):
-            try:
-                from bot.database.session_manager import GameSessionManager
-
-                session_manager = GameSessionManager()
-
-                if query.data == "vote_skip":
-                    session_manager.log_vote(
-                        self.core.game.db_session_id,
-                        user_id,
-                        None,
-                        round_number=1,
-                        vote_type="skip",
-                    )
-                elif query.data.startswith("vote_"):
-                    target_id = int(query.data.replace("vote_", ""))
-                    session_manager.log_vote(
-                        self.core.game.db_session_id,
-                        user_id,
-                        target_id,
-                        round_number=1,
-                        vote_type="eject",
-                    )
-            except Exception as e:
-                print(f"Failed to log vote: {e}")
+            # Buffered; written in bulk at the next phase boundary
+            log_buffer = self.core.game.log_buffer
+            if query.data == "vote_skip":
+                log_buffer.add_vote(
+                    self.core.game.db_session_id,
+                    user_id,
+                    None,
+                    round_number=1,
+                    vote_type="skip",
+                )
+            elif query.data.startswith("vote_"):
+                target_id = int(query.data.replace("vote_", ""))
+                log_buffer.add_vote(
+                    self.core.game.db_session_id,
+                    user_id,
+                    target_id,
+                    round_number=1,
+                    vote_type="eject",
+                )
 
         if query.data == "vote_skip":
             self.core.votes[user_id] = None
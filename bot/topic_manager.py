@@ -8,6 +8,7 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 from bot.impostor import ImpostorGame
+from bot.ai.voting_analyzer import ai_voting_analyzer
 from bot.database import SessionLocal
 from bot.database.models import GameSession, Player
 from bot.database.session_manager import GameSessionManager, JoinQueueManager
@@ -343,6 +344,7 @@ class TopicGameHandler:
                 self.topic_manager.session_manager.add_player_to_session(
                     db_session_id, user.id
                 )
+                ai_voting_analyzer.invalidate_active_players(db_session_id)
 
             # Update the topic message
             await self._update_topic_status(context, topic_id, game, metadata)
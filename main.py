@@ -7,6 +7,7 @@ from telegram.constants import ParseMode
 from telegram.ext import (
     ApplicationBuilder,
     ContextTypes,
+    TypeHandler,
 )
 from bot.database import init_db
 from dotenv import load_dotenv
@@ -14,12 +15,12 @@ from bot.impostor import ImpostorGame
 from bot.constants import HELP_TEXT, ABOUT_TEXT
 from bot.topic_manager import topic_handler
 from bot.engagement import engagement_engine
-from bot.ai import ai_game_engine
+from bot.ai import ai_game_engine, ai_client, ai_game_master, ai_task_generator
 from bot.handlers import register_handlers
 from bot.handlers.game_selection_handlers import start_game_selection
 from telegram.error import TimedOut, NetworkError
 from bot.database.session_manager import list_active_games, delete_game
-from bot.database import get_session
+from bot.database import ScopedSession, get_session
 import datetime
 
 # Configure logging
@@ -88,6 +89,23 @@ def signal_handler(signum, frame):
     sys.exit(0)
 
 
+async def warm_up_ai_client(context):
+    """Open the inference API connection before the first game starts."""
+    await ai_client.warm_up()
+
+
+async def shutdown_ai(application):
+    """Write queued AI logs, then close pooled inference API connections."""
+    await ai_game_master.flush()
+    await ai_task_generator.flush()
+    await ai_client.aclose()
+
+
+async def start_request_session(update: object, context: ContextTypes.DEFAULT_TYPE):
+    """Close the previous update's database session before handling the next."""
+    ScopedSession.remove()
+
+
 async def cleanup_job(context):
     topic_handler.topic_manager.cleanup_old_sessions(max_age_hours=6)
     engagement_engine.cleanup_old_data()
@@ -121,10 +139,12 @@ def main():
     topic_handler.topic_manager.recover_active_sessions()
     logger.info("✅ Active sessions recovered")
 
-    application = ApplicationBuilder().token(TOKEN).build()
+    application = ApplicationBuilder().token(TOKEN).post_shutdown(shutdown_ai).build()
     logger.info("✅ Bot application created")
 
     # We now pass the start_game_selection function directly
+    # Runs before every other handler group
+    application.add_handler(TypeHandler(object, start_request_session), group=-1)
     register_handlers(application, start_game_selection)
     logger.info("✅ Handlers configured")
 
@@ -134,6 +154,7 @@ def main():
 
     logger.info("🚀 Starting bot polling...")
     try:
+        application.job_queue.run_once(warm_up_ai_client, when=0)
         application.job_queue.run_repeating(cleanup_job, interval=3600, first=0)
         application.job_queue.run_repeating(cleanup_inactive_games, interval=600, first=0)
         application.run_polling(drop_pending_updates=True)
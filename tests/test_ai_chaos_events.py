@@ -0,0 +1,162 @@
+import asyncio
+import time
+import pytest
+from unittest.mock import AsyncMock, patch
+from bot.ai.chaos_events import AIChaosEvents, ChaosEvent
+
+
+@pytest.fixture
+def chaos() -> AIChaosEvents:
+    return AIChaosEvents()
+
+
+@pytest.fixture
+def game_context() -> dict:
+    return {"state": "Active game with 5 players", "alive_count": 5, "rounds": 2}
+
+
+@pytest.mark.asyncio
+async def test_generation_calls_the_client_with_the_game_context(chaos, game_context):
+    generate = AsyncMock(return_value={"description": "Lights flicker"})
+    with patch(
+        "bot.ai.chaos_events.ai_client.generate_chaos_event", generate
+    ), patch.object(chaos, "_get_game_context", AsyncMock(return_value=game_context)):
+        event = await chaos.generate_chaos_event(1, "system_failure")
+
+    generate.assert_awaited_once_with(
+        game_state="Active game with 5 players", player_count=5
+    )
+    assert event.description == "Lights flicker"
+
+
+@pytest.mark.asyncio
+async def test_game_context_is_cached_until_cleanup(chaos):
+    with patch.object(chaos, "_count_alive", return_value=4) as count_alive:
+        first = await chaos._get_game_context(7)
+        assert await chaos._get_game_context(7) is first
+        assert first["alive_count"] == 4
+        assert count_alive.call_count == 1
+
+        chaos.cleanup_session_events(7)
+        await chaos._get_game_context(7)
+        assert count_alive.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_check_returns_early_when_no_event_due(chaos):
+    with patch.object(chaos, "_generate_chaos_event", AsyncMock()) as generate:
+        # First poll only starts the session timer
+        assert await chaos.check_for_chaos_events(3) == []
+        assert await chaos.check_for_chaos_events(3) == []
+    generate.assert_not_awaited()
+
+
+def test_select_event_type_follows_template_updates(chaos):
+    chaos.event_templates = {
+        "system_failure": {"probability": 0.0},
+        "environmental": {"probability": 1.0},
+    }
+    assert {chaos._select_event_type() for _ in range(20)} == {"environmental"}
+
+
+def test_get_active_events_drops_only_expired(chaos):
+    short = ChaosEvent("short", "Short", "", "mystery_event", 60, {})
+    long = ChaosEvent("long", "Long", "", "environmental", 600, {})
+    for event in (short, long):
+        event.activate()
+        chaos.add_active_event(4, event)
+
+    assert chaos.get_active_events(4) == [short, long]
+    with patch("bot.ai.chaos_events.time.monotonic", return_value=short.expires_at + 1):
+        assert chaos.get_active_events(4) == [long]
+
+
+def test_history_is_bounded_but_stats_count_everything(chaos):
+    chaos.history_limit = 3
+    for i, event_type in enumerate(
+        ["mystery_event", "environmental"] * 2 + ["environmental"]
+    ):
+        event = ChaosEvent(f"e{i}", "Event", "", event_type, 10, {})
+        event.activate()
+        chaos._log_event(9, event)
+
+    assert [e["event_id"] for e in chaos.get_event_history(9)] == ["e2", "e3", "e4"]
+    stats = chaos.get_chaos_stats(9)
+    assert stats["total_events"] == 5
+    assert stats["total_duration"] == 50
+    assert stats["events_by_type"] == {"mystery_event": 2, "environmental": 3}
+    assert stats["most_common_type"] == "environmental"
+
+
+def test_chaos_event_has_no_instance_dict():
+    event = ChaosEvent("e", "Event", "", "mystery_event", 10, {})
+    assert not hasattr(event, "__dict__")
+
+
+@pytest.mark.asyncio
+async def test_descriptions_reused_for_similar_game_states(chaos, game_context):
+    chaos.descriptions_per_key = 2
+    generate = AsyncMock(
+        side_effect=[{"description": "first"}, {"description": "second"}]
+    )
+    with patch(
+        "bot.ai.chaos_events.ai_client.generate_chaos_event", generate
+    ), patch.object(chaos, "_get_game_context", AsyncMock(return_value=game_context)):
+        events = [
+            await chaos.generate_chaos_event(1, "mystery_event") for _ in range(5)
+        ]
+
+    assert generate.await_count == 2
+    assert {e.description for e in events} == {"first", "second"}
+
+
+@pytest.mark.asyncio
+async def test_batch_check_generates_only_for_due_sessions(chaos):
+    overdue = time.monotonic() - 1000
+    chaos.event_timers = {1: overdue, 3: overdue}
+
+    async def generate(session_id, event_type):
+        return ChaosEvent(f"e{session_id}", "Event", "", event_type, 30, {})
+
+    with patch.object(chaos, "_generate_chaos_event", side_effect=generate):
+        triggered = await chaos.check_chaos_events_batch([1, 2, 3])
+
+    assert [len(triggered[sid]) for sid in (1, 2, 3)] == [1, 0, 1]
+    assert chaos.get_chaos_stats(1)["total_events"] == 1
+    assert triggered[3][0].active
+
+
+@pytest.mark.asyncio
+async def test_batch_check_keeps_events_when_one_session_fails(chaos):
+    overdue = time.monotonic() - 1000
+    chaos.event_timers = {1: overdue, 2: overdue}
+
+    async def generate(session_id, event_type):
+        if session_id == 1:
+            raise RuntimeError("LLM unavailable")
+        return ChaosEvent(f"e{session_id}", "Event", "", event_type, 30, {})
+
+    with patch.object(chaos, "_generate_chaos_event", side_effect=generate):
+        triggered = await chaos.check_chaos_events_batch([1, 2])
+
+    assert triggered[1] == []
+    assert [event.event_id for event in triggered[2]] == ["e2"]
+
+
+@pytest.mark.asyncio
+async def test_trigger_event_supports_sync_and_async_callbacks(chaos):
+    calls = []
+
+    async def async_callback(session_id, event):
+        calls.append(("async", session_id))
+
+    chaos.register_event_callback("mystery_event", async_callback)
+    chaos.register_event_callback(
+        "environmental", lambda session_id, event: calls.append(("sync", session_id))
+    )
+    for i, event_type in enumerate(
+        ["mystery_event", "environmental", "system_failure"]
+    ):
+        await chaos._trigger_event(5, ChaosEvent(f"e{i}", "", "", event_type, 10, {}))
+
+    assert calls == [("async", 5), ("sync", 5)]
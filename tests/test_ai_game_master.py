@@ -0,0 +1,157 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from unittest.mock import AsyncMock, patch
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from bot.ai.game_master import AIGameMaster
+from bot.database.models import Base, GameLog
+
+
+@pytest_asyncio.fixture
+async def game_master():
+    game_master = AIGameMaster()
+    yield game_master
+    # Logged events start a background writer; don't leave it pending
+    worker = game_master._event_worker
+    if worker is not None:
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+
+
+@pytest.fixture
+def players() -> list:
+    return [{"id": 1, "name": "Alice"}, {"id": 2, "name": "Bob"}]
+
+
+@pytest.mark.asyncio
+async def test_start_game_session_falls_back_per_player(game_master, players):
+    async def persona(player_name, role):
+        if player_name == "Bob":
+            raise RuntimeError("model overloaded")
+        return {"name": player_name, "personality": "Bold"}
+
+    with patch(
+        "bot.ai.game_master.ai_client.generate_game_narrative",
+        AsyncMock(return_value="Intro"),
+    ), patch(
+        "bot.ai.game_master.ai_client.generate_player_persona", side_effect=persona
+    ):
+        session = await game_master.start_game_session("g1", players)
+
+    assert session["narrative"] == "Intro"
+    assert session["player_personas"][1]["personality"] == "Bold"
+    assert session["player_personas"][2]["name"] == "Bob"
+    assert session["player_personas"][2]["personality"] == "Mysterious and cautious"
+
+
+@pytest.mark.asyncio
+async def test_assign_roles_generates_all_narratives_together(game_master, players):
+    game_master.current_games["g1"] = {
+        "player_personas": {1: {"name": "Alice"}, 2: {"name": "Bob"}}
+    }
+
+    async def respond(prompt, model_type, max_tokens):
+        if "Bob" in prompt:
+            raise RuntimeError("timeout")
+        return "Overall" if max_tokens == 120 else f"reveal:{prompt.split()[6]}"
+
+    with patch(
+        "bot.ai.game_master.ai_client.generate_response", side_effect=respond
+    ) as generate:
+        text = await game_master.assign_roles_with_narrative(
+            "g1", {1: "impostor", 2: "crewmate"}
+        )
+
+    assert generate.call_count == 3
+    assert text == "🎭 **Role Assignment**\n\nOverall"
+    personas = game_master.current_games["g1"]["player_personas"]
+    assert personas[1]["role_revelation"] == "reveal:Alice"
+    assert personas[2]["role"] == "crewmate"
+    assert "Bob" in personas[2]["role_revelation"]
+
+
+def test_log_game_event_skips_unknown_games(game_master):
+    game_master.current_games["g1"] = {"events": []}
+    with patch("bot.ai.game_master.datetime") as clock:
+        game_master._log_game_event("missing", "game_ended", {})
+    clock.now.assert_not_called()
+
+    game_master._log_game_event("g1", "game_ended", {"winner": "crew"})
+    assert game_master.current_games["g1"]["events"][0]["data"] == {"winner": "crew"}
+
+
+@pytest.mark.asyncio
+async def test_game_events_are_written_in_batches(game_master):
+    game_master.current_games["7"] = {"events": []}
+    game_master.event_batch_size = 3
+    game_master.event_flush_interval = 0.05
+
+    with patch.object(game_master, "_write_events") as write:
+        for round_number in range(4):
+            game_master._log_game_event("7", "round", {"round": round_number})
+        write.assert_not_called()
+        await game_master._event_worker
+
+    assert [len(call.args[0]) for call in write.call_args_list] == [3, 1]
+    assert len(game_master.current_games["7"]["events"]) == 4
+
+
+@pytest.mark.asyncio
+async def test_flush_writes_pending_game_events(game_master):
+    game_master.current_games["7"] = {"events": []}
+    game_master.event_flush_interval = 0.05
+
+    with patch.object(game_master, "_write_events") as write:
+        game_master._log_game_event("7", "round", {"round": 1})
+        await game_master.flush()
+        assert write.call_count == 1
+
+        # Logged from a thread without an event loop, so no worker is started
+        await asyncio.to_thread(game_master._log_game_event, "7", "round", {})
+        await game_master.flush()
+
+    assert [len(call.args[0]) for call in write.call_args_list] == [1, 1]
+    assert game_master._event_queue.empty()
+
+
+def test_numeric_game_ids_are_not_written_as_session_ids(game_master):
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    game_master.current_games["42"] = {"events": []}
+    game_master._log_game_event("42", "game_ended", {"winner": "crew"})
+    events = game_master.current_games["42"]["events"]
+
+    with patch("bot.ai.game_master.SessionLocal", session_factory):
+        game_master._write_events(events)
+
+    with session_factory() as db:
+        log = db.scalars(select(GameLog)).one()
+    assert log.session_id is None
+    assert log.event_data == {"game_id": "42", "data": {"winner": "crew"}}
+    engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_routine_rounds_use_local_templates(game_master):
+    game_master.current_games["g1"] = {"events": [], "station_name": "Void Station"}
+    crew = ["Alice", "Bob", "Cara", "Dan"]
+
+    with patch(
+        "bot.ai.game_master.ai_client.generate_response",
+        AsyncMock(return_value="LLM narrative"),
+    ) as generate:
+        routine = await game_master.generate_round_narrative("g1", 3, crew, ["Eve"])
+        opening = await game_master.generate_round_narrative("g1", 1, crew, [])
+        endgame = await game_master.generate_round_narrative("g1", 4, crew[:2], [])
+
+    assert generate.await_count == 2
+    assert routine.startswith("🔄 **Round 3**") and "LLM" not in routine
+    assert opening.endswith("LLM narrative")
+    assert endgame.endswith("LLM narrative")
@@ -0,0 +1,61 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from telegram.constants import ParseMode
+from telegram.error import BadRequest, TimedOut
+from bot.handlers.ai_handlers import _reply_streamed
+
+
+async def _chunks(*parts):
+    for part in parts:
+        yield part
+
+
+@pytest.fixture
+def message():
+    sent = MagicMock()
+    sent.edit_text = AsyncMock()
+    message = MagicMock()
+    message.reply_text = AsyncMock(return_value=sent)
+    return message
+
+
+@pytest.mark.asyncio
+async def test_final_edit_retries_without_markdown(message):
+    sent = message.reply_text.return_value
+    sent.edit_text.side_effect = [BadRequest("Can't parse entities"), sent]
+
+    assert await _reply_streamed(message, _chunks("Lore_of *the void")) is sent
+
+    retry = sent.edit_text.await_args_list[-1]
+    assert retry.args == ("Lore_of *the void",)
+    assert "parse_mode" not in retry.kwargs
+
+
+@pytest.mark.asyncio
+async def test_final_edit_ignores_unmodified_message(message):
+    sent = message.reply_text.return_value
+    sent.edit_text.side_effect = BadRequest("Message is not modified")
+
+    assert await _reply_streamed(message, _chunks("Calm seas")) is sent
+
+    sent.edit_text.assert_awaited_once()
+    assert sent.edit_text.await_args.kwargs["parse_mode"] == ParseMode.MARKDOWN
+
+
+@pytest.mark.asyncio
+async def test_stream_is_closed_when_a_reply_fails(message):
+    closed = []
+
+    async def chunks():
+        try:
+            yield "Lore"
+            yield " continues"
+        finally:
+            closed.append(True)
+
+    message.reply_text.side_effect = TimedOut()
+
+    with pytest.raises(TimedOut):
+        await _reply_streamed(message, chunks())
+
+    assert closed == [True]
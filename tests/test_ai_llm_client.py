@@ -0,0 +1,517 @@
+import asyncio
+import json
+import time
+from collections import deque
+import pytest
+from unittest.mock import AsyncMock, patch
+import httpx
+from bot.ai.llm_client import (
+    AsyncHFClient,
+    DiskResponseCache,
+    GameLLMClient,
+    ModelType,
+    ResponseCache,
+)
+
+
+class FakeHFClient:
+    """Stand-in for AsyncHFClient that records the requests it receives."""
+
+    def __init__(
+        self, delay: float = 0.0, reply: str = "The reactor hums.", error=None
+    ):
+        self.delay = delay
+        self.reply = reply
+        self.error = error
+        self.calls = []
+        self.models = []
+
+    async def text_generation(self, prompt, model=None, **kwargs):
+        self.calls.append(prompt)
+        self.models.append(model)
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.reply
+
+    async def aclose(self):
+        pass
+
+    async def text_generation_stream(self, prompt, model=None, **kwargs):
+        await self.text_generation(prompt, model=model, **kwargs)
+        first, *rest = self.reply.split(" ")
+        for token in [first] + [" " + word for word in rest]:
+            yield token
+
+
+@pytest.fixture
+def make_client():
+    def make(**fake_kwargs):
+        client = GameLLMClient()
+        fake = FakeHFClient(**fake_kwargs)
+        client.enabled = True
+        client.client = fake
+        return client, fake
+
+    return make
+
+
+@pytest.mark.asyncio
+async def test_generations_overlap(make_client):
+    client, fake = make_client(delay=0.2)
+
+    start = time.monotonic()
+    responses = await asyncio.gather(
+        *(client.generate_response(f"prompt {i}") for i in range(3))
+    )
+
+    assert responses == ["The reactor hums."] * 3
+    assert len(fake.calls) == 3
+    assert time.monotonic() - start < 0.5
+
+
+@pytest.mark.asyncio
+async def test_identical_cache_keys_share_one_request(make_client):
+    client, fake = make_client(delay=0.1)
+
+    responses = await asyncio.gather(
+        *(client.generate_response("Round 2", cache_key="round-2") for _ in range(4))
+    )
+
+    assert responses == ["The reactor hums."] * 4
+    assert len(fake.calls) == 1
+    assert client._inflight == {}
+
+
+@pytest.mark.asyncio
+async def test_waiters_fall_back_when_shared_request_fails(make_client):
+    client, fake = make_client(delay=0.1, error=ConnectionError("HF down"))
+
+    responses = await asyncio.gather(
+        *(client.generate_response("Round 3", cache_key="round-3") for _ in range(2))
+    )
+
+    assert len(fake.calls) == 1
+    assert all(r and r != "The reactor hums." for r in responses)
+    assert "round-3" not in client.response_cache
+
+
+def test_response_cache_evicts_lru_and_expires():
+    cache = ResponseCache(maxsize=2, ttl=60)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"  # "b" becomes least recently used
+    cache.set("c", "3")
+    assert "b" not in cache
+    assert len(cache) == 2
+
+    with patch("bot.ai.llm_client.time.monotonic", return_value=time.monotonic() + 61):
+        assert cache.get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_repeated_prompts_are_cached_unless_disabled(make_client):
+    client, fake = make_client()
+
+    await client.generate_response("Round 2 begins", max_tokens=100)
+    await client.generate_response("Round 2 begins", max_tokens=100)
+    assert len(fake.calls) == 1
+
+    await client.generate_response("Round 2 begins", max_tokens=120)
+    await client.generate_response("Round 2 begins", disable_cache=True)
+    assert len(fake.calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_player_reports_share_one_request(make_client):
+    reply = (
+        '[{"index": 2, "title": "The Hunter", "report": "Sharp.", "tip": "Relax."},'
+        ' {"index": 1, "title": "The Ghost", "report": "Quiet.", "tip": "Speak."}]'
+    )
+    client, fake = make_client(reply=reply)
+    requests = [
+        {"player_name": name, "game_stats": {}, "role": "crewmate", "won": True}
+        for name in ("Alice", "Bob")
+    ]
+
+    reports = await client.generate_player_reports_batch(requests)
+
+    assert len(fake.calls) == 1
+    assert reports[0].startswith("**The Ghost**")
+    assert reports[1].startswith("**The Hunter**")
+
+
+@pytest.mark.asyncio
+async def test_player_reports_keep_players_with_the_same_name_apart(make_client):
+    reply = (
+        '[{"index": 1, "title": "The Ghost", "report": "Quiet.", "tip": "Speak."},'
+        ' {"index": 2, "title": "The Hunter", "report": "Sharp.", "tip": "Relax."}]'
+    )
+    client, fake = make_client(reply=reply)
+    requests = [
+        {"player_name": "Alex", "game_stats": {}, "role": role, "won": True}
+        for role in ("crewmate", "impostor")
+    ]
+
+    reports = await client.generate_player_reports_batch(requests)
+
+    assert len(fake.calls) == 1
+    assert "1. Alex: Role: crewmate" in fake.calls[0]
+    assert "2. Alex: Role: impostor" in fake.calls[0]
+    assert reports[0].startswith("**The Ghost**")
+    assert reports[1].startswith("**The Hunter**")
+
+
+@pytest.mark.asyncio
+async def test_player_reports_are_split_to_fit_the_token_limit(make_client):
+    client, fake = make_client(reply="Not JSON at all")
+    client.max_new_tokens = 400
+    requests = [
+        {"player_name": f"P{i}", "game_stats": {}, "role": "crewmate", "won": True}
+        for i in range(5)
+    ]
+
+    with patch.object(client, "generate_player_report", AsyncMock(return_value="solo")):
+        reports = await client.generate_player_reports_batch(requests)
+
+    assert reports == ["solo"] * 5
+    batched = [call for call in fake.calls if "each of these players" in call]
+    assert [call.count(": Role:") for call in batched] == [2, 2, 1]
+
+
+@pytest.mark.asyncio
+async def test_player_reports_fall_back_to_individual_requests(make_client):
+    client, fake = make_client(reply="Not JSON at all")
+    requests = [
+        {"player_name": name, "game_stats": {}, "role": "impostor", "won": False}
+        for name in ("Alice", "Bob")
+    ]
+
+    reports = await client.generate_player_reports_batch(requests)
+
+    assert reports == ["Not JSON at all"] * 2
+    assert len(fake.calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_persona_json_recovered_from_surrounding_chatter(make_client):
+    reply = (
+        'Here is your persona:\n{"name": "Vex", "personality": "Sly", '
+        '"background": "Smuggler", "secret_goal": "Escape"}\nEnjoy!'
+    )
+    client, _ = make_client(reply=reply)
+
+    persona = await client.generate_player_persona("Vex", "impostor")
+
+    assert persona["personality"] == "Sly"
+
+
+@pytest.mark.asyncio
+async def test_chaos_event_missing_keys_falls_back(make_client):
+    client, _ = make_client(reply='{"event_name": "Solar Flare"}')
+
+    event = await client.generate_chaos_event("Active game", 5)
+
+    assert event["event_name"] == "System Malfunction"
+
+
+@pytest.mark.asyncio
+async def test_stream_yields_tokens_as_they_arrive(make_client):
+    client, fake = make_client()
+
+    chunks = [c async for c in client.generate_response_stream("Lore please")]
+
+    assert chunks == ["The", " reactor", " hums."]
+    assert len(fake.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_falls_back_when_generation_fails(make_client):
+    client, _ = make_client(error=ConnectionError("HF down"))
+
+    chunks = [c async for c in client.generate_response_stream("Lore please")]
+
+    assert len(chunks) == 1
+    assert chunks[0] != "The reactor hums."
+
+
+@pytest.mark.asyncio
+async def test_stream_releases_its_slot_while_the_consumer_is_busy(make_client):
+    client, _ = make_client()
+    client._sem = asyncio.Semaphore(1)
+    stream = client.generate_response_stream("Lore please")
+
+    assert await anext(stream) == "The"
+    for _ in range(5):
+        await asyncio.sleep(0)
+    # Generation has finished; the consumer still holds unread tokens
+    assert not client._sem.locked()
+    assert [c async for c in stream] == [" reactor", " hums."]
+
+
+@pytest.mark.asyncio
+async def test_cancelling_a_stream_consumer_stops_generation(make_client):
+    client, _ = make_client(delay=10)
+    client._sem = asyncio.Semaphore(1)
+    stream = client.generate_response_stream("Lore please")
+
+    pending = asyncio.ensure_future(anext(stream))
+    for _ in range(5):
+        await asyncio.sleep(0)
+    assert client._sem.locked()
+    pending.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await pending
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+    assert not client._sem.locked()
+
+
+@pytest.mark.asyncio
+async def test_one_client_serves_every_model_type(make_client):
+    client, fake = make_client()
+
+    await client.generate_response("Vote!", model_type="reasoning")
+    await client.generate_response("Task!", model_type="creative")
+    await client.generate_response("Hm?", model_type="unknown")
+
+    assert fake.models == [
+        client.models["reasoning"],
+        client.models["creative"],
+        client.models["narrative"],
+    ]
+
+
+def test_world_lore_prompt_uses_latest_games_from_deque():
+    client = GameLLMClient()
+    history = deque(({"game": i} for i in range(10)), maxlen=8)
+
+    prompt = client._world_lore_prompt(history, season=2)
+
+    assert "Games played: 8" in prompt
+    assert f"Recent events: {[{'game': i} for i in range(5, 10)]}" in prompt
+
+
+@pytest.mark.asyncio
+async def test_hf_client_posts_and_parses_generated_text():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json=[{"generated_text": "Sirens wail."}])
+
+    client = AsyncHFClient("token", transport=httpx.MockTransport(handler))
+    text = await client.text_generation("Go", model="org/model", max_new_tokens=5)
+    await client.aclose()
+
+    assert text == "Sirens wail."
+    assert requests[0].url.path == "/models/org/model"
+    assert requests[0].headers["Authorization"] == "Bearer token"
+
+
+@pytest.mark.asyncio
+async def test_hf_client_streams_tokens_and_skips_special_ones():
+    events = [
+        {"token": {"text": "Dark", "special": False}},
+        {"token": {"text": " halls", "special": False}},
+        {"token": {"text": "</s>", "special": True}},
+    ]
+    body = "".join(f"data:{json.dumps(event)}\n\n" for event in events)
+    client = AsyncHFClient(
+        "token", transport=httpx.MockTransport(lambda r: httpx.Response(200, text=body))
+    )
+
+    tokens = [t async for t in client.text_generation_stream("Go", model="m")]
+    await client.aclose()
+
+    assert tokens == ["Dark", " halls"]
+
+
+@pytest.mark.asyncio
+async def test_hf_client_reuses_one_pool_until_closed():
+    client = AsyncHFClient(
+        "token", transport=httpx.MockTransport(lambda r: httpx.Response(200))
+    )
+    pool = client.http
+    assert client.http is pool
+
+    await client.aclose()
+    assert pool.is_closed
+    assert client.http is not pool
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_identical_prompts_without_cache_key_share_one_request(make_client):
+    client, fake = make_client(delay=0.1)
+
+    responses = await asyncio.gather(
+        *(
+            client.generate_response("The lobby gathers", max_tokens=150)
+            for _ in range(5)
+        )
+    )
+
+    assert responses == ["The reactor hums."] * 5
+    assert len(fake.calls) == 1
+    assert client._inflight == {}
+
+
+def test_cache_key_ignores_whitespace_layout():
+    client = GameLLMClient()
+    key = client._make_cache_key("Round 2\n    begins", "narrative", 100, 0.7)
+
+    assert key == client._make_cache_key("Round 2 begins ", "narrative", 100, 0.7)
+    assert key != client._make_cache_key("Round 3 begins", "narrative", 100, 0.7)
+
+
+def test_disk_cache_persists_across_instances(tmp_path):
+    path = str(tmp_path / "llm.sqlite3")
+    cache = DiskResponseCache(path, ttl=60)
+    cache.set("intro", "Welcome aboard.")
+    cache.close()
+
+    reopened = DiskResponseCache(path, ttl=60)
+    assert reopened.get("intro") == "Welcome aboard."
+    with patch("bot.ai.llm_client.time.time", return_value=time.time() + 61):
+        assert reopened.get("intro") is None
+    reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_disk_cache_serves_responses_after_restart(make_client, tmp_path):
+    path = str(tmp_path / "llm.sqlite3")
+    client, fake = make_client()
+    client.disk_cache = DiskResponseCache(path)
+    await client.generate_response("Station intro", max_tokens=80)
+    await client.aclose()
+
+    restarted, restarted_fake = make_client(reply="Something new")
+    restarted.disk_cache = DiskResponseCache(path)
+    response = await restarted.generate_response("Station intro", max_tokens=80)
+    await restarted.aclose()
+
+    assert response == "The reactor hums."
+    assert len(fake.calls) == 1
+    assert restarted_fake.calls == []
+
+
+@pytest.mark.asyncio
+async def test_warm_up_pings_each_model_and_ignores_slow_ones(make_client):
+    client, fake = make_client(delay=0.2)
+
+    start = time.monotonic()
+    await client.warm_up(timeout=0.05)
+
+    assert time.monotonic() - start < 0.15
+    assert sorted(fake.models) == sorted(client.models.values())
+
+
+@pytest.mark.asyncio
+async def test_transient_errors_are_retried(make_client):
+    client, fake = make_client()
+    client.retry_backoff = 0
+    fake.text_generation = AsyncMock(
+        side_effect=[httpx.ReadError("connection reset"), "Recovered."]
+    )
+
+    response = await client.generate_response("Retry me", disable_cache=True)
+
+    assert response == "Recovered."
+    assert fake.text_generation.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_client_errors_are_not_retried(make_client):
+    client, fake = make_client()
+    client.retry_backoff = 0
+    request = httpx.Request("POST", "https://example.test")
+    fake.text_generation = AsyncMock(
+        side_effect=httpx.HTTPStatusError(
+            "bad request", request=request, response=httpx.Response(400)
+        )
+    )
+
+    response = await client.generate_response("No retry", disable_cache=True)
+
+    assert fake.text_generation.await_count == 1
+    assert response != "Recovered."
+
+
+@pytest.mark.asyncio
+async def test_chaos_event_json_recovered_before_braced_chatter(make_client):
+    reply = (
+        'Sure! {"event_name": "Solar Flare", "description": "Sensors fail", '
+        '"effect": "No scans"} Hope this helps {wink}'
+    )
+    client, _ = make_client(reply=reply)
+
+    event = await client.generate_chaos_event("Active game", 5)
+
+    assert event["event_name"] == "Solar Flare"
+
+
+def test_clean_response_strips_instruction_markers():
+    client = GameLLMClient()
+
+    cleaned = client._clean_response("  <s>[INST] Lights out.[/INST]</s> ")
+
+    assert cleaned == " Lights out."
+
+
+@pytest.mark.asyncio
+async def test_player_report_stream_matches_report_prompt(make_client):
+    client, fake = make_client()
+    args = ("Vex", {"votes": 2}, "impostor", True)
+
+    chunks = [c async for c in client.generate_player_report_stream(*args)]
+    await client.generate_player_report(*args)
+
+    assert "".join(chunks) == "The reactor hums."
+    assert fake.calls[0] == fake.calls[1]
+
+
+@pytest.mark.asyncio
+async def test_enum_and_string_model_types_share_one_route(make_client):
+    client, fake = make_client()
+
+    await client.generate_response("Vote!", model_type=ModelType.REASONING)
+    await client.generate_response("Vote!", model_type="reasoning")
+
+    assert len(fake.calls) == 1
+    assert fake.models == [client.models["reasoning"]]
+    assert fake.calls[0].startswith("<s>[INST] You are an AI detective")
+
+
+@pytest.mark.asyncio
+async def test_unknown_model_type_uses_the_narrative_template(make_client):
+    client, fake = make_client()
+
+    await client.generate_response("Vote!", model_type="unknown")
+
+    assert fake.models == [client.models["narrative"]]
+    assert fake.calls[0].startswith("<s>[INST] You are a creative game master")
+
+
+def test_fallback_responses_come_from_the_model_type_pool():
+    client = GameLLMClient()
+
+    with patch("bot.ai.llm_client._RNG.choice", side_effect=lambda pool: pool[-1]):
+        assert client._get_fallback_response("?", "creative") == (
+            "An opportunity for heroism presents itself."
+        )
+        assert client._get_fallback_response("?", "unknown") == "Computing..."
+
+
+@pytest.mark.asyncio
+async def test_short_vote_analysis_uses_the_small_model(make_client):
+    client, fake = make_client(reply="<|im_start|>Bob voted fast.<|im_end|>")
+
+    analysis = await client.analyze_voting_behavior({"Alice": "Bob"}, "Bob", 2)
+    client.small_model_max_prompt = 0
+    await client.analyze_voting_behavior({"Alice": "Bob"}, "Bob", 2)
+
+    assert analysis == "Bob voted fast."
+    assert fake.models == [client.models["fast"], client.models["reasoning"]]
+    assert fake.calls[0].startswith("<|im_start|>system")
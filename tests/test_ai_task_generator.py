@@ -0,0 +1,197 @@
+import asyncio
+import time
+import pytest
+from unittest.mock import AsyncMock, patch
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from bot.ai.task_generator import AITaskGenerator
+from bot.database.models import Base, Player
+
+
+@pytest.fixture
+def generator() -> AITaskGenerator:
+    return AITaskGenerator()
+
+
+@pytest.mark.parametrize(
+    "completion_rate, expected",
+    [(0, "easy"), (59.9, "easy"), (60, "medium"), (79, "medium"), (80, "hard")],
+)
+def test_difficulty_follows_completion_rate(generator, completion_rate, expected):
+    generator.player_task_progress[1] = {2: {"completion_rate": completion_rate}}
+    assert generator._determine_difficulty(1, 2) == expected
+    assert generator._determine_difficulty(1, 3) == "easy"
+
+
+def test_xp_reward_scales_for_impostors(generator):
+    assert generator._calculate_xp_reward("hard", "crewmate") == 50
+    assert generator._calculate_xp_reward("medium", "impostor") == 37
+    assert generator._calculate_xp_reward("unknown", "crewmate") == 10
+
+
+@pytest.mark.asyncio
+async def test_batch_tasks_generate_concurrently(generator):
+    async def generate(session_id, player_id, role, player_name=None):
+        await asyncio.sleep(0.1)
+        return {"player_id": player_id, "role": role}
+
+    with patch.object(generator, "generate_task", side_effect=generate):
+        start = time.monotonic()
+        tasks = await generator.generate_batch_tasks(1, [10, 11, 12], {11: "impostor"})
+
+    assert time.monotonic() - start < 0.25
+    assert list(tasks) == [10, 11, 12]
+    assert tasks[11]["role"] == "impostor"
+    assert tasks[12]["role"] == "crewmate"
+
+
+@pytest.fixture
+def generated_task(generator):
+    async def generate(session_id, player_id):
+        with patch("bot.ai.task_generator.SessionLocal"), patch(
+            "bot.ai.task_generator.ai_client.generate_dynamic_task",
+            AsyncMock(return_value="Fix the reactor"),
+        ):
+            return await generator.generate_task(
+                session_id, player_id, "crewmate", "easy"
+            )
+
+    return generate
+
+
+@pytest.mark.asyncio
+async def test_complete_task_uses_index_and_checks_owner(generator, generated_task):
+    first = await generated_task(1, 10)
+    second = await generated_task(1, 10)
+    assert first.id != second.id
+
+    with patch.object(generator, "_log_task_completion"):
+        assert generator.complete_task(1, 11, first.id) == (False, 0)
+        assert generator.complete_task(1, 10, first.id) == (True, 10)
+        assert generator.complete_task(1, 10, first.id) == (False, 0)
+
+    generator.cleanup_session_tasks(1)
+    assert generator.task_index == {}
+
+
+@pytest.mark.asyncio
+async def test_tasks_are_slotted_and_grouped_by_player(generator, generated_task):
+    task = await generated_task(1, 10)
+    await generated_task(1, 11)
+
+    assert not hasattr(task, "__dict__")
+    assert generator.get_player_tasks(1, 10) == [task]
+    assert generator.get_active_tasks(1, 12) == []
+
+
+@pytest.mark.asyncio
+async def test_completion_rate_tracks_assignments_and_completions(
+    generator, generated_task
+):
+    tasks = [await generated_task(1, 10) for _ in range(4)]
+    with patch.object(generator, "_log_task_completion"):
+        for task in tasks[:3]:
+            generator.complete_task(1, 10, task.id)
+    assert generator.get_task_progress(1, 10)["completion_rate"] == 75.0
+
+    await generated_task(1, 10)
+    assert generator.get_task_progress(1, 10)["completion_rate"] == 60.0
+    assert generator._determine_difficulty(1, 10) == "medium"
+
+
+@pytest.mark.asyncio
+async def test_task_completions_are_logged_in_batches(generator, generated_task):
+    generator.log_batch_size = 2
+    generator.log_flush_interval = 0.05
+    tasks = [await generated_task(1, 10) for _ in range(3)]
+
+    with patch("bot.ai.task_generator.SessionLocal") as session_factory:
+        for task in tasks:
+            generator.complete_task(1, 10, task.id)
+        await generator._log_worker
+
+    db = session_factory.return_value
+    saved = [call.args[0] for call in db.bulk_save_objects.call_args_list]
+    assert [len(batch) for batch in saved] == [2, 1]
+    assert saved[0][0].event_type == "ai_task_completed"
+    assert saved[0][0].details["task_id"] == tasks[0].id
+    assert db.commit.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_flush_writes_pending_completions(generator, generated_task):
+    generator.log_flush_interval = 0.05
+    first, second = [await generated_task(1, 10) for _ in range(2)]
+
+    with patch("bot.ai.task_generator.SessionLocal") as session_factory:
+        db = session_factory.return_value
+        generator.complete_task(1, 10, first.id)
+        await generator.flush()
+        assert db.bulk_save_objects.call_count == 1
+
+        # Logged from a thread without an event loop, so no worker is started
+        await asyncio.to_thread(generator.complete_task, 1, 10, second.id)
+        assert generator._log_worker.done()
+        await generator.flush()
+
+    saved = [call.args[0][0] for call in db.bulk_save_objects.call_args_list]
+    assert [entry.details["task_id"] for entry in saved] == [first.id, second.id]
+    assert generator._log_queue.empty()
+
+
+@pytest.mark.asyncio
+async def test_known_player_name_skips_database_lookup(generator):
+    dynamic_task = AsyncMock(return_value="Scan the hull")
+    with patch("bot.ai.task_generator.SessionLocal") as session_factory, patch(
+        "bot.ai.task_generator.ai_client.generate_dynamic_task", dynamic_task
+    ):
+        await generator.generate_batch_tasks(
+            1, [10, 11], {10: "impostor"}, names={10: "Vex", 11: "Nova"}
+        )
+
+    session_factory.assert_not_called()
+    assert {call.args[1] for call in dynamic_task.await_args_list} == {"Vex", "Nova"}
+
+
+@pytest.mark.asyncio
+async def test_player_name_lookup_runs_off_the_event_loop(generator):
+    with patch.object(
+        generator, "_load_player_name", return_value="Nova"
+    ) as load, patch(
+        "bot.ai.task_generator.asyncio.to_thread", wraps=asyncio.to_thread
+    ) as to_thread, patch(
+        "bot.ai.task_generator.ai_client.generate_dynamic_task",
+        AsyncMock(return_value="Scan the hull"),
+    ) as dynamic_task:
+        await generator.generate_task(1, 10, "crewmate", "easy")
+
+    to_thread.assert_called_once_with(load, 10)
+    assert dynamic_task.await_args.args[1] == "Nova"
+
+
+@pytest.mark.asyncio
+async def test_player_name_is_read_from_username(generator):
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    with session_factory() as db:
+        db.add(Player(id=10, user_id=100, username="Nova"))
+        db.commit()
+
+    dynamic_task = AsyncMock(return_value="Scan the hull")
+    with patch("bot.ai.task_generator.SessionLocal", session_factory), patch(
+        "bot.ai.task_generator.ai_client.generate_dynamic_task", dynamic_task
+    ):
+        await generator.generate_task(1, 10, "crewmate", "easy")
+        await generator.generate_task(1, 11, "crewmate", "easy")
+
+    assert [call.args[1] for call in dynamic_task.await_args_list] == [
+        "Nova",
+        "Crew Member",
+    ]
+    engine.dispose()
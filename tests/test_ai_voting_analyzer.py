@@ -0,0 +1,368 @@
+import asyncio
+import threading
+import time
+import pytest
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+from bot.ai.llm_client import GameLLMClient
+from bot.ai.voting_analyzer import AIVotingAnalyzer
+from bot.database.models import Base, Player, PlayerGameLink, VoteHistory
+
+
+@pytest.fixture
+def analyzer() -> AIVotingAnalyzer:
+    return AIVotingAnalyzer()
+
+
+@pytest.fixture
+def patterns() -> dict:
+    return {
+        "quick_voting": True,
+        "group_voting": True,
+        "suspicious_targets": [2],
+        "vote_manipulation": False,
+        "unusual_behavior": [],
+    }
+
+
+def test_active_players_are_loaded_once_per_session(analyzer, patterns):
+    with patch.object(analyzer, "_load_active_player_ids", return_value=[1, 2]) as load:
+        analyzer._update_suspicion_scores(7, patterns)
+        analyzer._update_suspicion_scores(7, patterns)
+        assert load.call_count == 1
+
+        analyzer.invalidate_active_players(7)
+        analyzer._update_suspicion_scores(7, patterns)
+        assert load.call_count == 2
+
+    assert analyzer.suspicion_scores[7] == {1: 15, 2: 45}
+
+
+@pytest.mark.asyncio
+async def test_leaderboard_loads_top_names_in_one_query(analyzer):
+    analyzer.suspicion_scores[7] = {pid: pid * 10 for pid in range(1, 8)}
+    names = {7: "Gus", 6: "Fay", 5: "Eli", 3: "Cy"}
+
+    with patch.object(
+        analyzer, "_load_player_names", return_value=names
+    ) as load, patch(
+        "bot.ai.voting_analyzer.ai_client.generate_response",
+        AsyncMock(return_value="Eyes on Gus."),
+    ):
+        display = await analyzer.generate_suspicion_leaderboard(7)
+
+    load.assert_called_once_with([7, 6, 5, 4, 3])
+    assert display == (
+        "🕵️ **Suspicion Leaderboard**\n\n"
+        "🥇 **Gus** - 70/100\n"
+        "🥈 **Fay** - 60/100\n"
+        "🥉 **Eli** - 50/100\n"
+        "4. **Cy** - 30/100\n\n"
+        "🤔 **AI Detective Commentary**\nEyes on Gus."
+    )
+
+
+@pytest.fixture
+def db_engine():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    with patch("bot.ai.voting_analyzer.engine", engine):
+        yield engine
+    engine.dispose()
+
+
+def test_voting_data_is_counted_in_sql(analyzer, db_engine):
+    votes = [(2, False, False), (2, True, False), (2, False, True), (5, True, False)]
+    with Session(db_engine) as db:
+        db.add_all(
+            VoteHistory(
+                session_id=7,
+                round_number=2,
+                target_id=target,
+                anonymous_vote=anonymous,
+                double_vote=double,
+            )
+            for target, anonymous, double in votes
+        )
+        db.add(VoteHistory(session_id=7, round_number=1, target_id=5))
+        db.commit()
+
+    voting_data = analyzer._collect_voting_data(7, 2)
+
+    assert voting_data["total_votes"] == 4
+    assert voting_data["vote_targets"] == {2: 3, 5: 1}
+    assert voting_data["anonymous_votes"] == 2
+    assert voting_data["double_votes"] == 1
+    assert analyzer._collect_voting_data(7, 3)["anonymous_votes"] == 0
+
+
+def test_active_player_ids_skip_players_who_left(analyzer, db_engine):
+    with Session(db_engine) as db:
+        db.add_all(
+            [
+                PlayerGameLink(session_id=7, player_id=1),
+                PlayerGameLink(session_id=7, player_id=2, left_at=datetime.now()),
+                PlayerGameLink(session_id=8, player_id=3),
+            ]
+        )
+        db.commit()
+
+    assert analyzer._load_active_player_ids(7) == [1]
+
+
+def test_player_names_are_loaded_from_usernames(analyzer, db_engine):
+    with Session(db_engine) as db:
+        db.add_all(
+            [
+                Player(id=1, user_id=10, username="Al"),
+                Player(id=2, user_id=20, username="Bob"),
+                Player(id=3, user_id=30, username="Cy"),
+            ]
+        )
+        db.commit()
+
+    assert analyzer._load_player_names([1, 2, 9]) == {1: "Al", 2: "Bob"}
+
+
+@pytest.mark.asyncio
+async def test_round_analysis_makes_one_llm_call(analyzer):
+    voting_data = {
+        "total_votes": 3,
+        "vote_targets": {2: 3},
+        "vote_times": [],
+        "anonymous_votes": 0,
+        "double_votes": 0,
+    }
+    bundle = (
+        '{"insights": "Bob drew every vote.", '
+        '"leaderboard_commentary": "Bob sweats.", '
+        '"player_analyses": {"Bob": "Bob hides.", "Al": "Al waits."}}'
+    )
+    collect_threads = []
+
+    def collect(session_id, round_number):
+        collect_threads.append(threading.current_thread())
+        return voting_data
+
+    with patch.object(
+        analyzer, "_collect_voting_data", side_effect=collect
+    ), patch.object(
+        analyzer, "_load_active_player_ids", return_value=[1, 2]
+    ), patch.object(
+        analyzer, "_load_player_names", return_value={1: "Al", 2: "Bob"}
+    ), patch(
+        "bot.ai.voting_analyzer.ai_client.generate_response",
+        AsyncMock(return_value=bundle),
+    ) as generate:
+        insights = await analyzer.analyze_voting_round(7, {"Alice": "Bob"}, 2)
+        analyzer.track_player_behavior(7, 1, "accusation", {})
+        leaderboard = await analyzer.generate_suspicion_leaderboard(7)
+        report = await analyzer.generate_player_behavior_report(7, 1)
+
+    generate.assert_awaited_once()
+    prompt = generate.await_args.args[0]
+    assert "Alice: Bob" in prompt and "- Bob: Suspicion Score 15/100" in prompt
+    assert collect_threads[0] is not threading.main_thread()
+    assert insights == "Bob drew every vote."
+    assert leaderboard.endswith("Commentary**\nBob sweats.")
+    assert report.endswith("\n\nAl waits.")
+    assert analyzer.suspicion_scores[7] == {1: 5, 2: 15}
+    record = analyzer.get_analysis_history(7)[0]
+    assert (record.round, record.insights) == (2, insights)
+    assert not hasattr(record, "__dict__")
+    analyzer._eviction_task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_unparseable_round_bundle_falls_back_to_insights_prompt(analyzer):
+    analyzer._active_players_cache[7] = [1]
+    with patch.object(analyzer, "_load_player_names", return_value={1: "Al"}), patch(
+        "bot.ai.voting_analyzer.ai_client.generate_response",
+        AsyncMock(side_effect=["Not JSON at all", "Quiet round."]),
+    ) as generate, patch.object(
+        analyzer,
+        "_collect_voting_data",
+        return_value={
+            "total_votes": 0,
+            "vote_targets": {},
+            "anonymous_votes": 0,
+            "double_votes": 0,
+        },
+    ):
+        insights = await analyzer.analyze_voting_round(7, {}, 1)
+    analyzer._eviction_task.cancel()
+
+    assert insights == "Quiet round."
+    assert generate.await_count == 2
+    assert 7 not in analyzer._round_commentary
+
+
+@pytest.mark.asyncio
+async def test_same_votes_in_any_order_reuse_the_cached_insight(analyzer, patterns):
+    client = GameLLMClient()
+    client.enabled = True
+    client.disk_cache = None
+    client.client = AsyncMock()
+    client.client.text_generation.return_value = "Bob looks nervous."
+
+    with patch("bot.ai.voting_analyzer.ai_client", client):
+        first = await analyzer._generate_ai_insights(
+            7, patterns, {"Alice": "Bob", "Cara": "Bob"}
+        )
+        second = await analyzer._generate_ai_insights(
+            8, patterns, {"Cara": "Bob", "Alice": "Bob"}
+        )
+
+    assert first == second == "Bob looks nervous."
+    assert client.client.text_generation.await_count == 1
+
+
+def test_vote_stats_summarize_tracked_votes(analyzer):
+    for time_taken, target in [(4.0, 2), (6.0, 2), (8.0, 3), (2.0, None)]:
+        analyzer.track_player_behavior(
+            7, 1, "vote", {"time_taken": time_taken, "target": target}
+        )
+    analyzer.track_player_behavior(7, 1, "accusation", {})
+
+    behavior = analyzer.behavior_tracking[7][1]
+    assert not hasattr(behavior, "__dict__")
+    assert behavior.vote_times.itemsize == 4
+    assert behavior.accusations == 1
+    assert analyzer._vote_stats(behavior) == {
+        "avg_vote_time": 5.0,
+        "vote_consistency": 67,
+    }
+    analyzer.track_player_behavior(7, 2, "message", {})
+    assert analyzer._vote_stats(analyzer.behavior_tracking[7][2]) == {}
+
+
+def test_suspicion_scores_are_capped_at_100(analyzer, patterns):
+    patterns["vote_manipulation"] = True
+    analyzer._active_players_cache[7] = [1, 2]
+    analyzer.suspicion_scores[7] = {2: 80}
+
+    analyzer._update_suspicion_scores(7, patterns)
+
+    assert analyzer.suspicion_scores[7] == {1: 20, 2: 100}
+
+
+def test_vote_history_and_analyses_are_bounded(analyzer):
+    analyzer.vote_history_limit = 3
+    analyzer.history_limit = 2
+    for round_number in range(5):
+        analyzer.track_player_behavior(
+            7, 1, "vote", {"time_taken": float(round_number), "target": round_number}
+        )
+        analyzer._store_analysis(7, round_number, "insight", {})
+
+    behavior = analyzer.behavior_tracking[7][1]
+    assert list(behavior.vote_times) == [2.0, 3.0, 4.0]
+    assert list(behavior.vote_targets) == [2, 3, 4]
+    assert [r.round for r in analyzer.get_analysis_history(7)] == [3, 4]
+
+
+@pytest.mark.asyncio
+async def test_idle_sessions_are_evicted(analyzer):
+    analyzer.eviction_interval = 0.01
+    analyzer.track_player_behavior(7, 1, "message", {})
+    analyzer.track_player_behavior(8, 1, "message", {})
+    analyzer.session_ttl = 0
+    analyzer._last_activity[8] = time.monotonic() + 3600
+
+    await asyncio.sleep(0.05)
+    assert 7 not in analyzer.behavior_tracking
+    assert 8 in analyzer.behavior_tracking
+
+    analyzer.cleanup_session_analysis(8)
+    await asyncio.wait_for(analyzer._eviction_task, 1)
+
+
+def test_unknown_behavior_actions_are_ignored(analyzer):
+    analyzer.track_player_behavior(7, 1, "dance", {})
+    assert analyzer.behavior_tracking == {}
+
+    for action_type in ("defensive", "suspicious", "message", "message"):
+        analyzer.track_player_behavior(7, 1, action_type, {})
+
+    behavior = analyzer.behavior_tracking[7][1]
+    assert (behavior.defensive_actions, behavior.suspicious_actions) == (1, 1)
+    assert behavior.messages_sent == 2
+
+
+def test_voting_patterns_flag_group_votes_and_manipulation(analyzer):
+    voting_data = {
+        "total_votes": 6,
+        "vote_targets": {2: 3, 4: 1, 5: 2},
+        "vote_times": [],
+        "anonymous_votes": 0,
+        "double_votes": 1,
+    }
+
+    patterns = analyzer._analyze_voting_patterns(voting_data, {})
+
+    assert patterns["suspicious_targets"] == [2]
+    assert patterns["group_voting"] and patterns["vote_manipulation"]
+    voting_data.update(vote_targets={4: 2}, double_votes=0)
+    patterns = analyzer._analyze_voting_patterns(voting_data, {})
+    assert not patterns["group_voting"] and not patterns["vote_manipulation"]
+
+
+@pytest.mark.asyncio
+async def test_behavior_report_prompt_includes_tracked_stats(analyzer):
+    analyzer.track_player_behavior(7, 1, "vote", {"time_taken": 3.0, "target": 2})
+    analyzer.track_player_behavior(7, 1, "accusation", {})
+    analyzer.suspicion_scores[7] = {1: 40}
+
+    with patch.object(analyzer, "_load_player_names", return_value={1: "Vex"}), patch(
+        "bot.ai.voting_analyzer.ai_client.generate_response",
+        AsyncMock(return_value="Vex is calm."),
+    ) as generate:
+        report = await analyzer.generate_player_behavior_report(7, 1)
+    analyzer._eviction_task.cancel()
+
+    prompt = generate.await_args.args[0]
+    assert report == "🔍 **Behavior Analysis: Vex**\n\nVex is calm."
+    assert "Voting Speed: 3.0 seconds" in prompt
+    assert "Vote Consistency: 100%" in prompt
+    assert "Accusations Made: 1" in prompt
+    assert "Suspicion Score: 40/100" in prompt
+
+
+@pytest.mark.asyncio
+async def test_player_names_are_cached_between_lookups(analyzer):
+    with patch.object(
+        analyzer,
+        "_load_player_names",
+        side_effect=lambda ids: {pid: f"P{pid}" for pid in ids if pid != 9},
+    ) as load:
+        assert await analyzer._player_names([1, 2]) == {1: "P1", 2: "P2"}
+        assert await analyzer._player_names([2, 3, 9]) == {2: "P2", 3: "P3"}
+        analyzer.invalidate_player_name(1)
+        await analyzer._player_names([1, 2])
+
+    assert [call.args[0] for call in load.call_args_list] == [[1, 2], [3, 9], [1]]
+
+
+@pytest.mark.asyncio
+async def test_player_name_cache_expires_and_stays_bounded(analyzer):
+    analyzer.name_cache_size = 2
+    with patch.object(
+        analyzer,
+        "_load_player_names",
+        side_effect=lambda ids: {pid: f"P{pid}" for pid in ids},
+    ) as load, patch("bot.ai.voting_analyzer.time.monotonic") as clock:
+        clock.return_value = 0
+        await analyzer._player_names([1, 2, 3])
+        assert list(analyzer._name_cache) == [2, 3]
+
+        clock.return_value = analyzer.name_cache_ttl + 1
+        await analyzer._player_names([3])
+
+    assert [call.args[0] for call in load.call_args_list] == [[1, 2, 3], [3]]
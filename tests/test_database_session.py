@@ -0,0 +1,32 @@
+import asyncio
+import pytest
+from bot.database import ScopedSession, to_thread
+
+
+@pytest.mark.asyncio
+async def test_scoped_session_is_shared_within_a_task_and_closed_after():
+    async def handler():
+        first = ScopedSession()
+        assert ScopedSession() is first
+        return first
+
+    one = await asyncio.create_task(handler())
+    two = await asyncio.create_task(handler())
+    await asyncio.sleep(0)
+
+    assert one is not two
+    assert not ScopedSession.registry.registry
+
+
+@pytest.mark.asyncio
+async def test_to_thread_removes_the_worker_threads_session():
+    def work():
+        session = ScopedSession()
+        assert ScopedSession() is session
+        return session
+
+    first = await to_thread(work)
+    second = await to_thread(work)
+
+    assert first is not second
+    assert not ScopedSession.registry.registry
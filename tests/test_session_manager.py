@@ -0,0 +1,307 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import create_engine, func, inspect, select, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+from bot.database import upgrade_schema
+from bot.database.models import (
+    Base,
+    DiscussionLog,
+    GameSession,
+    JoinQueue,
+    Player,
+    PlayerGameLink,
+    TaskLog,
+    VoteHistory,
+)
+from bot.database.session_manager import (
+    AnalyticsManager,
+    GameLogBuffer,
+    GameSessionManager,
+    JoinQueueManager,
+)
+
+
+def _memory_engine():
+    return create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+
+
+@pytest.fixture
+def db():
+    engine = _memory_engine()
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+@pytest.fixture
+def manager(db) -> GameSessionManager:
+    manager = GameSessionManager()
+    manager.db = db
+    return manager
+
+
+@pytest.fixture
+def queue(db) -> JoinQueueManager:
+    queue = JoinQueueManager()
+    queue.db = db
+    return queue
+
+
+def test_remove_player_marks_the_active_link_as_left(manager, db):
+    db.add(PlayerGameLink(session_id=1, player_id=2))
+    db.commit()
+
+    assert manager.remove_player_from_session(1, 2)
+    assert not manager.remove_player_from_session(1, 2)
+    assert db.scalar(select(PlayerGameLink.left_at)) is not None
+
+
+def test_add_to_queue_skips_players_already_waiting(queue, db):
+    assert queue.add_to_queue(2, 100)
+    assert not queue.add_to_queue(2, 100)
+    assert queue.add_to_queue(2, 200)
+    assert db.scalar(select(JoinQueue.id).where(JoinQueue.chat_id == 100)) == 1
+
+
+def test_buffered_logs_are_stored_in_their_columns(manager, db):
+    buffer = GameLogBuffer(manager)
+    buffer.add_vote(1, 2, 3, round_number=2)
+    buffer.add_discussion(1, 2, "It was Bob")
+    buffer.add_task_completion(1, 2, "crewmate_task", "Fix wiring", 10)
+
+    assert buffer.flush() == 3
+    assert len(buffer) == 0
+
+    vote = db.scalars(select(VoteHistory)).one()
+    assert (vote.session_id, vote.voter_id, vote.target_id, vote.round_number) == (
+        1,
+        2,
+        3,
+        2,
+    )
+    discussion = db.scalars(select(DiscussionLog)).one()
+    assert (
+        discussion.session_id,
+        discussion.speaker_id,
+        discussion.speaker_type,
+        discussion.message,
+    ) == (1, 2, "player", "It was Bob")
+    task = db.scalars(select(TaskLog)).one()
+    assert (task.player_id, task.event_type) == (2, "task_completed")
+    assert task.details == {
+        "session_id": 1,
+        "task_type": "crewmate_task",
+        "description": "Fix wiring",
+        "xp_earned": 10,
+    }
+
+
+def test_bulk_insert_rejects_unknown_columns(manager, db):
+    with pytest.raises(ValueError, match="phase"):
+        manager.log_discussions_bulk([{"session_id": 1, "phase": "discussion"}])
+    assert db.scalar(select(DiscussionLog.id)) is None
+
+
+def test_cleanup_deletes_only_sessions_that_ended_long_ago(manager, db):
+    now = datetime.now(timezone.utc)
+    db.add_all(
+        [
+            GameSession(id=1, is_active=False, end_time=now - timedelta(hours=30)),
+            GameSession(id=2, is_active=False, end_time=now - timedelta(hours=1)),
+            GameSession(id=3, is_active=True),
+        ]
+    )
+    db.commit()
+
+    assert manager.cleanup_old_sessions(max_age_hours=24) == 1
+    assert db.scalars(select(GameSession.id).order_by(GameSession.id)).all() == [2, 3]
+
+
+def test_notify_queue_marks_waiting_players_once(queue, db):
+    queue.add_to_queue(2, 100)
+    queue.add_to_queue(3, 100)
+    queue.add_to_queue(4, 200)
+
+    assert sorted(queue.notify_queue(100)) == [2, 3]
+    assert queue.notify_queue(100) == []
+    assert (
+        db.scalar(select(JoinQueue.player_id).where(JoinQueue.notified_at.is_(None)))
+        == 4
+    )
+
+
+def test_cleanup_old_queue_deletes_stale_entries(queue, db):
+    now = datetime.now(timezone.utc)
+    db.add_all(
+        [
+            JoinQueue(player_id=2, chat_id=100, joined_at=now - timedelta(hours=7)),
+            JoinQueue(player_id=3, chat_id=100, joined_at=now),
+        ]
+    )
+    db.commit()
+
+    assert queue.cleanup_old_queue(max_age_hours=6) == 1
+    assert db.scalars(select(JoinQueue.player_id)).all() == [3]
+
+
+def test_chat_stats_count_active_and_finished_sessions(db):
+    now = datetime.now(timezone.utc)
+    db.add_all(
+        [
+            GameSession(chat_id=100, is_active=True, start_time=now),
+            GameSession(chat_id=100, is_active=False, start_time=now),
+            GameSession(chat_id=100, is_active=False, start_time=now),
+            GameSession(
+                chat_id=100, is_active=False, start_time=now - timedelta(days=30)
+            ),
+            GameSession(chat_id=200, is_active=True, start_time=now),
+        ]
+    )
+    db.commit()
+    analytics = AnalyticsManager()
+    analytics.db = db
+
+    assert analytics.get_chat_stats(100) == {
+        "total_sessions": 3,
+        "active_sessions": 1,
+        "finished_sessions": 2,
+        "completion_rate": 2 / 3,
+    }
+
+
+def test_player_stats_count_wins_from_session_winner(db):
+    db.add(Player(id=2, user_id=20, username="alice"))
+    db.add_all(
+        [
+            GameSession(id=1, winner_id=2),
+            GameSession(id=2, winner_id=None),
+            PlayerGameLink(session_id=1, player_id=2, score=30),
+            PlayerGameLink(session_id=2, player_id=2, score=5),
+            PlayerGameLink(session_id=1, player_id=3, score=99),
+        ]
+    )
+    db.commit()
+    analytics = AnalyticsManager()
+    analytics.db = db
+
+    stats = analytics.get_player_stats(2)
+
+    assert stats["player"].username == "alice"
+    assert (stats["games_played"], stats["games_won"]) == (2, 1)
+    assert stats["win_rate"] == 0.5
+    assert stats["total_xp_earned"] == 35
+
+
+def test_session_leaderboard_ranks_by_score(db):
+    db.add_all(
+        [
+            Player(id=2, user_id=20, username="alice"),
+            Player(id=3, user_id=30, username="bob"),
+            GameSession(id=1, winner_id=3),
+            PlayerGameLink(session_id=1, player_id=2, role="crewmate", score=10),
+            PlayerGameLink(session_id=1, player_id=3, role="impostor", score=40),
+        ]
+    )
+    db.commit()
+    analytics = AnalyticsManager()
+    analytics.db = db
+
+    assert analytics.get_session_leaderboard(1) == [
+        {
+            "rank": 1,
+            "player_name": "bob",
+            "xp_earned": 40,
+            "role": "impostor",
+            "outcome": "win",
+        },
+        {
+            "rank": 2,
+            "player_name": "alice",
+            "xp_earned": 10,
+            "role": "crewmate",
+            "outcome": "lose",
+        },
+    ]
+
+
+def test_add_player_twice_returns_the_active_link(manager, db):
+    first = manager.add_player_to_session(1, 2)
+    second = manager.add_player_to_session(1, 2)
+
+    assert first.id == second.id
+    assert db.scalar(select(func.count(PlayerGameLink.id))) == 1
+
+
+def test_add_player_after_leaving_creates_a_new_link(manager, db):
+    first = manager.add_player_to_session(1, 2)
+    manager.remove_player_from_session(1, 2)
+    second = manager.add_player_to_session(1, 2)
+
+    assert second.id != first.id
+    assert second.left_at is None
+    assert db.scalar(select(func.count(PlayerGameLink.id))) == 2
+
+
+def test_add_player_without_the_unique_index_checks_first(manager, db):
+    db.execute(text("DROP INDEX uq_pgl_session_player_active"))
+    db.commit()
+
+    first = manager.add_player_to_session(1, 2)
+    second = manager.add_player_to_session(1, 2)
+
+    assert first.id == second.id
+    assert db.scalar(select(func.count(PlayerGameLink.id))) == 1
+
+
+def test_add_to_queue_without_the_unique_index_checks_first(queue, db):
+    db.execute(text("DROP INDEX uq_queue_player_chat_waiting"))
+    db.commit()
+
+    assert queue.add_to_queue(2, 100)
+    assert not queue.add_to_queue(2, 100)
+    assert db.scalar(select(func.count(JoinQueue.id))) == 1
+
+
+def test_add_to_queue_again_after_being_notified(queue, db):
+    assert queue.add_to_queue(2, 100)
+    queue.notify_queue(100)
+
+    assert queue.add_to_queue(2, 100)
+    assert db.scalar(select(func.count(JoinQueue.id))) == 2
+
+
+def test_upgrade_schema_adds_missing_columns_and_indexes_to_old_tables():
+    engine = _memory_engine()
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "CREATE TABLE player_game_link (id INTEGER PRIMARY KEY, "
+                "player_id INTEGER, session_id INTEGER, role VARCHAR, "
+                "is_active BOOLEAN, score INTEGER)"
+            )
+        )
+        conn.execute(
+            text(
+                "CREATE TABLE join_queue (id INTEGER PRIMARY KEY, "
+                "player_id INTEGER, chat_id INTEGER, joined_at DATETIME, "
+                "notified_at DATETIME)"
+            )
+        )
+
+    upgrade_schema(engine)
+
+    inspector = inspect(engine)
+    columns = {column["name"] for column in inspector.get_columns("player_game_link")}
+    indexes = {index["name"] for index in inspector.get_indexes("player_game_link")}
+    assert "left_at" in columns
+    assert {"ix_pgl_session_active", "uq_pgl_session_player_active"} <= indexes
+    assert "uq_queue_player_chat_waiting" in {
+        index["name"] for index in inspector.get_indexes("join_queue")
+    }
+    engine.dispose()